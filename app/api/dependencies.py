@@ -0,0 +1,14 @@
+from fastapi import Request
+
+from app.exceptions.exceptions import ServiceNotReadyException
+
+
+def require_ready(request: Request) -> None:
+    """503, пока модель и коллекция загружаются в фоне"""
+    if getattr(request.app.state, "ready", False):
+        return
+
+    startup_error = getattr(request.app.state, "startup_error", None)
+    if startup_error:
+        raise ServiceNotReadyException(f"Сервис не загрузился: {startup_error}")
+    raise ServiceNotReadyException()
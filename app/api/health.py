@@ -0,0 +1,52 @@
+from typing import Any, Dict
+
+from dependency_injector.wiring import inject, Provide
+from fastapi import APIRouter, Depends
+
+from app.api.dependencies import require_ready
+from app.containers import Container
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.embedding import EmbeddingService
+from app.core.generator import ResponseGenerator
+from app.core.searcher import SearchService
+from app.core.single_flight import SingleFlight
+from app.models.health import ReadinessResponse
+from app.utils.logging import queue_stats
+
+router = APIRouter()
+
+
+@router.get("/live", response_model=ReadinessResponse)
+async def liveness():
+    """Процесс запущен и принимает соединения, модель может ещё загружаться"""
+    return ReadinessResponse(status="alive")
+
+
+@router.get("/ready", response_model=ReadinessResponse, dependencies=[Depends(require_ready)])
+async def readiness():
+    """Готовность сервиса: модель и коллекция загружены"""
+    return ReadinessResponse(status="ready")
+
+
+@router.get("/stats", dependencies=[Depends(require_ready)])
+@inject
+async def stats(
+        embedding_service: EmbeddingService = Depends(Provide[Container.embedding_service]),
+        answer_cache: SemanticAnswerCache = Depends(Provide[Container.answer_cache]),
+        response_generator: ResponseGenerator = Depends(Provide[Container.response_generator_service]),
+        search_service: SearchService = Depends(Provide[Container.search_service]),
+        question_coalescer: SingleFlight = Depends(Provide[Container.question_coalescer])
+) -> Dict[str, Any]:
+    """Метрики внутренних компонентов"""
+    return {
+        "encode_batcher": embedding_service.encode_batcher.stats(),
+        "query_embedding_cache": embedding_service.query_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "llm_stream": response_generator.stream_stats(),
+        "llm_providers": response_generator.llm_client.stats(),
+        "ask_coalescing": question_coalescer.stats(),
+        "log_queue": queue_stats(),
+        "search_stages": search_service.stage_timings.stats(),
+        "generation_stages": response_generator.stage_timings.stats(),
+        "cross_encoder": search_service.cross_encoder.stats() if search_service.cross_encoder else None
+    }
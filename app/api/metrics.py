@@ -0,0 +1,48 @@
+from dependency_injector.wiring import inject, Provide
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import PlainTextResponse
+
+from app.containers import Container
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.single_flight import SingleFlight
+from app.utils.logging import queue_stats
+from app.utils.metrics import STAGE_SECONDS, render_metric, render_value
+
+router = APIRouter()
+
+
+# Без require_ready: метрики нужны и во время загрузки модели
+@router.get("/metrics", response_class=PlainTextResponse)
+@inject
+async def metrics(
+        request: Request,
+        answer_cache: SemanticAnswerCache = Depends(Provide[Container.answer_cache]),
+        question_coalescer: SingleFlight = Depends(Provide[Container.question_coalescer])
+) -> PlainTextResponse:
+    """Гистограммы этапов и счетчики кэшей в текстовом формате Prometheus"""
+    caches = {'answer': answer_cache.stats()}
+    # Сервис эмбеддингов берем только готовый: провайдер контейнера начал бы грузить модель в event loop
+    embedding_service = getattr(request.app.state, "embedding_service", None)
+    if embedding_service is not None:
+        caches['query_embedding'] = embedding_service.query_cache.stats()
+    coalescing = question_coalescer.stats()
+
+    lines = render_metric("rag_ready", "Модель и коллекция загружены", "gauge", "service",
+                          {'rag': int(getattr(request.app.state, "ready", False))})
+    lines += STAGE_SECONDS.render()
+    lines += render_metric("rag_cache_hits_total", "Попадания в кэши", "counter", "cache",
+                           {name: stats['hits'] for name, stats in caches.items()})
+    lines += render_metric("rag_cache_misses_total", "Промахи кэшей", "counter", "cache",
+                           {name: stats['misses'] for name, stats in caches.items()})
+    lines += render_metric("rag_cache_hit_ratio", "Доля попаданий в кэши", "gauge", "cache",
+                           {name: stats['hit_rate'] for name, stats in caches.items()})
+    lines += render_metric("rag_ask_requests_total", "Вопросы к /ask: выполненные и склеенные с одинаковыми",
+                           "counter", "result",
+                           {'executed': coalescing['executed'], 'coalesced': coalescing['coalesced']})
+    log_queue = queue_stats()
+    lines += render_value("rag_log_records_dropped_total", "Записи лога, отброшенные при переполнении очереди",
+                          "counter", log_queue['dropped'])
+    lines += render_value("rag_log_queue_size", "Записи лога, ждущие записи фоновым потоком", "gauge",
+                          log_queue['queued'])
+
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -1,45 +1,193 @@
+import asyncio
+import json
 from datetime import datetime
+from typing import AsyncIterator, Dict, List
 
 from dependency_injector.wiring import inject, Provide
 from fastapi import APIRouter, Depends
+from fastapi.responses import Response, StreamingResponse
 
+from app.api.dependencies import require_ready
+from app.constants.generator import ERROR_ANSWER_STR
 from app.containers import Container
+from app.core.embedding import EmbeddingService
 from app.core.generator import ResponseGenerator
+from app.core.query_cache import normalize_query
 from app.core.searcher import SearchService
+from app.core.single_flight import SingleFlight
 from app.exceptions.exceptions import RAGException
-from app.models.questions import QuestionRequest, QuestionResponse
+from app.models.questions import (
+    BatchAnswer,
+    BatchQuestionRequest,
+    BatchQuestionResponse,
+    QuestionRequest,
+    QuestionResponse,
+)
+from app.utils.timing import StageTimings
+from config import settings
 
-router = APIRouter()
+# Пока модель загружается в фоне, вопросы получают 503
+router = APIRouter(dependencies=[Depends(require_ready)])
+
+# Полное время /ask и сериализация ответа (этапы поиска и генерации замеряют сервисы)
+stage_timings = StageTimings()
 
 
 @router.post("/ask", response_model=QuestionResponse)
 @inject
 async def ask_question(
         request: QuestionRequest,
+        embedding_service: EmbeddingService = Depends(Provide[Container.embedding_service]),
         search_service: SearchService = Depends(Provide[Container.search_service]),
-        response_generator: ResponseGenerator = Depends(Provide[Container.response_generator_service])
+        response_generator: ResponseGenerator = Depends(Provide[Container.response_generator_service]),
+        question_coalescer: SingleFlight = Depends(Provide[Container.question_coalescer])
 ):
     """Основная апка"""
 
-    try:
+    async def answer_question() -> str:
+        # Эмбеддинг вопроса нужен и поиску, и семантическому кэшу ответов
+        with search_service.stage_timings.measure('embed'):
+            query_embedding = await embedding_service.embed_query_async(request.question)
+
         # Поиск релевантных документов
-        search_results = search_service.search_and_rank(
-            query=request.question
+        search_results = await search_service.search_and_rank_async(
+            query=request.question,
+            query_embedding=query_embedding
         )
 
         # Генерация ответа
-        answer = await response_generator.generate_response_with_sources(
+        return await response_generator.generate_response_with_sources(
             query=request.question,
-            contexts=search_results
+            contexts=search_results,
+            query_embedding=query_embedding
+        )
+
+    try:
+        with stage_timings.measure('ask'):
+            # Одинаковые вопросы, пришедшие одновременно, разделяют один поиск и один вызов LLM
+            answer = await question_coalescer.do(normalize_query(request.question), answer_question)
+
+            # Сериализуем сами, чтобы замерить этап; готовый Response FastAPI не перекодирует
+            with stage_timings.measure('serialize'):
+                body = QuestionResponse(answer=answer).model_dump_json()
+
+        return Response(content=body, media_type="application/json")
+
+    except RAGException:
+        raise
+    except Exception as e:
+        raise RAGException(
+            detail=f"Ошибка обработки вопроса: {str(e)}",
+            status_code=500,
+            error_type="PROCESSING_ERROR"
         )
 
-        return QuestionResponse(
-            answer=answer
+
+@router.post("/ask/stream")
+@inject
+async def ask_question_stream(
+        request: QuestionRequest,
+        embedding_service: EmbeddingService = Depends(Provide[Container.embedding_service]),
+        search_service: SearchService = Depends(Provide[Container.search_service]),
+        response_generator: ResponseGenerator = Depends(Provide[Container.response_generator_service])
+):
+    """Потоковый ответ через Server-Sent Events"""
+
+    try:
+        # Поиск выполняем до начала потока, чтобы ошибки вернулись обычным HTTP-статусом
+        with search_service.stage_timings.measure('embed'):
+            query_embedding = await embedding_service.embed_query_async(request.question)
+        search_results = await search_service.search_and_rank_async(
+            query=request.question,
+            query_embedding=query_embedding
         )
 
+        deltas = response_generator.stream_response_with_sources(
+            query=request.question,
+            contexts=search_results,
+            query_embedding=query_embedding
+        )
+        # Первую дельту тоже ждем до ответа: если недоступны все LLM, клиент получит 503
+        first_delta = await anext(deltas, None)
+
+    except RAGException:
+        raise
     except Exception as e:
         raise RAGException(
             detail=f"Ошибка обработки вопроса: {str(e)}",
             status_code=500,
             error_type="PROCESSING_ERROR"
         )
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            if first_delta is not None:
+                yield f"data: {json.dumps({'delta': first_delta}, ensure_ascii=False)}\n\n"
+            async for delta in deltas:
+                yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            # Статус уже отправлен: вместо done — событие error, полученные дельты клиент отбрасывает
+            error = {'detail': ERROR_ANSWER_STR, 'error_type': "PROCESSING_ERROR"}
+            if isinstance(e, RAGException):
+                error = {'detail': e.detail, 'error_type': e.error_type}
+            yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def batch_answer(result) -> BatchAnswer:
+    """Ответ на вопрос из пачки либо описание ошибки в том же формате, что у event: error"""
+    if isinstance(result, RAGException):
+        return BatchAnswer(detail=result.detail, error_type=result.error_type)
+    if isinstance(result, BaseException):
+        return BatchAnswer(detail=ERROR_ANSWER_STR, error_type="PROCESSING_ERROR")
+    return BatchAnswer(answer=result)
+
+
+@router.post("/ask/batch", response_model=BatchQuestionResponse)
+@inject
+async def ask_questions_batch(
+        request: BatchQuestionRequest,
+        search_service: SearchService = Depends(Provide[Container.search_service]),
+        response_generator: ResponseGenerator = Depends(Provide[Container.response_generator_service])
+):
+    """Пакетная обработка вопросов (для офлайн-оценки)"""
+
+    try:
+        # Один векторизованный поиск на всю пачку
+        search_results = await search_service.search_and_rank_batch_async(
+            queries=request.questions
+        )
+
+        # Генерация ответов с ограничением параллельных запросов к LLM
+        semaphore = asyncio.Semaphore(settings.ASK_BATCH_LLM_CONCURRENCY)
+
+        async def generate(question: str, contexts: List[Dict]) -> str:
+            async with semaphore:
+                return await response_generator.generate_response_with_sources(
+                    query=question,
+                    contexts=contexts
+                )
+
+        # Ошибка одного вопроса (например, недоступность LLM) попадает в его ответ, остальные дорабатывают
+        answers = await asyncio.gather(*(
+            generate(question, contexts)
+            for question, contexts in zip(request.questions, search_results)
+        ), return_exceptions=True)
+
+        return BatchQuestionResponse(answers=[batch_answer(answer) for answer in answers])
+
+    except RAGException:
+        raise
+    except Exception as e:
+        raise RAGException(
+            detail=f"Ошибка пакетной обработки вопросов: {str(e)}",
+            status_code=500,
+            error_type="PROCESSING_ERROR"
+        )
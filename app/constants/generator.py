@@ -4,6 +4,8 @@ NO_ANSWER_STR = """
 Телефон +7 495 414-40-49 hello@eora.ru
 """
 
+ERROR_ANSWER_STR = "Извините, произошла ошибка при формировании ответа."
+
 SYSTEM_PROMPT = f"""
 РОЛЬ: IT-консультант компании EORA.
 
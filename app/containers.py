@@ -1,22 +1,61 @@
 from dependency_injector import containers, providers
 
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.cross_encoder import create_cross_encoder
 from app.core.embedding import EmbeddingService
+from app.core.executor import InferenceExecutor
 from app.core.generator import ResponseGenerator
+from app.core.lexical import BM25Index
 from app.core.searcher import SearchService
+from app.core.single_flight import SingleFlight
 
 
 class Container(containers.DeclarativeContainer):
     config = providers.Configuration()
 
-    embedding_service = providers.Factory(
-        EmbeddingService
+    inference_executor = providers.Singleton(
+        InferenceExecutor,
+        max_workers=config.INFERENCE_MAX_WORKERS,
+        max_queue=config.INFERENCE_MAX_QUEUE
     )
 
-    response_generator_service = providers.Factory(
-        ResponseGenerator
+    # Модель и коллекция тяжелые, поэтому держим по одному экземпляру на процесс
+    embedding_service = providers.Singleton(
+        EmbeddingService,
+        executor=inference_executor
     )
 
-    search_service = providers.Factory(
+    answer_cache = providers.Singleton(
+        SemanticAnswerCache,
+        max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+        max_distance=config.ANSWER_CACHE_MAX_DISTANCE
+    )
+
+    response_generator_service = providers.Singleton(
+        ResponseGenerator,
+        answer_cache=answer_cache
+    )
+
+    # Склейка одинаковых одновременных вопросов к /ask
+    question_coalescer = providers.Singleton(
+        SingleFlight,
+        enabled=config.ASK_COALESCING_ENABLED
+    )
+
+    # BM25-индекс строится при загрузке базы знаний и лежит рядом с коллекцией
+    lexical_index = providers.Singleton(BM25Index.load)
+
+    # None, если переранжирование кросс-энкодером выключено
+    cross_encoder = providers.Singleton(
+        create_cross_encoder,
+        executor=inference_executor
+    )
+
+    search_service = providers.Singleton(
         SearchService,
-        embedding_service=embedding_service
+        embedding_service=embedding_service,
+        lexical_index=lexical_index,
+        cross_encoder=cross_encoder,
+        executor=inference_executor
     )
@@ -0,0 +1,106 @@
+import time
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+from app.utils.index_version import read_index_version
+from config import settings
+
+
+class SemanticAnswerCache:
+    """Семантический кэш ответов LLM: ищет ближайший закэшированный вопрос по косинусу"""
+
+    def __init__(self, max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = settings.ANSWER_CACHE_TTL_SECONDS,
+                 max_distance: float = settings.ANSWER_CACHE_MAX_DISTANCE,
+                 index_version_fn: Callable[[], int] = read_index_version):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.index_version_fn = index_version_fn
+
+        # Индекс: нормированные эмбеддинги вопросов, слоты переиспользуются по кругу
+        self._matrix: Optional[np.ndarray] = None
+        self._expires_at = np.zeros(max_entries)
+        self._chunk_ids: List[Optional[FrozenSet[str]]] = [None] * max_entries
+        self._answers: List[Optional[str]] = [None] * max_entries
+        self._next_slot = 0
+        self._index_version = index_version_fn()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, query_embedding: np.ndarray, chunk_ids: Iterable[str]) -> Optional[str]:
+        """Возвращает ответ на близкий вопрос с тем же набором чанков или None"""
+        if not self.max_entries:
+            return None
+
+        self._check_index_version()
+        if self._matrix is None:
+            self.misses += 1
+            return None
+
+        similarities = self._matrix @ self._normalize(query_embedding)
+        similarities[self._expires_at <= time.monotonic()] = -np.inf
+
+        candidates = np.flatnonzero(similarities >= 1 - self.max_distance)
+        key = frozenset(chunk_ids)
+        for slot in candidates[np.argsort(-similarities[candidates])]:
+            if self._chunk_ids[slot] == key:
+                self.hits += 1
+                return self._answers[slot]
+
+        self.misses += 1
+        return None
+
+    def put(self, query_embedding: np.ndarray, chunk_ids: Iterable[str], answer: str) -> None:
+        """Сохраняет ответ LLM"""
+        if not self.max_entries:
+            return
+
+        self._check_index_version()
+        vector = self._normalize(query_embedding)
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        # TTL у всех записей одинаковый, поэтому по кругу вытесняется самая старая
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.max_entries
+
+        self._matrix[slot] = vector
+        self._expires_at[slot] = time.monotonic() + self.ttl_seconds
+        self._chunk_ids[slot] = frozenset(chunk_ids)
+        self._answers[slot] = answer
+
+    def invalidate(self) -> None:
+        """Сбрасывает все ответы"""
+        self._expires_at[:] = 0
+        self._chunk_ids = [None] * self.max_entries
+        self._answers = [None] * self.max_entries
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и заполненность кэша"""
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'entries': int(np.count_nonzero(self._expires_at > time.monotonic())),
+            'invalidations': self.invalidations
+        }
+
+    def _check_index_version(self) -> None:
+        """Сбрасывает кэш, если базу знаний переиндексировали"""
+        index_version = self.index_version_fn()
+        if index_version != self._index_version:
+            self._index_version = index_version
+            self.invalidate()
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """Нормирует вектор, чтобы скалярное произведение было косинусом"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
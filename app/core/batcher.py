@@ -0,0 +1,92 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.executor import InferenceExecutor
+from config import settings
+
+
+class EncodeBatcher:
+    """Микробатчер: собирает конкурентные запросы на эмбеддинг в один вызов encode"""
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], executor: InferenceExecutor,
+                 max_batch_size: int = settings.ENCODE_BATCH_MAX_SIZE,
+                 max_wait_ms: float = settings.ENCODE_BATCH_MAX_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Метрики
+        self.batches_total = 0
+        self.items_total = 0
+        self.max_batch_seen = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Возвращает эмбеддинг текста, вычисленный в составе батча"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики размера батча и времени ожидания"""
+        return {
+            'batches_total': self.batches_total,
+            'items_total': self.items_total,
+            'avg_batch_size': self.items_total / self.batches_total if self.batches_total else 0.0,
+            'max_batch_size': self.max_batch_seen,
+            'avg_wait_ms': 1000 * self.wait_seconds_total / self.items_total if self.items_total else 0.0,
+            'max_wait_ms': 1000 * self.max_wait_seconds
+        }
+
+    def _flush(self) -> None:
+        """Отправляет накопленный батч на кодирование"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        """Кодирует батч одним вызовом и раздает векторы ожидающим запросам"""
+        started_at = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            wait = started_at - enqueued_at
+            self.wait_seconds_total += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.batches_total += 1
+        self.items_total += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+        try:
+            vectors = await self.executor.run(self.encode_fn, [text for text, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
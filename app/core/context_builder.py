@@ -0,0 +1,164 @@
+import os
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from app.core.embedding_backends import DEFAULT_EMBEDDING_MODEL
+from app.utils.logging import get_logger
+from config import settings
+
+logger = get_logger(__name__)
+
+# Оценка без токенизатора: для русского текста у LLM-токенизаторов около 4 символов на токен
+CHARS_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """Подсчет токенов локальным токенизатором HF tokenizers"""
+
+    def __init__(self, tokenizer: Optional[Any] = None):
+        self.tokenizer = tokenizer
+        if tokenizer is not None:
+            # В tokenizer.json моделей эмбеддингов зашиты обрезка до 128 токенов и паддинг
+            tokenizer.no_truncation()
+            tokenizer.no_padding()
+
+    @classmethod
+    def load(cls, source: str = settings.CONTEXT_TOKENIZER) -> "TokenCounter":
+        """Токенизатор из настроек или локальный токенизатор модели эмбеддингов, иначе оценка по символам"""
+        try:
+            from tokenizers import Tokenizer
+
+            source = source or cls._local_tokenizer_file()
+            if not source:
+                logger.warning("Локальный токенизатор не найден, считаем токены по символам")
+                return cls()
+            if os.path.isfile(source):
+                return cls(Tokenizer.from_file(source))
+            return cls(Tokenizer.from_pretrained(source))
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить токенизатор {source}, считаем токены по символам: {e}")
+            return cls()
+
+    @staticmethod
+    def _local_tokenizer_file() -> Optional[str]:
+        """tokenizer.json из выгрузки ONNX или из кэша HF, без обращения к сети"""
+        exported = os.path.join(settings.EMBEDDING_ONNX_PATH, "tokenizer.json")
+        if os.path.isfile(exported):
+            return exported
+
+        from huggingface_hub import try_to_load_from_cache
+
+        cached = try_to_load_from_cache(f"sentence-transformers/{DEFAULT_EMBEDDING_MODEL}", "tokenizer.json")
+        return cached if isinstance(cached, str) else None
+
+    def count(self, text: str) -> int:
+        """Количество токенов в тексте"""
+        if self.tokenizer is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Обрезает текст до max_tokens по границе слова"""
+        if max_tokens <= 0:
+            return ""
+
+        if self.tokenizer is None:
+            end = max_tokens * CHARS_PER_TOKEN
+        else:
+            offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+            if len(offsets) <= max_tokens:
+                return text
+            end = offsets[max_tokens - 1][1]
+
+        if end >= len(text):
+            return text
+
+        cut = text.rfind(" ", 0, end + 1)
+        return text[:cut if cut > 0 else end].rstrip()
+
+
+class AssembledContext(NamedTuple):
+    """Контекст для промпта: текст по источникам, ссылки, использованные чанки"""
+    text: str
+    links: str
+    chunk_ids: List[str]
+    tokens: int
+
+
+def merge_overlapping(left: str, right: str, max_overlap: int = 2 * settings.DEFAULT_CHUNK_OVERLAP) -> str:
+    """Склеивает соседние чанки, убирая повтор слов на стыке (перекрытие чанкера)"""
+    left_words = left.split()
+    right_words = right.split()
+
+    for size in range(min(max_overlap, len(left_words), len(right_words)), 0, -1):
+        if left_words[-size:] == right_words[:size]:
+            return " ".join(left_words + right_words[size:])
+
+    return " ".join(left_words + right_words)
+
+
+class ContextBuilder:
+    """Упаковывает найденные чанки в бюджет токенов промпта"""
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None,
+                 token_budget: int = settings.CONTEXT_TOKEN_BUDGET,
+                 min_chunk_tokens: int = settings.CONTEXT_MIN_CHUNK_TOKENS):
+        self.token_counter = token_counter or TokenCounter.load()
+        self.token_budget = token_budget
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def build(self, contexts: List[Dict[str, Any]]) -> AssembledContext:
+        """Чанки в порядке релевантности, пока влезают в бюджет; соседние чанки источника склеиваются"""
+        selected: Dict[str, List[Dict[str, Any]]] = {}
+        chunk_ids = []
+        remaining = self.token_budget
+
+        for ctx in contexts:
+            url = ctx['metadata']['source_url']
+            # Заголовок источника выводится один раз на источник
+            header_tokens = 0 if url in selected else self.token_counter.count(ctx['metadata']['source_title']) + 4
+            content = ctx['content']
+            content_tokens = self.token_counter.count(content)
+
+            if header_tokens + content_tokens > remaining:
+                # Последний чанк обрезаем, если от него останется что-то осмысленное
+                if remaining - header_tokens < self.min_chunk_tokens:
+                    break
+                content = self.token_counter.truncate(content, remaining - header_tokens)
+                content_tokens = self.token_counter.count(content)
+
+            selected.setdefault(url, []).append({
+                'title': ctx['metadata']['source_title'],
+                'chunk_index': ctx['metadata'].get('chunk_index', 0),
+                'content': content
+            })
+            chunk_ids.append(ctx['chunk_id'])
+            remaining -= header_tokens + content_tokens
+            if remaining < self.min_chunk_tokens:
+                break
+
+        context_parts = []
+        links = []
+        for number, (url, chunks) in enumerate(selected.items(), start=1):
+            context_parts.append(f"[{number}] {chunks[0]['title']}\n{self._merge_chunks(chunks)}")
+            links.append(f"[{number}] {url}")
+
+        text = "\n\n".join(context_parts)
+        return AssembledContext(
+            text=text,
+            links="\n".join(links),
+            chunk_ids=chunk_ids,
+            tokens=self.token_counter.count(text)
+        )
+
+    def _merge_chunks(self, chunks: List[Dict[str, Any]]) -> str:
+        """Чанки одного источника по порядку: соседние склеиваются без перекрытия, разрывы помечаются"""
+        runs = []
+        previous_index = None
+        for chunk in sorted(chunks, key=lambda chunk: chunk['chunk_index']):
+            if previous_index is not None and chunk['chunk_index'] == previous_index + 1:
+                runs[-1] = merge_overlapping(runs[-1], chunk['content'])
+            else:
+                runs.append(chunk['content'])
+            previous_index = chunk['chunk_index']
+
+        return "\n…\n".join(runs)
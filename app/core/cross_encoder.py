@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.executor import InferenceExecutor
+from app.exceptions.exceptions import ServiceOverloadedException
+from app.utils.logging import get_logger
+from config import settings
+
+logger = get_logger(__name__)
+
+
+class CrossEncoderReranker:
+    """Второй этап ранжирования: кросс-энкодер на CPU с бюджетом кандидатов и лимитом по времени"""
+
+    def __init__(self, model_name: str = settings.CROSS_ENCODER_MODEL,
+                 executor: Optional[InferenceExecutor] = None,
+                 max_candidates: int = settings.CROSS_ENCODER_MAX_CANDIDATES,
+                 top_k: int = settings.CROSS_ENCODER_TOP_K,
+                 batch_size: int = settings.CROSS_ENCODER_BATCH_SIZE,
+                 timeout_ms: float = settings.CROSS_ENCODER_TIMEOUT_MS,
+                 backend: str = settings.CROSS_ENCODER_BACKEND,
+                 model: Optional[Any] = None):
+        self.executor = executor or InferenceExecutor()
+        self.max_candidates = max_candidates
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.timeout = timeout_ms / 1000
+
+        if model is None:
+            # Модель нужна только при включенном re-ranker, поэтому импорт здесь
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name, device="cpu", backend=backend)
+        self.model = model
+
+        self.reranked = 0
+        self.fallbacks = 0
+
+    def rerank(self, query: str, results: List[Dict[str, Any]],
+               deadline: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """Переранжирует первых max_candidates, None если не уложились в лимит времени"""
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+
+        candidates = results[:self.max_candidates]
+        scores = []
+        for start in range(0, len(candidates), self.batch_size):
+            # Лимит проверяем между батчами: начатый батч досчитывается, следующий уже нет
+            if time.monotonic() > deadline:
+                return None
+
+            batch = candidates[start:start + self.batch_size]
+            scores.extend(self.model.predict(
+                [(query, result['content']) for result in batch],
+                batch_size=len(batch),
+                show_progress_bar=False
+            ))
+
+        scores = np.asarray(scores, dtype=np.float64)
+        order = np.argsort(-scores, kind='stable')
+        for i in order:
+            candidates[i]['rerank_score'] = float(scores[i])
+
+        return [candidates[i] for i in order]
+
+    def apply(self, query: str, results: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """Итоговые k результатов; при превышении лимита — порядок первого этапа"""
+        return self._select(self.rerank(query, results), results, k)
+
+    async def apply_async(self, query: str, results: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """То же в пуле инференса, время ожидания в очереди входит в лимит"""
+        deadline = time.monotonic() + self.timeout
+        try:
+            reranked = await asyncio.wait_for(self.executor.run(self.rerank, query, results, deadline), self.timeout)
+        except (asyncio.TimeoutError, ServiceOverloadedException):
+            reranked = None
+
+        return self._select(reranked, results, k)
+
+    def warmup(self) -> None:
+        """Прогревает модель пробной парой"""
+        self.model.predict([("warmup", "warmup")], show_progress_bar=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Сколько раз переранжировали и сколько раз откатились к первому этапу"""
+        return {
+            'reranked': self.reranked,
+            'fallbacks': self.fallbacks
+        }
+
+    def _select(self, reranked: Optional[List[Dict[str, Any]]],
+                results: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """Отбирает результаты для промпта"""
+        if reranked is None:
+            self.fallbacks += 1
+            logger.warning(f"Кросс-энкодер не уложился в {1000 * self.timeout:.0f} мс, порядок первого этапа")
+            return results[:k]
+
+        self.reranked += 1
+        # После точного переранжирования в промпт идет меньше чанков
+        return reranked[:min(k, self.top_k)]
+
+
+def create_cross_encoder(executor: InferenceExecutor) -> Optional[CrossEncoderReranker]:
+    """Кросс-энкодер, если он включен в настройках"""
+    if not settings.CROSS_ENCODER_ENABLED:
+        return None
+
+    return CrossEncoderReranker(executor=executor)
@@ -1,17 +1,38 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-import chromadb
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
+from app.core.batcher import EncodeBatcher
+from app.core.embedding_backends import DEFAULT_EMBEDDING_MODEL, embedding_model_key, load_embedding_model
+from app.core.embedding_store import EmbeddingStore
+from app.core.executor import InferenceExecutor
+from app.core.query_cache import QueryEmbeddingCache
+from app.core.ranking import title_tokens
+from app.utils.index_version import bump_index_version
 from config import settings
 
 
 class EmbeddingService:
-    def __init__(self, model_name: str = "paraphrase-multilingual-MiniLM-L12-v2"):
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL,
+                 executor: Optional[InferenceExecutor] = None,
+                 embedding_store: Optional[EmbeddingStore] = None,
+                 backend: str = settings.EMBEDDING_BACKEND):
+        # Пул, в котором выполняются блокирующие encode и query
+        self.executor = executor or InferenceExecutor()
+        # Дисковый кэш эмбеддингов чанков, нужен только при загрузке базы знаний
+        self.embedding_store = embedding_store
+
         # Инициализация модели для эмбеддингов
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.backend = backend
+        # Кэши эмбеддингов не должны смешивать векторы разных бэкендов
+        self.model_key = embedding_model_key(model_name, backend)
+        self.model = load_embedding_model(model_name, backend)
+        self.encode_batcher = EncodeBatcher(self._encode_batch, self.executor)
+        self.query_cache = QueryEmbeddingCache(self.model_key)
 
-        # Инициализация ChromaDB
+        # Инициализация ChromaDB, импорт тяжелый, поэтому только при создании сервиса
+        import chromadb
         self.chroma_client = chromadb.PersistentClient(path=settings.VECTOR_DB_PATH)
         self.collection = self.chroma_client.get_or_create_collection(
             name="company_knowledge",
@@ -19,53 +40,185 @@ class EmbeddingService:
         )
 
     def add_documents(self, chunks: List[Dict[str, any]]) -> None:
-        """Добавляет чанки в ChromaDB"""
+        """Добавляет чанки в ChromaDB (существующие id перезаписываются)"""
+        if not chunks:
+            return
+
         contents = [chunk['content'] for chunk in chunks]
 
         # Создаем эмбеддинги
-        embeddings = self.model.encode(contents).tolist()
+        embeddings = self._encode_documents(contents).tolist()
 
         # Подготавливаем данные для ChromaDB
         ids = [chunk['chunk_id'] for chunk in chunks]
         metadatas = [self._prepare_metadata(chunk) for chunk in chunks]
 
-        # Добавляем в коллекцию ChromaDB
-        self.collection.add(
+        # Добавляем в коллекцию ChromaDB, upsert позволяет заливать батчами и повторно
+        self.collection.upsert(
             embeddings=embeddings,
             documents=contents,
             metadatas=metadatas,
             ids=ids
         )
 
+        # Сообщаем API, что база знаний изменилась
+        bump_index_version()
+
+    def delete_documents(self, chunk_ids: List[str]) -> None:
+        """Удаляет чанки из ChromaDB"""
+        if not chunk_ids:
+            return
+
+        self.collection.delete(ids=chunk_ids)
+        bump_index_version()
+
     def search_similar(self, query: str, k: int = 5) -> List[Dict[str, any]]:
         """Ищет похожие документы"""
         # Создаем эмбеддинг запроса
-        query_embedding = self.model.encode([query]).tolist()
+        query_embeddings = self.embed_queries([query])
+
+        return self.search_by_embeddings(query_embeddings, k)[0]
+
+    async def search_similar_async(self, query: str, k: int = 5,
+                                   query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, any]]:
+        """Ищет похожие документы в пуле инференса, не блокируя event loop"""
+        if query_embedding is None:
+            query_embedding = await self.embed_query_async(query)
+
+        results = await self.executor.run(self.search_by_embeddings, query_embedding[np.newaxis], k)
+        return results[0]
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Эмбеддинги запросов с учетом кэша, модель кодирует только промахи"""
+        embeddings = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
 
-        # Ищем в векторной базе
+        if missing:
+            encoded = self.model.encode([queries[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                self.query_cache.put(queries[i], embedding)
+                embeddings[i] = embedding
+
+        return np.vstack(embeddings)
+
+    def search_by_embeddings(self, query_embeddings: np.ndarray, k: int) -> List[List[Dict[str, any]]]:
+        """Ищет в векторной базе по готовым эмбеддингам, один список результатов на запрос"""
         results = self.collection.query(
-            query_embeddings=query_embedding,
+            query_embeddings=query_embeddings.tolist(),
             n_results=k,
             include=['documents', 'metadatas', 'distances']
         )
 
         # Форматируем результаты
         formatted_results = []
-        for i in range(len(results['ids'][0])):
-            formatted_results.append({
-                'content': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'similarity_score': 1 - results['distances'][0][i],  # Конвертируем distance в similarity
-                'chunk_id': results['ids'][0][i]
-            })
+        for q in range(len(results['ids'])):
+            query_results = []
+            for i in range(len(results['ids'][q])):
+                query_results.append({
+                    'content': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'similarity_score': 1 - results['distances'][q][i],  # Конвертируем distance в similarity
+                    'chunk_id': results['ids'][q][i]
+                })
+            formatted_results.append(query_results)
 
         return formatted_results
 
+    def get_documents(self, chunk_ids: List[str]) -> Dict[str, Dict[str, any]]:
+        """Чанки с эмбеддингами по id, отсутствующие в коллекции пропускаются"""
+        if not chunk_ids:
+            return {}
+
+        results = self.collection.get(ids=chunk_ids, include=['documents', 'metadatas', 'embeddings'])
+
+        return {
+            chunk_id: {
+                'content': results['documents'][i],
+                'metadata': results['metadatas'][i],
+                'embedding': np.asarray(results['embeddings'][i]),
+                'chunk_id': chunk_id
+            }
+            for i, chunk_id in enumerate(results['ids'])
+        }
+
+    async def get_documents_async(self, chunk_ids: List[str]) -> Dict[str, Dict[str, any]]:
+        """Чанки по id в пуле инференса"""
+        if not chunk_ids:
+            return {}
+
+        return await self.executor.run(self.get_documents, chunk_ids)
+
+    def get_all_documents(self) -> List[Dict[str, any]]:
+        """Все чанки коллекции в формате чанкера (текст и заголовок), для пересборки BM25"""
+        results = self.collection.get(include=['documents', 'metadatas'])
+
+        return [
+            {
+                'chunk_id': chunk_id,
+                'content': results['documents'][i],
+                'source_title': results['metadatas'][i]['source_title']
+            }
+            for i, chunk_id in enumerate(results['ids'])
+        ]
+
+    def get_chunk_sources(self) -> Dict[str, str]:
+        """id всех чанков коллекции и URL их страниц"""
+        results = self.collection.get(include=['metadatas'])
+
+        return {
+            chunk_id: (results['metadatas'][i] or {}).get('source_url', '')
+            for i, chunk_id in enumerate(results['ids'])
+        }
+
+    async def embed_query_async(self, query: str) -> np.ndarray:
+        """Эмбеддинг запроса из кэша или через микробатчер"""
+        query_embedding = self.query_cache.get(query)
+        if query_embedding is None:
+            # Эмбеддинг считается в общем батче с конкурентными запросами
+            query_embedding = await self.encode_batcher.encode(query)
+            self.query_cache.put(query, query_embedding)
+
+        return query_embedding
+
+    def warmup(self) -> None:
+        """Прогревает модель пробным эмбеддингом"""
+        self.model.encode(["warmup"])
+
+    def close(self) -> None:
+        """Освобождает клиент ChromaDB"""
+        # close() есть не во всех версиях chromadb
+        close = getattr(self.chroma_client, 'close', None)
+        if close is not None:
+            close()
+
+        if self.embedding_store is not None:
+            self.embedding_store.close()
+
+    def _encode_documents(self, contents: List[str]) -> np.ndarray:
+        """Эмбеддинги чанков с учетом дискового кэша, модель кодирует только новые тексты"""
+        if self.embedding_store is None:
+            return self.model.encode(contents)
+
+        cached = self.embedding_store.get_many(self.model_key, contents)
+        missing = [i for i in range(len(contents)) if i not in cached]
+
+        if missing:
+            encoded = self.model.encode([contents[i] for i in missing])
+            self.embedding_store.put_many(self.model_key, [contents[i] for i in missing], encoded)
+            cached.update(zip(missing, encoded))
+
+        return np.vstack([cached[i] for i in range(len(contents))])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Кодирует батч запросов одним вызовом модели"""
+        return self.model.encode(texts, batch_size=len(texts))
+
     def _prepare_metadata(self, chunk: Dict[str, any]) -> Dict[str, any]:
         """Подготавливает метаданные для ChromaDB"""
         return {
             'source_url': chunk['source_url'],
             'source_title': chunk['source_title'],
+            'title_tokens': title_tokens(chunk['source_title']),
             'chunk_index': chunk['chunk_index'],
             'total_chunks': chunk['total_chunks'],
             'word_count': chunk['word_count']
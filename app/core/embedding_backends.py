@@ -0,0 +1,112 @@
+import json
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+
+from config import settings
+
+DEFAULT_EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+ONNX_MODEL_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model.int8.onnx"
+}
+ONNX_CONFIG_FILE = "embedding_config.json"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+def embedding_model_key(model_name: str, backend: str = settings.EMBEDDING_BACKEND) -> str:
+    """Ключ модели для кэшей эмбеддингов: векторы разных бэкендов немного отличаются"""
+    if backend == "torch":
+        return model_name
+    return f"{model_name}@{backend}"
+
+
+class OnnxEmbeddingModel:
+    """Эмбеддинги через ONNX Runtime без torch: токенизатор HF tokenizers + пулинг как в sentence-transformers"""
+
+    def __init__(self, session: Any, tokenizer: Any, config: Dict[str, Any]):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.model_name = config.get('model_name')
+        self.pooling = config.get('pooling', 'mean')
+        self.normalize = config.get('normalize', False)
+        self.input_names = [model_input.name for model_input in session.get_inputs()]
+
+        self.tokenizer.enable_truncation(max_length=config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=config['pad_token_id'], pad_token=config['pad_token'])
+
+    @classmethod
+    def load(cls, model_dir: str = settings.EMBEDDING_ONNX_PATH, backend: str = "onnx") -> "OnnxEmbeddingModel":
+        """Загружает модель, выгруженную scripts/export_onnx.py"""
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.EMBEDDING_ONNX_THREADS:
+            options.intra_op_num_threads = settings.EMBEDDING_ONNX_THREADS
+
+        session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILES[backend]),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        return cls(session, tokenizer, config)
+
+    def encode(self, sentences: List[str], batch_size: int = 32, **kwargs: Any) -> np.ndarray:
+        """Эмбеддинги текстов, интерфейс как у SentenceTransformer.encode"""
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Сортировка по длине уменьшает паддинг внутри батча
+        order = np.argsort([-len(sentence) for sentence in sentences], kind='stable')
+        embeddings = [None] * len(sentences)
+
+        for start in range(0, len(sentences), batch_size):
+            batch_indices = order[start:start + batch_size]
+            for i, embedding in zip(batch_indices, self._encode_batch([sentences[i] for i in batch_indices])):
+                embeddings[i] = embedding
+
+        return np.vstack(embeddings)
+
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        """Один прогон модели и пулинг скрытых состояний"""
+        encodings = self.tokenizer.encode_batch(sentences)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {
+            'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            'attention_mask': attention_mask,
+            'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+
+        hidden_states = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+
+        if self.pooling == 'cls':
+            embeddings = hidden_states[:, 0]
+        else:
+            mask = attention_mask[:, :, np.newaxis].astype(hidden_states.dtype)
+            embeddings = (hidden_states * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+        if self.normalize:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        return embeddings.astype(np.float32)
+
+
+def load_embedding_model(model_name: str, backend: str = settings.EMBEDDING_BACKEND,
+                         onnx_path: str = settings.EMBEDDING_ONNX_PATH) -> Any:
+    """Модель эмбеддингов выбранного бэкенда, torch импортируется только для бэкенда torch"""
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    model = OnnxEmbeddingModel.load(onnx_path, backend)
+    if model.model_name != model_name:
+        raise ValueError(f"ONNX-модель выгружена для {model.model_name}, а ожидается {model_name}")
+    return model
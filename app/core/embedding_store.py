@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.utils.hashing import text_hash
+from config import settings
+
+# Ограничение SQLite на количество параметров в одном запросе
+_SQL_BATCH = 500
+
+
+class EmbeddingStore:
+    """Дисковый кэш эмбеддингов чанков в SQLite, ключ — (модель, sha256 текста)"""
+
+    def __init__(self, path: str = settings.EMBEDDING_STORE_PATH,
+                 max_mb: int = settings.EMBEDDING_STORE_MAX_MB):
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model_name: str, texts: List[str]) -> Dict[int, np.ndarray]:
+        """Возвращает найденные эмбеддинги по индексу текста в списке"""
+        positions: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(text_hash(text), []).append(i)
+
+        found: Dict[int, np.ndarray] = {}
+        hashes = list(positions)
+        with self._lock:
+            for start in range(0, len(hashes), _SQL_BATCH):
+                batch = hashes[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *batch]
+                ).fetchall()
+
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    for i in positions[key]:
+                        found[i] = vector
+
+                # Отмечаем использование для вытеснения по давности
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(time.time(), model_name, key) for key, _ in rows]
+                )
+            self._conn.commit()
+
+        return found
+
+    def put_many(self, model_name: str, texts: List[str], vectors: np.ndarray) -> None:
+        """Сохраняет эмбеддинги и вытесняет старые записи сверх лимита размера"""
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((model_name, text_hash(text), blob, len(blob), now))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Количество записей и занимаемый размер, в том числе по моделям"""
+        with self._lock:
+            total_entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+            models = self._conn.execute(
+                "SELECT model, COUNT(*), SUM(size) FROM embeddings GROUP BY model"
+            ).fetchall()
+
+        return {
+            'path': self.path,
+            'entries': total_entries,
+            'vectors_mb': round(total_bytes / 1024 / 1024, 3),
+            'max_mb': round(self.max_bytes / 1024 / 1024, 3),
+            'file_mb': round(os.path.getsize(self.path) / 1024 / 1024, 3),
+            'models': {model: {'entries': count, 'vectors_mb': round(size / 1024 / 1024, 3)}
+                       for model, count, size in models}
+        }
+
+    def evict(self) -> None:
+        """Вытесняет записи сверх лимита размера"""
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Удаляет все эмбеддинги"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def close(self) -> None:
+        """Закрывает соединение с SQLite"""
+        self._conn.close()
+
+    def _evict(self) -> None:
+        """Удаляет давно не использованные эмбеддинги, пока размер больше лимита"""
+        total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        excess = total_bytes - self.max_bytes
+        freed = 0
+        stale = []
+        for model, key, size in self._conn.execute(
+                "SELECT model, text_hash, size FROM embeddings ORDER BY last_used"
+        ):
+            stale.append((model, key))
+            freed += size
+            if freed >= excess:
+                break
+
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", stale)
@@ -0,0 +1,52 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.exceptions.exceptions import ServiceOverloadedException
+from config import settings
+
+
+class InferenceExecutor:
+    """Ограниченный пул потоков для блокирующих вычислений (эмбеддинги, запросы в ChromaDB)"""
+
+    def __init__(self, max_workers: int = settings.INFERENCE_MAX_WORKERS,
+                 max_queue: int = settings.INFERENCE_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        # Счетчик меняется только из event loop, блокировка не нужна
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Количество задач в работе и в очереди"""
+        return self._pending
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Выполняет функцию в пуле, при переполнении очереди отдает 503"""
+        if self._pending >= self.max_workers + self.max_queue:
+            raise ServiceOverloadedException()
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        self._pending += 1
+        # Слот освобождается, когда поток действительно закончил: отмена ожидающей корутины
+        # (отключение клиента, таймаут) не останавливает уже начатую работу
+        future.add_done_callback(lambda _: self._release(loop))
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _release(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Уменьшает счетчик из event loop; вызывается из потока пула по завершении задачи"""
+        try:
+            loop.call_soon_threadsafe(self._decrement)
+        except RuntimeError:
+            # Event loop уже закрыт, гонок со счетчиком нет
+            self._decrement()
+
+    def _decrement(self) -> None:
+        self._pending -= 1
+
+    def shutdown(self) -> None:
+        """Останавливает пул, отменяя задачи из очереди"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,329 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.interface import LlmInterface
+from app.exceptions.exceptions import LLMUnavailableException
+from app.utils.logging import get_logger
+from config import settings
+
+logger = get_logger(__name__)
+
+
+class CircuitBreaker:
+    """Автомат отключения провайдера: closed → open после серии ошибок → half-open через паузу"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = settings.LLM_CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opened_total = 0
+        # В half-open пропускаем один пробный запрос
+        self._probe_in_flight = False
+
+    def available(self) -> bool:
+        """Можно ли сейчас отправить запрос (без занятия пробы half-open)"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        return self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self._probe_in_flight)
+
+    def allow(self) -> bool:
+        """Разрешение на запрос; в half-open занимает единственную пробу"""
+        if not self.available():
+            return False
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        """Успешный ответ закрывает автомат"""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Ошибка; неудачная проба или серия ошибок открывает автомат"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_total += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Запрос отменен без результата: освобождаем пробу half-open"""
+        self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Задержки успешных ответов за последние window_seconds (не больше max_samples)"""
+
+    def __init__(self, window_seconds: float = settings.LLM_LATENCY_WINDOW_SECONDS,
+                 max_samples: int = 200):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+
+    def record(self, seconds: float) -> None:
+        """Добавляет замер"""
+        self._samples.append((time.monotonic(), seconds))
+
+    def percentile(self, q: float, min_samples: int = settings.LLM_LATENCY_MIN_SAMPLES) -> Optional[float]:
+        """Перцентиль задержки в секундах или None, если свежих замеров мало"""
+        expires_at = time.monotonic() - self.window_seconds
+        while self._samples and self._samples[0][0] < expires_at:
+            self._samples.popleft()
+
+        if len(self._samples) < min_samples:
+            return None
+        return float(np.percentile([seconds for _, seconds in self._samples], q))
+
+
+class ProviderState:
+    """Клиент провайдера, его автомат и статистика"""
+
+    def __init__(self, name: str, client: LlmInterface, breaker: CircuitBreaker, latency: LatencyTracker):
+        self.name = name
+        self.client = client
+        self.breaker = breaker
+        self.latency = latency
+        self.requests = 0
+        self.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return {
+            'state': self.breaker.state,
+            'requests': self.requests,
+            'failures': self.failures,
+            'circuit_opened_total': self.breaker.opened_total,
+            'p50_ms': None if p50 is None else 1000 * p50,
+            'p95_ms': None if p95 is None else 1000 * p95
+        }
+
+
+class FailoverLlmClient(LlmInterface):
+    """Несколько LLM-провайдеров за одним интерфейсом: отказоустойчивость, хеджирование и выбор по задержке"""
+
+    def __init__(self, clients: Dict[str, LlmInterface],
+                 attempt_timeout: float = settings.LLM_ATTEMPT_TIMEOUT_SECONDS,
+                 hedging_enabled: bool = settings.LLM_HEDGING_ENABLED,
+                 hedge_min_delay_ms: float = settings.LLM_HEDGE_MIN_DELAY_MS,
+                 hedge_default_delay_ms: float = settings.LLM_HEDGE_DEFAULT_DELAY_MS,
+                 latency_routing: bool = settings.LLM_LATENCY_ROUTING_ENABLED,
+                 slowdown_factor: float = settings.LLM_ROUTING_SLOWDOWN_FACTOR,
+                 failure_threshold: int = settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = settings.LLM_CIRCUIT_RESET_SECONDS):
+        if not clients:
+            raise ValueError("Нужен хотя бы один LLM-провайдер")
+
+        # Порядок словаря — приоритет провайдеров
+        self.providers = [
+            ProviderState(name, client, CircuitBreaker(failure_threshold, reset_seconds), LatencyTracker())
+            for name, client in clients.items()
+        ]
+        self.attempt_timeout = attempt_timeout
+        self.hedging_enabled = hedging_enabled
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.hedge_default_delay = hedge_default_delay_ms / 1000
+        self.latency_routing = latency_routing
+        self.slowdown_factor = slowdown_factor
+
+        self.failovers = 0
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    async def generate_response(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        """Ответ первого успешного провайдера; медленный запрос хеджируется следующим по порядку"""
+        candidates = self._route()
+        if not candidates:
+            self.rejected += 1
+            raise LLMUnavailableException("Все LLM-провайдеры временно отключены")
+
+        pending: Dict[asyncio.Task, ProviderState] = {}
+        errors = []
+        next_index = 0
+
+        def launch() -> None:
+            nonlocal next_index
+            while next_index < len(candidates):
+                provider = candidates[next_index]
+                next_index += 1
+                if provider.breaker.allow():
+                    pending[asyncio.create_task(self._call(provider, messages, kwargs))] = provider
+                    return
+
+        launch()
+        primary = next(iter(pending.values()), None)
+        try:
+            while pending:
+                # Хеджируем, пока в полете один запрос и есть кому его продублировать
+                can_hedge = self.hedging_enabled and len(pending) == 1 and next_index < len(candidates)
+                timeout = self._hedge_delay(next(iter(pending.values()))) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    slow_provider = next(iter(pending.values()))
+                    launch()
+                    if len(pending) > 1:
+                        self.hedged_requests += 1
+                        logger.info(f"LLM {slow_provider.name} отвечает долго, дублируем запрос")
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        # Дубль ответил раньше основного запроса
+                        if provider is not primary and pending:
+                            self.hedge_wins += 1
+                        return task.result()
+                    errors.append(f"{provider.name}: {task.exception()!r}")
+
+                if not pending:
+                    launch()
+                    if pending:
+                        self.failovers += 1
+                        logger.warning(f"Переключаемся на LLM {next(iter(pending.values())).name} "
+                                       f"после ошибки: {errors[-1]}")
+        finally:
+            # Проигравший хедж больше не нужен
+            for task in pending:
+                task.cancel()
+
+        raise LLMUnavailableException(f"Ни один LLM-провайдер не ответил: {'; '.join(errors)}")
+
+    async def stream_response(self, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[str]:
+        """Поток первого провайдера, начавшего отвечать; после первой дельты переключение невозможно"""
+        candidates = self._route()
+        if not candidates:
+            self.rejected += 1
+            raise LLMUnavailableException("Все LLM-провайдеры временно отключены")
+
+        errors = []
+        for provider in candidates:
+            if not provider.breaker.allow():
+                continue
+            if errors:
+                self.failovers += 1
+                logger.warning(f"Переключаемся на LLM {provider.name} после ошибки: {errors[-1]}")
+
+            provider.requests += 1
+            stream = provider.client.stream_response(messages, **kwargs)
+            try:
+                first_delta = await asyncio.wait_for(stream.__anext__(), self.attempt_timeout)
+            except StopAsyncIteration:
+                provider.breaker.record_success()
+                return
+            except asyncio.CancelledError:
+                provider.breaker.release()
+                raise
+            except Exception as e:
+                self._record_failure(provider, e)
+                errors.append(f"{provider.name}: {e!r}")
+                await stream.aclose()
+                continue
+
+            # Задержку потоков не учитываем: время до первого токена несравнимо с полным ответом
+            try:
+                yield first_delta
+                async for delta in stream:
+                    yield delta
+            except Exception as e:
+                # Обрыв посреди ответа — тоже ошибка провайдера, иначе автомат его никогда не отключит
+                self._record_failure(provider, e)
+                raise
+            except BaseException:
+                # Клиент закрыл поток раньше: результата нет, освобождаем пробу half-open
+                provider.breaker.release()
+                raise
+            else:
+                provider.breaker.record_success()
+            finally:
+                await stream.aclose()
+            return
+
+        raise LLMUnavailableException(f"Ни один LLM-провайдер не ответил: {'; '.join(errors)}")
+
+    async def warmup(self) -> None:
+        """Готовит всех провайдеров, ошибка одного не мешает остальным"""
+        results = await asyncio.gather(*(provider.client.warmup() for provider in self.providers),
+                                       return_exceptions=True)
+        for provider, result in zip(self.providers, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Не удалось подготовить LLM {provider.name}: {result}")
+
+    async def aclose(self) -> None:
+        """Закрывает соединения всех провайдеров"""
+        await asyncio.gather(*(provider.client.aclose() for provider in self.providers))
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние автоматов, задержки провайдеров и счетчики переключений"""
+        return {
+            'providers': {provider.name: provider.stats() for provider in self.providers},
+            'failovers': self.failovers,
+            'hedged_requests': self.hedged_requests,
+            'hedge_wins': self.hedge_wins,
+            'rejected': self.rejected
+        }
+
+    def _route(self) -> List[ProviderState]:
+        """Доступные провайдеры по приоритету; заметно медленные по p50 уходят в конец"""
+        available = [provider for provider in self.providers if provider.breaker.available()]
+        if not self.latency_routing or len(available) < 2:
+            return available
+
+        medians = {provider.name: provider.latency.percentile(50) for provider in available}
+        known = [median for median in medians.values() if median is not None]
+        if len(known) < 2:
+            return available
+
+        # Без свежих замеров провайдер не понижается: после окна он снова получит трафик и обновит статистику
+        limit = self.slowdown_factor * min(known)
+        fast = [provider for provider in available if medians[provider.name] is None or medians[provider.name] <= limit]
+        slow = [provider for provider in available if provider not in fast]
+        return fast + slow
+
+    def _hedge_delay(self, provider: ProviderState) -> float:
+        """Задержка перед дублирующим запросом: p95 провайдера, но не меньше минимума"""
+        p95 = provider.latency.percentile(95)
+        return max(self.hedge_min_delay, self.hedge_default_delay if p95 is None else p95)
+
+    async def _call(self, provider: ProviderState, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> str:
+        """Один запрос к провайдеру с таймаутом попытки и учетом в автомате"""
+        provider.requests += 1
+        started_at = time.perf_counter()
+        try:
+            answer = await asyncio.wait_for(provider.client.generate_response(messages, **kwargs),
+                                            self.attempt_timeout)
+        except asyncio.CancelledError:
+            provider.breaker.release()
+            raise
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+
+        provider.latency.record(time.perf_counter() - started_at)
+        provider.breaker.record_success()
+        return answer
+
+    @staticmethod
+    def _record_failure(provider: ProviderState, error: Exception) -> None:
+        """Учитывает ошибку провайдера"""
+        provider.failures += 1
+        provider.breaker.record_failure()
+        if provider.breaker.state == CircuitBreaker.OPEN:
+            logger.warning(f"LLM {provider.name} отключен на {provider.breaker.reset_seconds:.0f} с: {error!r}")
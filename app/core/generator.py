@@ -1,88 +1,178 @@
-from typing import List, Dict, Tuple
+import time
+from typing import List, Dict, Optional, AsyncIterator, Any
 
-from app.constants.generator import SYSTEM_PROMPT, NO_ANSWER_STR, ANSWER_PROMPT
-from app.core.interface import LLMProvider
+import numpy as np
+
+from app.constants.generator import SYSTEM_PROMPT, NO_ANSWER_STR, ANSWER_PROMPT, ERROR_ANSWER_STR
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.context_builder import AssembledContext, ContextBuilder
 from app.core.llm_factory import LLMClientFactory
-from app.utils.logging import get_logger
+from app.exceptions.exceptions import RAGException
+from app.utils.logging import get_logger, log_payload
+from app.utils.timing import StageTimings
 from config import settings
 
 logger = get_logger(__name__)
 
 
 class ResponseGenerator:
-    def __init__(self):
-        provider = LLMProvider(settings.LLM_PROVIDER)
-        self.llm_client = LLMClientFactory.create_client(provider)
+    def __init__(self, answer_cache: Optional[SemanticAnswerCache] = None,
+                 context_builder: Optional[ContextBuilder] = None):
+        # Основной и резервные провайдеры с переключением при сбоях
+        self.llm_client = LLMClientFactory.create_from_settings()
+        self.answer_cache = answer_cache
+        # Упаковка чанков в бюджет токенов промпта
+        self.context_builder = context_builder or ContextBuilder()
+
+        # Время сборки промпта и ответа LLM, отдается в /health/stats и /metrics
+        self.stage_timings = StageTimings()
+
+        # Время до первого токена в потоковых ответах
+        self.streams_total = 0
+        self.ttft_seconds_total = 0.0
+        self.ttft_max_seconds = 0.0
 
     async def generate_response_with_sources(self, query: str,
-                                             contexts: List[Dict]) -> str:
+                                             contexts: List[Dict],
+                                             query_embedding: Optional[np.ndarray] = None) -> str:
         """Генерирует ответ с указанием источников"""
-        if not contexts:
+        with self.stage_timings.measure('prompt_build'):
+            context = self.context_builder.build(contexts[:settings.MAX_SEARCH_RESULTS])
+            messages = self._build_messages(query, context)
+        if not context.chunk_ids:
             return NO_ANSWER_STR
 
-        # Подготавливаем контекст
-        context_text, links = self._prepare_context_and_links(contexts)
-
-        # Создаем сообщения для чата
-        messages = [
-            {
-                "role": "system",
-                "content": self._get_system_prompt()
-            },
-            {
-                "role": "user",
-                "content": self._create_prompt(query, context_text, links)
-            }
-        ]
+        # Семантический кэш: близкий вопрос с теми же чанками уже отвечен
+        use_cache = self.answer_cache is not None and query_embedding is not None
+        chunk_ids = context.chunk_ids
+        if use_cache:
+            cached_answer = self.answer_cache.get(query_embedding, chunk_ids)
+            if cached_answer is not None:
+                return cached_answer
 
         try:
             # Отправляем запрос
-            answer = await self.llm_client.generate_response(
-                messages=messages,
-                temperature=settings.TEMPERATURE,
-                max_tokens=500
-            )
+            with self.stage_timings.measure('llm_total'):
+                answer = await self.llm_client.generate_response(
+                    messages=messages,
+                    temperature=settings.TEMPERATURE,
+                    max_tokens=500
+                )
 
-            logger.info(f"Отправилит запрос: {messages}\n"
-                        f"Получили ответ:\n"
-                        f"{answer}")
+            logger.info(f"Получили ответ LLM: {len(answer)} символов, чанков в контексте {len(chunk_ids)}")
+            log_payload(logger, "Запрос и ответ LLM", messages=messages, answer=answer)
+
+            if use_cache:
+                self.answer_cache.put(query_embedding, chunk_ids, answer)
 
             return answer
 
+        except RAGException:
+            # Все провайдеры недоступны — клиент получает 503, а не текст ошибки с кодом 200
+            raise
         except Exception as e:
             logger.error(f"Ошибка генерации ответа: {e}")
-            return "Извините, произошла ошибка при формировании ответа."
-
-    def _get_system_prompt(self) -> str:
-        """Системный промт для настройки поведения"""
-        return SYSTEM_PROMPT
-
-    def _create_prompt(self, query: str, context: str, links: str) -> str:
-        """Создает промт для генерации ответа"""
+            return ERROR_ANSWER_STR
+
+    async def stream_response_with_sources(self, query: str,
+                                           contexts: List[Dict],
+                                           query_embedding: Optional[np.ndarray] = None) -> AsyncIterator[str]:
+        """Генерирует ответ с указанием источников потоком дельт"""
+        with self.stage_timings.measure('prompt_build'):
+            context = self.context_builder.build(contexts[:settings.MAX_SEARCH_RESULTS])
+            messages = self._build_messages(query, context)
+        if not context.chunk_ids:
+            yield NO_ANSWER_STR
+            return
+
+        use_cache = self.answer_cache is not None and query_embedding is not None
+        chunk_ids = context.chunk_ids
+        if use_cache:
+            cached_answer = self.answer_cache.get(query_embedding, chunk_ids)
+            if cached_answer is not None:
+                yield cached_answer
+                return
+
+        started_at = time.perf_counter()
+        parts = []
 
-        return f"""
-        Контекст:
-        {context}
+        try:
+            async for delta in self.llm_client.stream_response(
+                    messages=messages,
+                    temperature=settings.TEMPERATURE,
+                    max_tokens=500
+            ):
+                if not parts:
+                    self._record_ttft(time.perf_counter() - started_at)
+                parts.append(delta)
+                yield delta
+
+        except RAGException:
+            raise
+        except Exception as e:
+            # Часть ответа могла уже уйти клиенту: ошибку сообщает эндпоинт отдельным событием
+            logger.error(f"Ошибка потоковой генерации ответа: {e}")
+            raise
+
+        self.stage_timings.record('llm_total', time.perf_counter() - started_at)
+        answer = "".join(parts).strip()
+        logger.info(f"Получили потоковый ответ LLM: {len(answer)} символов, чанков в контексте {len(chunk_ids)}")
+        log_payload(logger, "Потоковый запрос и ответ LLM", messages=messages, answer=answer)
+
+        if use_cache and answer:
+            self.answer_cache.put(query_embedding, chunk_ids, answer)
+
+    def stream_stats(self) -> Dict[str, Any]:
+        """Метрики времени до первого токена"""
+        return {
+            'streams_total': self.streams_total,
+            'ttft_avg_ms': 1000 * self.ttft_seconds_total / self.streams_total if self.streams_total else 0.0,
+            'ttft_max_ms': 1000 * self.ttft_max_seconds
+        }
+
+    async def warmup(self) -> None:
+        """Готовит LLM-клиент, ошибка не мешает старту сервиса"""
+        try:
+            await self.llm_client.warmup()
+        except Exception as e:
+            logger.warning(f"Не удалось подготовить LLM-клиент: {e}")
 
-        Ссылки:
-        {links}
+    async def aclose(self) -> None:
+        """Закрывает соединения LLM-клиента"""
+        await self.llm_client.aclose()
 
-        Вопрос клиента:
-        {query}
+    def _record_ttft(self, seconds: float) -> None:
+        """Учитывает время до первого токена"""
+        self.streams_total += 1
+        self.ttft_seconds_total += seconds
+        self.ttft_max_seconds = max(self.ttft_max_seconds, seconds)
+        self.stage_timings.record('llm_first_token', seconds)
+        logger.info(f"Время до первого токена: {1000 * seconds:.0f} мс")
 
-        {ANSWER_PROMPT}
-        """
+    def _build_messages(self, query: str, context: AssembledContext) -> List[Dict[str, str]]:
+        """Собирает сообщения для чата"""
+        logger.info(f"Контекст: {len(context.chunk_ids)} чанков, {context.tokens} токенов")
 
-    def _prepare_context_and_links(self, contexts: List[Dict]) -> Tuple[str, str]:
-        """Подготавливает контекст и ссылки для промта"""
-        context_parts = []
-        links = []
+        return [
+            {
+                "role": "system",
+                "content": self._get_system_prompt()
+            },
+            {
+                "role": "user",
+                "content": self._create_prompt(query, context.text, context.links)
+            }
+        ]
 
-        for i, ctx in enumerate(contexts[:settings.MAX_SEARCH_RESULTS]):
-            source_info = f"Источник: {ctx['metadata']['source_title']}"
-            content = f"Контекст: {ctx['content']}"
-            url = f"Ссылка: {ctx['metadata']['source_url']}"
-            context_parts.append(f"{source_info} {content} {url}\n")
-            links.append(ctx['metadata']['source_url'])
+    def _get_system_prompt(self) -> str:
+        """Системный промт для настройки поведения"""
+        return SYSTEM_PROMPT.strip()
 
-        return "\n---\n".join(context_parts), "\n---\n".join(links)
+    def _create_prompt(self, query: str, context: str, links: str) -> str:
+        """Создает промт для генерации ответа, без отступов: пробелы тоже стоят токенов"""
+        return (
+            f"Контекст:\n{context}\n\n"
+            f"Ссылки:\n{links}\n\n"
+            f"Вопрос клиента:\n{query}\n\n"
+            f"{ANSWER_PROMPT.strip()}"
+        )
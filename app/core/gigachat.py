@@ -1,14 +1,16 @@
+import asyncio
 import time
 import uuid
+from typing import AsyncIterator, Dict, Optional
 
-import httpx
-
+from app.core.http import create_http_client, iter_sse_deltas
 from app.core.interface import LlmInterface
 from app.utils.logging import get_logger
 from config import settings
 
 logger = get_logger(__name__)
 
+
 class GigaChatClient(LlmInterface):
     """Клиент для работы с GigaChat API"""
 
@@ -17,16 +19,61 @@ class GigaChatClient(LlmInterface):
         self.api_key = settings.GIGACHAT_API_KEY
         self.scope = settings.GIGACHAT_SCOPE
         self.model = settings.GIGACHAT_MODEL
+        self.auth_url = settings.GIGACHAT_AUTH_URL
+        self.refresh_margin = settings.GIGACHAT_TOKEN_REFRESH_MARGIN
+        self.proactive_lead = settings.GIGACHAT_TOKEN_PROACTIVE_LEAD
         self.access_token = None
         self.token_expires_at = 0
+        # Общий пул соединений для OAuth и запросов к модели
+        self.http_client = create_http_client(timeout=30.0, verify=False)
+        # Единственное обновление токена в полете и таймер фонового обновления
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._proactive_refresh: Optional[asyncio.TimerHandle] = None
+
+    async def warmup(self) -> None:
+        """Получает токен заранее, чтобы первый запрос его не ждал"""
+        await self._get_access_token()
 
     async def _get_access_token(self) -> str:
         """Получение access token для GigaChat"""
-        if self.access_token and time.time() < self.token_expires_at - 300:  # 5 минут запас
+        if self.access_token and time.time() < self.token_expires_at - self.refresh_margin:
             return self.access_token
 
-        auth_url = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
-
+        # Конкурентные запросы ждут одно и то же обновление токена
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Запускает обновление токена, если оно ещё не идет"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_token())
+        return self._refresh_task
+
+    def _schedule_proactive_refresh(self) -> None:
+        """Планирует фоновое обновление незадолго до устаревания токена"""
+        if self._proactive_refresh is not None:
+            self._proactive_refresh.cancel()
+            self._proactive_refresh = None
+
+        delay = self.token_expires_at - self.refresh_margin - self.proactive_lead - time.time()
+        if delay <= 0:
+            # Токен живет слишком мало для фонового обновления, обновится по запросу
+            return
+
+        self._proactive_refresh = asyncio.get_running_loop().call_later(delay, self._run_proactive_refresh)
+
+    def _run_proactive_refresh(self) -> None:
+        """Фоновое обновление токена, ошибки только логируются"""
+        self._proactive_refresh = None
+        task = self._start_refresh()
+        task.add_done_callback(self._log_proactive_refresh_error)
+
+    def _log_proactive_refresh_error(self, task: asyncio.Task) -> None:
+        """Забирает исключение фоновой задачи, запрос обновит токен сам"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Фоновое обновление токена GigaChat не удалось: {task.exception()}")
+
+    async def _refresh_token(self) -> str:
+        """Запрос нового access token в OAuth"""
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded',
             'Accept': 'application/json',
@@ -38,22 +85,22 @@ class GigaChatClient(LlmInterface):
             'scope': self.scope
         }
 
-        async with httpx.AsyncClient(verify=False) as client:
-            try:
-                response = await client.post(auth_url, headers=headers, data=data)
-                response.raise_for_status()
+        try:
+            response = await self.http_client.post(self.auth_url, headers=headers, data=data)
+            response.raise_for_status()
 
-                token_data = response.json()
-                self.access_token = token_data['access_token']
-                # Время жизни токена обычно 30 минут
-                self.token_expires_at = time.time() + token_data.get('expires_in', 1800)
+            token_data = response.json()
+            self.access_token = token_data['access_token']
+            # Время жизни токена обычно 30 минут
+            self.token_expires_at = time.time() + token_data.get('expires_in', 1800)
 
-                logger.info("GigaChat access_token получен успешно")
-                return self.access_token
+            logger.info("GigaChat access_token получен успешно")
+            self._schedule_proactive_refresh()
+            return self.access_token
 
-            except Exception as e:
-                logger.error(f"Ошибка получения токена GigaChat: {e}")
-                raise Exception(f"Не удалось получить токен доступа: {e}")
+        except Exception as e:
+            logger.error(f"Ошибка получения токена GigaChat: {e}")
+            raise Exception(f"Не удалось получить токен доступа: {e}")
 
     async def generate_response(self, messages: list, temperature: float = 0.7,
                                 max_tokens: int = 512) -> str:
@@ -61,37 +108,72 @@ class GigaChatClient(LlmInterface):
         try:
             access_token = await self._get_access_token()
 
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-                'Authorization': f'Bearer {access_token}',
-                'X-Request-ID': str(uuid.uuid4())
-            }
-
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                "repetition_penalty": 1.1,
-                "update_interval": 0
-            }
-
-            async with httpx.AsyncClient(verify=False, timeout=30.0) as client:
-                response = await client.post(
+            response = await self.http_client.post(
+                f"{self.base_url}/chat/completions",
+                headers=self._build_headers(access_token),
+                json=self._build_payload(messages, temperature, max_tokens)
+            )
+            response.raise_for_status()
+
+            result = response.json()
+
+            if 'choices' in result and len(result['choices']) > 0:
+                return result['choices'][0]['message']['content'].strip()
+            else:
+                raise Exception("Некорректный ответ от GigaChat API")
+
+        except Exception as e:
+            logger.error(f"Ошибка генерации ответа GigaChat: {e}")
+            raise Exception(f"Ошибка обращения к GigaChat: {e}")
+
+    async def stream_response(self, messages: list, temperature: float = 0.7,
+                              max_tokens: int = 512) -> AsyncIterator[str]:
+        """Потоковая генерация ответа через GigaChat API"""
+        try:
+            access_token = await self._get_access_token()
+
+            payload = self._build_payload(messages, temperature, max_tokens)
+            payload["stream"] = True
+
+            async with self.http_client.stream(
+                    "POST",
                     f"{self.base_url}/chat/completions",
-                    headers=headers,
+                    headers=self._build_headers(access_token),
                     json=payload
-                )
+            ) as response:
                 response.raise_for_status()
 
-                result = response.json()
-
-                if 'choices' in result and len(result['choices']) > 0:
-                    return result['choices'][0]['message']['content'].strip()
-                else:
-                    raise Exception("Некорректный ответ от GigaChat API")
+                async for delta in iter_sse_deltas(response):
+                    yield delta
 
         except Exception as e:
-            logger.error(f"Ошибка генерации ответа GigaChat: {e}")
+            logger.error(f"Ошибка потоковой генерации ответа GigaChat: {e}")
             raise Exception(f"Ошибка обращения к GigaChat: {e}")
+
+    async def aclose(self) -> None:
+        """Останавливает фоновое обновление токена и закрывает пул соединений"""
+        if self._proactive_refresh is not None:
+            self._proactive_refresh.cancel()
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        await self.http_client.aclose()
+
+    def _build_headers(self, access_token: str) -> Dict[str, str]:
+        """Заголовки запроса к GigaChat"""
+        return {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {access_token}',
+            'X-Request-ID': str(uuid.uuid4())
+        }
+
+    def _build_payload(self, messages: list, temperature: float, max_tokens: int) -> Dict:
+        """Тело запроса к GigaChat"""
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "repetition_penalty": 1.1,
+            "update_interval": 0
+        }
@@ -0,0 +1,61 @@
+import json
+import time
+from typing import AsyncIterator
+
+import httpx
+
+from app.utils.logging import get_logger
+from app.utils.metrics import STAGE_SECONDS
+from config import settings
+
+logger = get_logger(__name__)
+
+
+def create_http_client(timeout: float, verify: bool = True) -> httpx.AsyncClient:
+    """Создает долгоживущий клиент с пулом keep-alive соединений к LLM-провайдеру"""
+    http2 = settings.LLM_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("Пакет h2 не установлен, HTTP/2 отключен")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY
+    )
+
+    return httpx.AsyncClient(timeout=timeout, verify=verify, limits=limits, http2=http2,
+                             event_hooks={'request': [_mark_request_start], 'response': [_record_ttfb]})
+
+
+async def _mark_request_start(request: httpx.Request) -> None:
+    """Запоминает момент отправки запроса"""
+    request.extensions['started_at'] = time.perf_counter()
+
+
+async def _record_ttfb(response: httpx.Response) -> None:
+    """Время до заголовков ответа LLM (хук вызывается до чтения тела); запросы токена не учитываются"""
+    started_at = response.request.extensions.get('started_at')
+    if started_at is not None and response.request.url.path.endswith("/chat/completions"):
+        STAGE_SECONDS.observe('llm_ttfb', time.perf_counter() - started_at)
+
+
+async def iter_sse_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    """Разбирает SSE-поток chat/completions и отдает дельты текста"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+
+        chunk = json.loads(data)
+        choices = chunk.get('choices') or []
+        if choices:
+            delta = choices[0].get('delta', {}).get('content')
+            if delta:
+                yield delta
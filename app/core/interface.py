@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Union, List, Dict, Any
+from typing import Union, List, Dict, Any, AsyncIterator
 
 
 class LLMProvider(str, Enum):
@@ -19,3 +19,19 @@ class LlmInterface(ABC):
     ) -> str:
         """Абстрактный метод получения ответа от LLM"""
         pass
+
+    async def stream_response(
+            self,
+            messages: Union[List[Dict[str, str]], list],
+            **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Потоковый ответ LLM (дельты токенов), по умолчанию одним куском"""
+        yield await self.generate_response(messages, **kwargs)
+
+    async def warmup(self) -> None:
+        """Подготовка клиента до первого запроса (например, получение токена)"""
+        pass
+
+    async def aclose(self) -> None:
+        """Освобождает ресурсы клиента (пул соединений)"""
+        pass
@@ -0,0 +1,187 @@
+import json
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+
+BM25_INDEX_FILE = "bm25_index.json"
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Служебные слова не несут смысла для поиска по ключевым словам
+RUSSIAN_STOPWORDS = frozenset("""
+а без более бы был была были было быть в вам вас весь во вот все всего всех вы где да даже для до его
+ее ей ему если есть еще же за здесь и из или им их к как ко когда кто ли либо мне может мы на над надо
+наш не него нее нет ни них но ну о об однако он она они оно от очень по под при про с со так также такой
+там те тем то того тоже той только том ты у уже хотя чего чей чем что чтобы чье эта эти это этот я
+какие какой какая каких кейс кейсы компания компании расскажи расскажите делали сделали
+the a an and or of to in on for with is are was were
+""".split())
+
+# Окончания русских слов, от длинных к коротким; отрезаем одно, оставляя основу не короче 3 букв
+_RUSSIAN_SUFFIXES = sorted("""
+ями ами ией иям ием иях ого его ому ему ыми ими ость ости остью ций ция ции цию ться ется ются ится ятся
+ешь ете ем ет ут ют ит ят ишь ите ил ила ило или ал ала ало али ый ий ой ая яя ое ее ые ие ую юю ом ем ах ях ам
+ям ов ев ей ью ия ие ии ию ть ся а я о е ы и у ю ь й
+""".split(), key=len, reverse=True)
+
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+
+def stem(token: str) -> str:
+    """Грубый стемминг: отрезает одно окончание у русских слов, латиницу и числа не трогает"""
+    if len(token) <= 4 or not _CYRILLIC_RE.search(token):
+        return token
+
+    for suffix in _RUSSIAN_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Токены для BM25: нижний регистр, ё -> е, без стоп-слов, со стеммингом"""
+    tokens = _TOKEN_RE.findall(text.lower().replace("ё", "е"))
+    return [stem(token) for token in tokens if len(token) > 1 and token not in RUSSIAN_STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> Dict[str, float]:
+    """Reciprocal rank fusion: сумма 1 / (k + ранг) по всем спискам"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+class BM25Index:
+    """Инвертированный индекс BM25 по чанкам, хранится JSON-файлом рядом с ChromaDB"""
+
+    def __init__(self, path: str = os.path.join(settings.VECTOR_DB_PATH, BM25_INDEX_FILE),
+                 k1: float = settings.BM25_K1, b: float = settings.BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        # term -> {chunk_id: tf}, chunk_id -> длина в токенах
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self._mtime_ns = 0
+
+        # Веса BM25 по термам пересчитываются лениво после изменений индекса
+        self._compiled: Optional[Tuple[List[str], Dict[str, Tuple[np.ndarray, np.ndarray]]]] = None
+
+    @classmethod
+    def load(cls, path: str = os.path.join(settings.VECTOR_DB_PATH, BM25_INDEX_FILE)) -> "BM25Index":
+        """Читает индекс, если его нет — возвращает пустой"""
+        index = cls(path)
+        try:
+            index._mtime_ns = os.stat(path).st_mtime_ns
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return index
+
+        index.postings = data.get('postings', {})
+        index.doc_lengths = data.get('doc_lengths', {})
+        return index
+
+    def save(self) -> None:
+        """Атомарно сохраняет индекс"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'postings': self.postings, 'doc_lengths': self.doc_lengths}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime_ns = os.stat(self.path).st_mtime_ns
+
+    def is_stale(self) -> bool:
+        """Файл индекса перезаписан после загрузки (прошла переиндексация)"""
+        try:
+            return os.stat(self.path).st_mtime_ns != self._mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add_documents(self, chunks: List[Dict[str, Any]]) -> None:
+        """Индексирует чанки, существующие id перезаписываются"""
+        self.remove_documents([chunk['chunk_id'] for chunk in chunks if chunk['chunk_id'] in self.doc_lengths])
+
+        for chunk in chunks:
+            # Заголовок индексируем вместе с текстом: в нем обычно название клиента
+            tokens = tokenize(f"{chunk.get('source_title', '')} {chunk['content']}")
+            self.doc_lengths[chunk['chunk_id']] = len(tokens)
+
+            term_counts: Dict[str, int] = {}
+            for token in tokens:
+                term_counts[token] = term_counts.get(token, 0) + 1
+            for term, tf in term_counts.items():
+                self.postings.setdefault(term, {})[chunk['chunk_id']] = tf
+
+        self._compiled = None
+
+    def remove_documents(self, chunk_ids: List[str]) -> None:
+        """Удаляет чанки из индекса"""
+        removed = {chunk_id for chunk_id in chunk_ids if self.doc_lengths.pop(chunk_id, None) is not None}
+        if not removed:
+            return
+
+        for term in list(self.postings):
+            term_postings = self.postings[term]
+            for chunk_id in removed.intersection(term_postings):
+                del term_postings[chunk_id]
+            if not term_postings:
+                del self.postings[term]
+
+        self._compiled = None
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Топ-k чанков по BM25 в порядке убывания скора"""
+        terms = set(tokenize(query))
+        if not terms or not self.doc_lengths:
+            return []
+
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self._compiled = self._compile()
+        doc_ids, term_weights = compiled
+
+        scores = np.zeros(len(doc_ids), dtype=np.float32)
+        for term in terms:
+            weights = term_weights.get(term)
+            if weights is not None:
+                doc_indices, term_scores = weights
+                scores[doc_indices] += term_scores
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+
+        return [(doc_ids[i], float(scores[i])) for i in matched]
+
+    def _compile(self) -> Tuple[List[str], Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+        """Предрасчет вклада каждого терма в скор документа, поиск сводится к сложению массивов"""
+        doc_ids = list(self.doc_lengths)
+        positions = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        lengths = np.array([self.doc_lengths[doc_id] for doc_id in doc_ids], dtype=np.float32)
+        avg_length = float(lengths.mean()) or 1.0
+        total_docs = len(doc_ids)
+
+        term_weights = {}
+        for term, term_postings in self.postings.items():
+            doc_indices = np.array([positions[doc_id] for doc_id in term_postings], dtype=np.int64)
+            tf = np.array(list(term_postings.values()), dtype=np.float32)
+
+            idf = math.log(1 + (total_docs - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[doc_indices] / avg_length)
+            term_weights[term] = (doc_indices, idf * tf * (self.k1 + 1) / (tf + norm))
+
+        return doc_ids, term_weights
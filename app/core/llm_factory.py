@@ -1,9 +1,11 @@
 from typing import Dict, Type
 
+from app.core.failover import FailoverLlmClient
 from app.core.sonar import SonarClient
 from app.core.gigachat import GigaChatClient
 from app.core.interface import LLMProvider
 from app.core.interface import LlmInterface
+from config import settings
 
 
 class LLMClientFactory:
@@ -22,3 +24,10 @@ class LLMClientFactory:
 
         client_class = cls._clients[provider]
         return client_class(**kwargs)
+
+    @classmethod
+    def create_from_settings(cls) -> FailoverLlmClient:
+        """Основной провайдер и резервные из настроек за автоматом отключения и хеджированием"""
+        names = [settings.LLM_PROVIDER] + [name.strip() for name in settings.LLM_FALLBACK_PROVIDERS.split(",")]
+        providers = list(dict.fromkeys(LLMProvider(name) for name in names if name))
+        return FailoverLlmClient({provider.value: cls.create_client(provider) for provider in providers})
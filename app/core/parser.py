@@ -1,38 +1,217 @@
 import re
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Union
 
+import httpx
 import requests
 from bs4 import BeautifulSoup
 
 from app.utils.logging import get_logger
+from config import settings
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml необязателен, без него разбор идет через BeautifulSoup
+    lxml = None
 
 logger = get_logger(__name__)
 
+# Версия результата parse_html: увеличивается при любом изменении разбора или очистки текста,
+# страницы, проиндексированные другой версией, при следующей загрузке нарезаются заново
+PARSER_VERSION = 2
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                  'AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+# Служебные блоки, которые вырезаются до извлечения заголовка и контента
+UNWANTED_SELECTORS = [
+    'script', 'style', 'nav', 'footer', 'header',
+    '.sidebar', '.menu', '.ads', '.popup', '.modal',
+    '.cookie-banner', '.newsletter', '.comments'
+]
+
+# Селекторы по приоритету: берется первый элемент каждого селектора
+TITLE_SELECTORS = [
+    'h1',
+    '.case-title',
+    '.project-title',
+    '.page-title',
+    '.entry-title',
+    '.post-title',
+    'title'
+]
+
+CONTENT_SELECTORS = [
+    'main',
+    'article',
+    '.case-content',
+    '.project-details',
+    '.content',
+    '.post-content',
+    '.article-content',
+    '.entry-content',
+    '#content',
+    '.project-description',
+    '.main-content'
+]
+
+# Вырезаются из body, только если ни один селектор контента не подошел
+BODY_NOISE_SELECTORS = ['.navigation', '.menu', '.sidebar', '.footer', '.header']
+
+MIN_CONTENT_LENGTH = 100
+NO_TITLE = "Без названия"
+
+SPECIAL_CHARS_RE = re.compile(r'[^\w\s\-.,!?;:()\[\]"\'«»]')
+BRACKETS_RE = re.compile(r'\[.*?\]', re.DOTALL)
+
+# Служебные фразы сайта Eora: (фраза в casefold для быстрой проверки, регулярка без учета регистра)
+SITE_PHRASES = [
+    (phrase.casefold(), re.compile(phrase, re.IGNORECASE | re.DOTALL))
+    for phrase in [
+        "Нажимая на кнопку, вы соглашаетесь с нашей Политикой в отношении обработки персональных данных пользователей",
+        "Перейти в портфолио Обязательное поле",
+        "Пожалуйста, введите корректный e-mail адрес",
+        "Пожалуйста, введите корректное имя",
+        "Пожалуйста, введите корректный номер телефона",
+        "Слишком короткое значение Send Обязательное поле"
+    ]
+]
+
+CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+# lxml достраивает body сам, html.parser — нет: без тега body в исходнике откат на body не делается
+BODY_TAG_RE = re.compile(r'<body[\s/>]', re.IGNORECASE)
+
+# Текст этих тегов BeautifulSoup хранит особыми строками и не включает в get_text()
+HIDDEN_TEXT_TAGS = frozenset(['template', 'rt', 'rp'])
+
+
+def selector_to_xpath(selector: str) -> str:
+    """Условие XPath для простого CSS-селектора: тег, .класс или #id"""
+    if selector.startswith('.'):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {selector[1:]} ')"
+    if selector.startswith('#'):
+        return f"@id='{selector[1:]}'"
+    return f"self::{selector}"
+
+
+def matches_selector(element, selector: str) -> bool:
+    """Соответствует ли элемент lxml простому CSS-селектору"""
+    if selector.startswith('.'):
+        return selector[1:] in (element.get('class') or '').split()
+    if selector.startswith('#'):
+        return element.get('id') == selector[1:]
+    return element.tag == selector
+
+
+ALL_SELECTORS = list(dict.fromkeys(UNWANTED_SELECTORS + TITLE_SELECTORS + CONTENT_SELECTORS + BODY_NOISE_SELECTORS))
+
+# Один скомпилированный запрос находит всех кандидатов в порядке документа за один проход libxml2:
+# условия объединены через or, а не union путей — иначе дерево обходилось бы на каждый селектор.
+# Теги со скрытым текстом ищутся тем же запросом: по ним решается, нужен ли медленный обход текста
+CANDIDATES_XPATH = (
+    etree.XPath(f"//*[{' or '.join(map(selector_to_xpath, ALL_SELECTORS + sorted(HIDDEN_TEXT_TAGS)))}]")
+    if lxml is not None else None
+)
+
+
+def element_text(element) -> str:
+    """Текст элемента без содержимого template, rt и rp, как get_text() BeautifulSoup"""
+    if any(ancestor.tag in HIDDEN_TEXT_TAGS for ancestor in element.iterancestors()):
+        return ""
+
+    parts = []
+    walker = etree.iterwalk(element, events=('start', 'end', 'comment', 'pi'))
+    for event, node in walker:
+        if event == 'start':
+            if node.tag in HIDDEN_TEXT_TAGS:
+                walker.skip_subtree()
+            elif node.text:
+                parts.append(node.text)
+        elif node is not element and node.tail:
+            # Хвост после закрывающего тега, комментария или инструкции обработки
+            parts.append(node.tail)
+    return ''.join(parts)
+
 
 class HTMLParser:
-    def __init__(self):
+    def __init__(self, engine: str = settings.HTML_PARSER_ENGINE):
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                          'AppleWebKit/537.36 (KHTML, like Gecko) '
-                          'Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.session.headers.update(DEFAULT_HEADERS)
+
+        if engine == "auto":
+            engine = "lxml" if lxml is not None else "bs4"
+        elif engine == "lxml" and lxml is None:
+            logger.warning("Пакет lxml не установлен, HTML разбирается через BeautifulSoup")
+            engine = "bs4"
+        self.engine = engine
 
     def parse_page(self, url: str) -> Optional[Dict[str, str]]:
         """Извлекает структурированную информацию со страницы"""
+        html = self.fetch_page(url)
+        if html is None:
+            return None
+
+        return self.parse_html(url, html)
+
+    def fetch_page(self, url: str) -> Optional[bytes]:
+        """Загружает страницу"""
         try:
             response = self.session.get(url, timeout=30)
             response.raise_for_status()
+            return response.content
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+        except requests.RequestException as e:
+            logger.error(f"Ошибка запроса {url}: {e}")
+            return None
 
-            unwanted_tags = [
-                'script', 'style', 'nav', 'footer', 'header',
-                '.sidebar', '.menu', '.ads', '.popup', '.modal',
-                '.cookie-banner', '.newsletter', '.comments'
-            ]
+    async def fetch_page_async(self, client: httpx.AsyncClient, url: str,
+                               etag: Optional[str] = None,
+                               last_modified: Optional[str] = None) -> Optional[Dict[str, any]]:
+        """Условная загрузка страницы (If-None-Match / If-Modified-Since) через общий клиент"""
+        headers = dict(DEFAULT_HEADERS)
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
 
-            for selector in unwanted_tags:
+        try:
+            response = await client.get(url, headers=headers, timeout=30)
+            if response.status_code not in (304, 404, 410):
+                response.raise_for_status()
+
+            # content есть только у 200, для 304/404/410 важен лишь статус
+            return {
+                'status_code': response.status_code,
+                'content': response.content if response.status_code == 200 else None,
+                'etag': response.headers.get('ETag', etag),
+                'last_modified': response.headers.get('Last-Modified', last_modified)
+            }
+
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка запроса {url}: {e}")
+            return None
+
+    def parse_html(self, url: str, html: Union[bytes, str]) -> Optional[Dict[str, str]]:
+        """Извлекает структурированную информацию из HTML страницы"""
+        if self.engine == "lxml":
+            try:
+                return self._parse_with_lxml(url, html)
+            except Exception as e:
+                # Нестандартная кодировка или битая разметка — разбираем медленным, но терпимым путем
+                logger.warning(f"lxml не разобрал {url}, используем BeautifulSoup: {e}")
+
+        return self._parse_with_bs4(url, html)
+
+    def _parse_with_bs4(self, url: str, html: Union[bytes, str]) -> Optional[Dict[str, str]]:
+        """Разбор через BeautifulSoup (html.parser)"""
+        try:
+            soup = BeautifulSoup(html, 'html.parser')
+
+            for selector in UNWANTED_SELECTORS:
                 for tag in soup.select(selector):
                     tag.decompose()
 
@@ -40,66 +219,114 @@ class HTMLParser:
             title = self._extract_title(soup)
             content = self._extract_content(soup)
 
-            if not content.strip():
-                logger.warning(f"Пустой контент для {url}")
-                return None
-
-            return {
-                'url': url,
-                'title': title,
-                'content': self._clean_text(content),
-                'word_count': len(content.split()),
-                'char_count': len(content)
-            }
+            return self._build_document(url, title, content)
 
-        except requests.RequestException as e:
-            logger.error(f"Ошибка запроса {url}: {e}")
-            return None
         except Exception as e:
             logger.error(f"Ошибка парсинга {url}: {e}")
             return None
 
+    def _parse_with_lxml(self, url: str, html: Union[bytes, str]) -> Optional[Dict[str, str]]:
+        """Разбор через lxml: один XPath-запрос по дереву, дальше работа только с кандидатами"""
+        source = self._decode(html)
+        root = lxml.html.document_fromstring(source)
+        candidates = CANDIDATES_XPATH(root)
+        # Медленный обход дерева нужен, только если на странице есть скрытый от get_text() текст
+        hidden = any(element.tag in HIDDEN_TEXT_TAGS for element in candidates)
+        get_text = element_text if hidden else lxml.html.HtmlElement.text_content
+
+        # Служебные блоки вырезаем до поиска заголовка и контента, текст после них остается
+        for element in candidates:
+            if element.getparent() is not None and any(matches_selector(element, s) for s in UNWANTED_SELECTORS):
+                element.drop_tree()
+
+        first: Dict[str, object] = {}
+        body_noise: List[object] = []
+        for element in candidates:
+            if not self._attached(element, root):
+                continue
+            for selector in TITLE_SELECTORS + CONTENT_SELECTORS:
+                if selector not in first and matches_selector(element, selector):
+                    first[selector] = element
+            if any(matches_selector(element, s) for s in BODY_NOISE_SELECTORS):
+                body_noise.append(element)
+
+        title = NO_TITLE
+        for selector in TITLE_SELECTORS:
+            text = get_text(first[selector]).strip() if selector in first else ""
+            if text:
+                title = text
+                break
+
+        content = None
+        for selector in CONTENT_SELECTORS:
+            if selector in first:
+                text = get_text(first[selector])
+                if len(text.strip()) > MIN_CONTENT_LENGTH:
+                    content = text
+                    break
+
+        if content is None:
+            body = root.find('body') if BODY_TAG_RE.search(source) else None
+            content = ""
+            if body is not None:
+                for element in body_noise:
+                    if self._attached(element, body):
+                        element.drop_tree()
+                content = get_text(body)
+
+        return self._build_document(url, title, content)
+
+    def _build_document(self, url: str, title: str, content: str) -> Optional[Dict[str, str]]:
+        """Документ с очищенным текстом; None, если контента нет"""
+        if not content.strip():
+            logger.warning(f"Пустой контент для {url}")
+            return None
+
+        return {
+            'url': url,
+            'title': title,
+            'content': self._clean_text(content),
+            'word_count': len(content.split()),
+            'char_count': len(content)
+        }
+
+    @staticmethod
+    def _decode(html: Union[bytes, str]) -> str:
+        """Текст страницы по кодировке из BOM или meta, иначе utf-8; ошибка отправит разбор в BeautifulSoup"""
+        if isinstance(html, str):
+            return html
+        if html.startswith(b'\xef\xbb\xbf'):
+            return html[3:].decode('utf-8')
+
+        declared = CHARSET_RE.search(html[:4096])
+        return html.decode(declared.group(1).decode('ascii') if declared else 'utf-8')
+
+    @staticmethod
+    def _attached(element, ancestor) -> bool:
+        """Элемент все ещё внутри ancestor (не вырезан вместе с родителем)"""
+        while element is not None:
+            if element is ancestor:
+                return True
+            element = element.getparent()
+        return False
+
     def _extract_title(self, soup: BeautifulSoup) -> str:
         """Извлекает заголовок страницы"""
-        title_selectors = [
-            'h1',
-            '.case-title',
-            '.project-title',
-            '.page-title',
-            '.entry-title',
-            '.post-title',
-            'title'
-        ]
-
-        for selector in title_selectors:
+        for selector in TITLE_SELECTORS:
             element = soup.select_one(selector)
             if element and element.get_text().strip():
                 return element.get_text().strip()
 
-        return "Без названия"
+        return NO_TITLE
 
     def _extract_content(self, soup: BeautifulSoup) -> str:
         """Извлекает основной контент"""
         # Приоритетные селекторы для контента
-        content_selectors = [
-            'main',
-            'article',
-            '.case-content',
-            '.project-details',
-            '.content',
-            '.post-content',
-            '.article-content',
-            '.entry-content',
-            '#content',
-            '.project-description',
-            '.main-content'
-        ]
-
-        for selector in content_selectors:
+        for selector in CONTENT_SELECTORS:
             element = soup.select_one(selector)
             if element:
                 text = element.get_text()
-                if len(text.strip()) > 100:  # Минимальная длина контента
+                if len(text.strip()) > MIN_CONTENT_LENGTH:  # Минимальная длина контента
                     return text
 
         # Если специфичные селекторы не найдены, пробуем body
@@ -107,7 +334,7 @@ class HTMLParser:
         body = soup.find('body')
         if body:
             # Удаляем из body служебные элементы
-            for unwanted in body.select('.navigation, .menu, .sidebar, .footer, .header'):
+            for unwanted in body.select(', '.join(BODY_NOISE_SELECTORS)):
                 unwanted.decompose()
             return body.get_text()
 
@@ -116,9 +343,9 @@ class HTMLParser:
     def _clean_text(self, text: str) -> str:
         """Очищает текст от лишних символов"""
         # Удаляем множественные пробелы и переносы
-        text = re.sub(r'\s+', ' ', text)
+        text = ' '.join(text.split())
         # Удаляем специальные символы
-        text = re.sub(r'[^\w\s\-.,!?;:()\[\]"\'«»]', '', text)
+        text = SPECIAL_CHARS_RE.sub('', text)
         # Убираем специфичный для сайта Eora текст
         text = self._specific_clean_text(text)
 
@@ -128,19 +355,12 @@ class HTMLParser:
         """Убираем специфичный для сайта Eora текст"""
 
         # Удаление любых массивов, начинающихся с '[' и заканчивающихся на ']'
-        text = re.sub(r'\[.*?\]', '', text, flags=re.DOTALL)
-
-        # Удаляем специфичные фразы
-        to_remove = [
-            "Нажимая на кнопку, вы соглашаетесь с нашей Политикой в отношении обработки персональных данных пользователей",
-            "Перейти в портфолио Обязательное поле",
-            "Пожалуйста, введите корректный e-mail адрес",
-            "Пожалуйста, введите корректное имя",
-            "Пожалуйста, введите корректный номер телефона",
-            "Слишком короткое значение Send Обязательное поле"
-        ]
-
-        for phrase in to_remove:
-            text = re.sub(phrase, '', text, flags=re.IGNORECASE | re.DOTALL)
+        text = BRACKETS_RE.sub('', text)
+
+        # Удаляем специфичные фразы; регулярку запускаем, только если фраза есть в тексте
+        folded = text.casefold()
+        for phrase, pattern in SITE_PHRASES:
+            if phrase in folded:
+                text = pattern.sub('', text)
 
         return text
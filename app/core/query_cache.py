@@ -0,0 +1,67 @@
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+from cachetools import TTLCache
+
+from config import settings
+
+
+def normalize_query(text: str) -> str:
+    """Нормализует вопрос для ключа кэша: обрезка, схлопывание пробелов, casefold"""
+    return ' '.join(text.split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """LRU/TTL кэш эмбеддингов запросов, ограниченный по памяти"""
+
+    def __init__(self, model_name: str,
+                 max_mb: int = settings.QUERY_CACHE_MAX_MB,
+                 ttl_seconds: int = settings.QUERY_CACHE_TTL_SECONDS):
+        # Кэш живет в одном EmbeddingService и привязан к его модели: при смене модели создается новый
+        self.model_name = model_name
+        # Размер считаем в байтах float32-векторов
+        self._cache = TTLCache(
+            maxsize=max_mb * 1024 * 1024,
+            ttl=ttl_seconds,
+            getsizeof=lambda embedding: embedding.nbytes
+        )
+        # Кэш используется и из event loop, и из потоков пула
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Возвращает эмбеддинг из кэша или None"""
+        with self._lock:
+            embedding = self._cache.get(normalize_query(query))
+            if embedding is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return embedding
+
+    def put(self, query: str, embedding: np.ndarray) -> None:
+        """Сохраняет эмбеддинг запроса"""
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        with self._lock:
+            self._cache[normalize_query(query)] = embedding
+
+    def clear(self) -> None:
+        """Очищает кэш"""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и заполненность кэша"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'entries': len(self._cache),
+                'size_bytes': self._cache.currsize,
+                'max_size_bytes': self._cache.maxsize
+            }
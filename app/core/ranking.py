@@ -0,0 +1,118 @@
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from app.core.lexical import tokenize
+from config import settings
+
+
+def title_tokens(title: str) -> str:
+    """Токены заголовка для метаданных чанка, считаются один раз при загрузке"""
+    return " ".join(sorted(set(tokenize(title))))
+
+
+class RankingCandidates:
+    """Кандидаты поиска в виде массивов для векторного скоринга"""
+
+    def __init__(self, results: List[Dict[str, Any]], query: str):
+        self.results = results
+        self.query_tokens: FrozenSet[str] = frozenset(tokenize(query))
+
+        metadatas = [result['metadata'] for result in results]
+        self.similarity = np.fromiter((result['similarity_score'] for result in results),
+                                      dtype=np.float64, count=len(results))
+        # word_count пишется в метаданные при чанкинге, split — только для старых баз
+        self.word_count = np.fromiter(
+            (metadata.get('word_count') or len(result['content'].split())
+             for metadata, result in zip(metadatas, results)),
+            dtype=np.float64, count=len(results)
+        )
+        self.title_tokens = [self._title_tokens(metadata) for metadata in metadatas]
+        self.source_urls = np.array([metadata.get('source_url', '') for metadata in metadatas])
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    @staticmethod
+    def _title_tokens(metadata: Dict[str, Any]) -> FrozenSet[str]:
+        """Токены заголовка из метаданных, для старых баз — из самого заголовка"""
+        tokens = metadata.get('title_tokens')
+        if tokens is None:
+            return frozenset(tokenize(metadata.get('source_title', '')))
+        return frozenset(tokens.split())
+
+
+RankingFeature = Callable[[RankingCandidates], np.ndarray]
+
+
+def similarity_feature(candidates: RankingCandidates) -> np.ndarray:
+    """Базовый скор — косинусная близость"""
+    return candidates.similarity
+
+
+def length_feature(candidates: RankingCandidates) -> np.ndarray:
+    """Бонус за длину: длинный чанк, скорее всего, информативнее"""
+    return np.minimum(settings.RANKING_LENGTH_BONUS_MAX, candidates.word_count / 1000)
+
+
+def title_overlap_feature(candidates: RankingCandidates) -> np.ndarray:
+    """Бонус за слова запроса в заголовке"""
+    if not candidates.query_tokens:
+        return np.zeros(len(candidates))
+
+    overlap = np.fromiter((len(tokens & candidates.query_tokens) for tokens in candidates.title_tokens),
+                          dtype=np.float64, count=len(candidates))
+    return settings.RANKING_TITLE_BONUS * overlap / len(candidates.query_tokens)
+
+
+DEFAULT_FEATURES: Dict[str, RankingFeature] = {
+    'similarity': similarity_feature,
+    'length': length_feature,
+    'title_overlap': title_overlap_feature
+}
+
+
+class Reranker:
+    """Ранжирование кандидатов: сумма признаков и штраф за повтор источника"""
+
+    def __init__(self, features: Optional[Dict[str, RankingFeature]] = None,
+                 diversity_penalty: float = settings.RANKING_DIVERSITY_PENALTY):
+        self.features = features if features is not None else dict(DEFAULT_FEATURES)
+        self.diversity_penalty = diversity_penalty
+
+    def rank(self, results: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+        """Возвращает результаты по убыванию итогового скора, скор пишется в final_score"""
+        if not results:
+            return []
+
+        candidates = RankingCandidates(results, query)
+        scores = np.zeros(len(candidates))
+        for feature in self.features.values():
+            scores += feature(candidates)
+
+        if self.diversity_penalty:
+            # Второй и последующие чанки одной страницы теряют в скоре, в контекст попадает больше источников
+            scores -= self.diversity_penalty * self._source_repeats(candidates.source_urls, scores)
+
+        order = np.argsort(-scores, kind='stable')
+        for i in order:
+            results[i]['final_score'] = float(scores[i])
+
+        return [results[i] for i in order]
+
+    @staticmethod
+    def _source_repeats(source_urls: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """Сколько чанков того же источника стоит выше по скору"""
+        order = np.argsort(-scores, kind='stable')
+        _, groups = np.unique(source_urls[order], return_inverse=True)
+
+        # Номер вхождения внутри группы: позиция в стабильной сортировке минус начало группы
+        by_group = np.argsort(groups, kind='stable')
+        sorted_groups = groups[by_group]
+        group_starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(sorted_groups)])
+        occurrence = np.arange(len(sorted_groups)) - np.repeat(group_starts, group_sizes)
+
+        repeats = np.empty(len(scores))
+        repeats[order[by_group]] = occurrence
+        return repeats
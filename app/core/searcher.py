@@ -1,19 +1,162 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 
+import numpy as np
+
+from app.core.cross_encoder import CrossEncoderReranker
 from app.core.embedding import EmbeddingService
+from app.core.executor import InferenceExecutor
+from app.core.lexical import BM25Index, reciprocal_rank_fusion
+from app.core.ranking import Reranker
+from app.utils.timing import StageTimings
 from config import settings
 
 
 class SearchService:
-    def __init__(self, embedding_service: EmbeddingService):
+    def __init__(self, embedding_service: EmbeddingService, lexical_index: Optional[BM25Index] = None,
+                 cross_encoder: Optional[CrossEncoderReranker] = None,
+                 executor: Optional[InferenceExecutor] = None):
         self.embedding_service = embedding_service
+        # Пул для блокирующего BM25 (проверка файла, перечитывание индекса, скоринг)
+        self.executor = executor or InferenceExecutor()
         self.min_similarity_threshold = settings.MIN_SIMILARITY_THRESHOLD
+        # BM25 находит точные названия (клиенты, продукты), которые эмбеддинг размывает
+        self.lexical_index = lexical_index if settings.HYBRID_SEARCH_ENABLED else None
+        self.rrf_k = settings.RRF_K
+        self.reranker = Reranker()
+        # Необязательный второй этап: кросс-энкодер переставляет кандидатов первого этапа
+        self.cross_encoder = cross_encoder
+        # Время по этапам поиска, отдается в /health/stats
+        self.stage_timings = StageTimings()
 
     def search_and_rank(self, query: str, k: int = 5) -> List[Dict[str, any]]:
         """Ищет и ранжирует релевантные документы"""
+        return self.search_and_rank_batch([query], k)[0]
+
+    async def search_and_rank_async(self, query: str, k: int = 5,
+                                    query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, any]]:
+        """Асинхронный поиск: encode и запрос в ChromaDB выполняются в пуле инференса"""
+        if query_embedding is None:
+            with self.stage_timings.measure('embed'):
+                query_embedding = await self.embedding_service.embed_query_async(query)
+
+        candidates_k = self._candidates_k(k)
+
         # Получаем первичные результаты, берём в 2 раза больше чтобы потом отсечь
-        raw_results = self.embedding_service.search_similar(query, k * 2)
+        with self.stage_timings.measure('vector_query'):
+            raw_results = await self.embedding_service.search_similar_async(query, candidates_k * 2, query_embedding)
+        with self.stage_timings.measure('lexical_query'):
+            lexical_ids = await self.executor.run(self._lexical_search, query, candidates_k * 2)
+        with self.stage_timings.measure('lexical_fetch'):
+            lexical_documents = await self.embedding_service.get_documents_async(
+                self._missing_ids(raw_results, lexical_ids)
+            )
+
+        results = self._hybrid_rank(query, query_embedding, raw_results, lexical_ids, lexical_documents, candidates_k)
+        if self.cross_encoder is None or not results:
+            return results
 
+        with self.stage_timings.measure('cross_encoder'):
+            return await self.cross_encoder.apply_async(query, results, k)
+
+    def search_and_rank_batch(self, queries: List[str], k: int = 5) -> List[List[Dict[str, any]]]:
+        """Ищет и ранжирует документы для пачки запросов"""
+        if not queries:
+            return []
+
+        with self.stage_timings.measure('embed'):
+            query_embeddings = self.embedding_service.embed_queries(queries)
+        candidates_k = self._candidates_k(k)
+        with self.stage_timings.measure('vector_query'):
+            raw_results = self.embedding_service.search_by_embeddings(query_embeddings, candidates_k * 2)
+        with self.stage_timings.measure('lexical_query'):
+            lexical_ids = [self._lexical_search(query, candidates_k * 2) for query in queries]
+
+        # Чанки, найденные только BM25, достаем одним запросом на всю пачку
+        missing_ids = set()
+        for query_results, query_lexical_ids in zip(raw_results, lexical_ids):
+            missing_ids.update(self._missing_ids(query_results, query_lexical_ids))
+        with self.stage_timings.measure('lexical_fetch'):
+            lexical_documents = self.embedding_service.get_documents(sorted(missing_ids))
+
+        ranked_results = [
+            self._hybrid_rank(query, query_embedding, query_results, query_lexical_ids, lexical_documents, candidates_k)
+            for query, query_embedding, query_results, query_lexical_ids
+            in zip(queries, query_embeddings, raw_results, lexical_ids)
+        ]
+        if self.cross_encoder is None:
+            return ranked_results
+
+        with self.stage_timings.measure('cross_encoder'):
+            return [
+                self.cross_encoder.apply(query, results, k) if results else results
+                for query, results in zip(queries, ranked_results)
+            ]
+
+    async def search_and_rank_batch_async(self, queries: List[str], k: int = 5) -> List[List[Dict[str, any]]]:
+        """Асинхронный пакетный поиск в пуле инференса"""
+        return await self.embedding_service.executor.run(self.search_and_rank_batch, queries, k)
+
+    def _candidates_k(self, k: int) -> int:
+        """Сколько кандидатов отдает первый этап: для кросс-энкодера — весь его бюджет"""
+        if self.cross_encoder is None:
+            return k
+        return max(k, self.cross_encoder.max_candidates)
+
+    def _lexical_search(self, query: str, k: int) -> List[str]:
+        """id чанков из BM25 в порядке убывания скора"""
+        if self.lexical_index is None:
+            return []
+
+        if self.lexical_index.is_stale():
+            # Индекс пересобран при загрузке базы знаний
+            self.lexical_index = BM25Index.load(self.lexical_index.path)
+
+        return [chunk_id for chunk_id, _ in self.lexical_index.search(query, k)]
+
+    def _missing_ids(self, raw_results: List[Dict], lexical_ids: List[str]) -> List[str]:
+        """Чанки из BM25, которых нет в векторной выдаче"""
+        found = {result['chunk_id'] for result in raw_results}
+        return [chunk_id for chunk_id in lexical_ids if chunk_id not in found]
+
+    def _hybrid_rank(self, query: str, query_embedding: np.ndarray, raw_results: List[Dict],
+                     lexical_ids: List[str], lexical_documents: Dict[str, Dict], k: int) -> List[Dict]:
+        """Сливает векторную и BM25 выдачу через reciprocal rank fusion"""
+        candidates = {result['chunk_id']: result for result in raw_results}
+        for chunk_id in lexical_ids:
+            if chunk_id not in candidates and chunk_id in lexical_documents:
+                candidates[chunk_id] = self._lexical_candidate(lexical_documents[chunk_id], query_embedding)
+
+        ranked_results = self._filter_and_rank(list(candidates.values()), query, len(candidates))
+        if not lexical_ids:
+            return ranked_results[:k]
+
+        # Порог по similarity действует и на чанки из BM25
+        passed = {result['chunk_id'] for result in ranked_results}
+        fused_scores = reciprocal_rank_fusion([
+            [result['chunk_id'] for result in ranked_results],
+            [chunk_id for chunk_id in lexical_ids if chunk_id in passed]
+        ], self.rrf_k)
+
+        for result in ranked_results:
+            result['rrf_score'] = fused_scores[result['chunk_id']]
+
+        return sorted(ranked_results, key=lambda x: x['rrf_score'], reverse=True)[:k]
+
+    def _lexical_candidate(self, document: Dict, query_embedding: np.ndarray) -> Dict:
+        """Результат в формате векторного поиска для чанка, найденного только BM25"""
+        embedding = document['embedding']
+        similarity = float(np.dot(query_embedding, embedding) /
+                           (np.linalg.norm(query_embedding) * np.linalg.norm(embedding) or 1.0))
+
+        return {
+            'content': document['content'],
+            'metadata': document['metadata'],
+            'similarity_score': similarity,
+            'chunk_id': document['chunk_id']
+        }
+
+    def _filter_and_rank(self, raw_results: List[Dict], query: str, k: int) -> List[Dict]:
+        """Отсекает по порогу и ранжирует первичные результаты"""
         # Фильтруем по порогу релевантности
         filtered_results = [
             result for result in raw_results
@@ -24,40 +167,8 @@ class SearchService:
             return []
 
         # Применяем дополнительную логику ранжирования
-        ranked_results = self._apply_ranking_logic(filtered_results, query)
+        with self.stage_timings.measure('rank'):
+            ranked_results = self.reranker.rank(filtered_results, query)
 
         # Возвращаем топ-k результатов
         return ranked_results[:k]
-
-    def _apply_ranking_logic(self, results: List[Dict], query: str) -> List[Dict]:
-        """Применяет дополнительную логику ранжирования"""
-        for result in results:
-            base_score = result['similarity_score']
-
-            # Бонус за длину контента (более информативные чанки)
-            # Если чанк длинный, возможно он более информативный
-            content_length_bonus = min(0.1, len(result['content'].split()) / 1000)
-
-            # Бонус за наличие ключевых слов в заголовке
-            # Если ключевые слова есть в заголовке, скорее всего текст информативный
-            title_bonus = self._calculate_title_bonus(
-                result['metadata']['source_title'],
-                query
-            )
-
-            # Итоговый скор
-            result['final_score'] = base_score + content_length_bonus + title_bonus
-
-        # Сортируем по итоговому скору
-        return sorted(results, key=lambda x: x['final_score'], reverse=True)
-
-    def _calculate_title_bonus(self, title: str, query: str) -> float:
-        """Вычисляет бонус за совпадения в заголовке"""
-        title_words = set(title.lower().split())
-        query_words = set(query.lower().split())
-
-        intersection = title_words.intersection(query_words)
-        if intersection:
-            return 0.2 * (len(intersection) / len(query_words))
-
-        return 0.0
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from config import settings
+
+
+class SingleFlight:
+    """Склеивает одинаковые одновременные вызовы: работа выполняется один раз, результат получают все"""
+
+    def __init__(self, enabled: bool = settings.ASK_COALESCING_ENABLED):
+        self.enabled = enabled
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Результат fn(); если вызов с тем же ключом уже выполняется, ждет его"""
+        if not self.enabled:
+            return await fn()
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+
+        # Отключение одного клиента не должно отменять общую работу для остальных
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Снимает завершенный вызов; ошибку забираем, даже если все ожидающие отключились"""
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Сколько вызовов выполнено и сколько сэкономлено склейкой"""
+        total = self.executed + self.coalesced
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'saved_ratio': self.coalesced / total if total else 0.0,
+            'in_flight': len(self._in_flight)
+        }
@@ -1,9 +1,8 @@
-from typing import List, Dict
-
-import httpx
+from typing import List, Dict, AsyncIterator
 
+from app.core.http import create_http_client, iter_sse_deltas
 from app.core.interface import LlmInterface
-from app.utils.logging import get_logger
+from app.utils.logging import get_logger, log_payload
 from config import settings
 
 logger = get_logger(__name__)
@@ -16,46 +15,78 @@ class SonarClient(LlmInterface):
         self.base_url = settings.SONAR_BASE_URL
         self.api_key = settings.SONAR_API_KEY
         self.model = settings.SONAR_MODEL
+        # Один пул соединений на клиента, без TCP/TLS рукопожатия на каждый запрос
+        self.http_client = create_http_client(timeout=120.0)
 
     async def generate_response(self, messages: List[Dict[str, str]],
                                 temperature: float = 0.05,
                                 max_tokens: int = 2000) -> str:
         """Генерация ответа через Perplexity Sonar API"""
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-                'Authorization': f'Bearer {self.api_key}',
-            }
-
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.05,  # Минимальная креативность
-                "top_p": 0.8,  # Фокус на наиболее вероятных токенах
-                "max_tokens": 2000,  # Больше места для детального анализа
-
-                "search_domain_filter": ['eora.ru'],
-                "return_images": False,
-                "return_related_questions": False,
-            }
-
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
+            response = await self.http_client.post(
+                self.base_url,
+                headers=self._build_headers(),
+                json=self._build_payload(messages)
+            )
+            response.raise_for_status()
+
+            result = response.json()
+            log_payload(logger, "Ответ Sonar", result=result)
+
+            if 'choices' in result and len(result['choices']) > 0:
+                return result['choices'][0]['message']['content'].strip()
+            else:
+                raise Exception("Некорректный ответ от Sonar API")
+
+        except Exception as e:
+            logger.error(f"Ошибка генерации ответа Sonar: {e}")
+            raise Exception(f"Ошибка обращения к Sonar: {e}")
+
+    async def stream_response(self, messages: List[Dict[str, str]],
+                              temperature: float = 0.05,
+                              max_tokens: int = 2000) -> AsyncIterator[str]:
+        """Потоковая генерация ответа через Perplexity Sonar API"""
+        try:
+            payload = self._build_payload(messages)
+            payload["stream"] = True
+
+            async with self.http_client.stream(
+                    "POST",
                     self.base_url,
-                    headers=headers,
+                    headers=self._build_headers(),
                     json=payload
-                )
+            ) as response:
                 response.raise_for_status()
 
-                result = response.json()
-                logger.info(f"SONAR RESULT: {result}")
-
-                if 'choices' in result and len(result['choices']) > 0:
-                    return result['choices'][0]['message']['content'].strip()
-                else:
-                    raise Exception("Некорректный ответ от Sonar API")
+                async for delta in iter_sse_deltas(response):
+                    yield delta
 
         except Exception as e:
-            logger.error(f"Ошибка генерации ответа Sonar: {e}")
+            logger.error(f"Ошибка потоковой генерации ответа Sonar: {e}")
             raise Exception(f"Ошибка обращения к Sonar: {e}")
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений"""
+        await self.http_client.aclose()
+
+    def _build_headers(self) -> Dict[str, str]:
+        """Заголовки запроса к Sonar"""
+        return {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {self.api_key}',
+        }
+
+    def _build_payload(self, messages: List[Dict[str, str]]) -> Dict:
+        """Тело запроса к Sonar"""
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.05,  # Минимальная креативность
+            "top_p": 0.8,  # Фокус на наиболее вероятных токенах
+            "max_tokens": 2000,  # Больше места для детального анализа
+
+            "search_domain_filter": ['eora.ru'],
+            "return_images": False,
+            "return_related_questions": False,
+        }
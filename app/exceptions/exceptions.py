@@ -5,3 +5,18 @@ class RAGException(HTTPException):
     def __init__(self, detail: str, status_code: int = 500, error_type: str = "UNKNOWN_ERROR"):
         super().__init__(status_code=status_code, detail=detail)
         self.error_type = error_type
+
+
+class ServiceOverloadedException(RAGException):
+    def __init__(self, detail: str = "Сервис перегружен, повторите запрос позже"):
+        super().__init__(detail=detail, status_code=503, error_type="SERVICE_OVERLOADED")
+
+
+class ServiceNotReadyException(RAGException):
+    def __init__(self, detail: str = "Сервис ещё загружается"):
+        super().__init__(detail=detail, status_code=503, error_type="NOT_READY")
+
+
+class LLMUnavailableException(RAGException):
+    def __init__(self, detail: str = "LLM-провайдеры недоступны"):
+        super().__init__(detail=detail, status_code=503, error_type="LLM_UNAVAILABLE")
@@ -0,0 +1,80 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from app.utils.hashing import text_hash
+from config import settings
+
+MANIFEST_FILE = "manifest.json"
+
+
+def chunk_hash(chunk: Dict[str, Any]) -> str:
+    """Хэш чанка вместе с метаданными, которые попадают в ChromaDB"""
+    payload = {key: chunk[key] for key in ('content', 'source_title', 'chunk_index', 'total_chunks')}
+    return text_hash(json.dumps(payload, ensure_ascii=False, sort_keys=True))
+
+
+class IndexManifest:
+    """Манифест базы знаний: HTTP-валидаторы, хэш контента страницы и хэши ее чанков"""
+
+    def __init__(self, path: str = os.path.join(settings.VECTOR_DB_PATH, MANIFEST_FILE),
+                 pages: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.pages = pages or {}
+
+    @classmethod
+    def load(cls, path: str = os.path.join(settings.VECTOR_DB_PATH, MANIFEST_FILE)) -> "IndexManifest":
+        """Читает манифест, если его нет — возвращает пустой"""
+        if not os.path.exists(path):
+            return cls(path)
+
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(path, json.load(f).get('pages', {}))
+
+    def save(self) -> None:
+        """Атомарно сохраняет манифест рядом с коллекцией"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'pages': self.pages}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def get_page(self, url: str) -> Optional[Dict[str, Any]]:
+        """Запись о странице или None"""
+        return self.pages.get(url)
+
+    def set_page(self, url: str, content_hash: str, chunk_hashes: Dict[str, str],
+                 etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 build: Optional[Dict[str, Any]] = None) -> None:
+        """Сохраняет состояние проиндексированной страницы и параметры, с которыми она нарезана"""
+        self.pages[url] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': content_hash,
+            'chunks': chunk_hashes,
+            'build': build
+        }
+
+    def seed(self, chunk_sources: Dict[str, str]) -> None:
+        """Заполняет пустой манифест чанками уже собранной коллекции: хэши неизвестны, все перезаливается"""
+        for chunk_id, url in chunk_sources.items():
+            page = self.pages.setdefault(url, {
+                'etag': None,
+                'last_modified': None,
+                'content_hash': None,
+                'chunks': {},
+                'build': None
+            })
+            page['chunks'][chunk_id] = None
+
+    def update_validators(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Обновляет ETag/Last-Modified, не трогая хэши"""
+        page = self.pages.get(url)
+        if page is not None:
+            page['etag'] = etag
+            page['last_modified'] = last_modified
+
+    def remove_page(self, url: str) -> List[str]:
+        """Удаляет страницу из манифеста и возвращает id ее чанков"""
+        page = self.pages.pop(url, None)
+        return list(page['chunks']) if page else []
@@ -0,0 +1,254 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import httpx
+
+from app.core.chunker import ContentChunker
+from app.core.lexical import BM25Index
+from app.core.parser import PARSER_VERSION, HTMLParser
+from app.ingestion.manifest import IndexManifest, chunk_hash
+from app.utils.hashing import text_hash
+from app.utils.logging import get_logger
+from config import settings
+
+if TYPE_CHECKING:
+    from app.core.embedding import EmbeddingService
+
+logger = get_logger(__name__)
+
+# Парсер в процессе-воркере создается один раз
+_worker_parser: Optional[HTMLParser] = None
+
+
+def parse_html_document(url: str, html: bytes) -> Optional[Dict[str, str]]:
+    """Парсинг HTML в процессе-воркере"""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = HTMLParser()
+    return _worker_parser.parse_html(url, html)
+
+
+class StageStats:
+    """Счетчики одного этапа пайплайна"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def add(self, items: int, seconds: float) -> None:
+        """Учитывает обработанные элементы и затраченное время"""
+        self.items += items
+        self.seconds += seconds
+
+    def as_dict(self, elapsed: float) -> Dict[str, Any]:
+        """Пропускная способность этапа относительно общего времени пайплайна"""
+        return {
+            'items': self.items,
+            'busy_seconds': round(self.seconds, 3),
+            'items_per_second': round(self.items / elapsed, 2) if elapsed else 0.0,
+            'ms_per_item': round(1000 * self.seconds / self.items, 2) if self.items else 0.0
+        }
+
+
+class IngestionPipeline:
+    """Потоковая загрузка базы знаний: fetch -> parse -> chunk -> embed/upsert батчами"""
+
+    def __init__(self, embedding_service: "EmbeddingService",
+                 parser: Optional[HTMLParser] = None,
+                 chunker: Optional[ContentChunker] = None,
+                 fetch_concurrency: int = settings.INGEST_FETCH_CONCURRENCY,
+                 parse_workers: int = settings.INGEST_PARSE_WORKERS,
+                 embed_batch_size: int = settings.INGEST_EMBED_BATCH_SIZE,
+                 manifest: Optional[IndexManifest] = None,
+                 lexical_index: Optional[BM25Index] = None):
+        self.embedding_service = embedding_service
+        # С манифестом загрузка инкрементальная: заливаются только изменившиеся чанки
+        self.manifest = manifest
+        # BM25-индекс обновляется теми же чанками, что уходят в ChromaDB
+        self.lexical_index = lexical_index
+        self.parser = parser or HTMLParser()
+        self.chunker = chunker or ContentChunker()
+        self.fetch_concurrency = fetch_concurrency
+        self.parse_workers = parse_workers
+        self.embed_batch_size = embed_batch_size
+        # С чем нарезаны страницы: при смене версии парсера или параметров чанкера страница режется заново
+        self.build = {
+            'parser_version': PARSER_VERSION,
+            'chunk_size': self.chunker.chunk_size,
+            'chunk_overlap': self.chunker.overlap
+        }
+
+        self.stats = {name: StageStats(name) for name in ('fetch', 'parse', 'chunk', 'embed')}
+        self.failed_urls: List[str] = []
+        self.unchanged_urls: List[str] = []
+        self.removed_urls: List[str] = []
+        self.stale_chunk_ids: List[str] = []
+
+    async def run(self, urls: List[str]) -> Dict[str, Any]:
+        """Обрабатывает страницы и возвращает статистику по этапам"""
+        started_at = time.perf_counter()
+        if self.manifest is not None and not self.manifest.pages:
+            # База могла быть собрана без манифеста: без него старые чанки никогда не удалились бы
+            self.manifest.seed(await asyncio.to_thread(self.embedding_service.get_chunk_sources))
+
+        # Ограниченная очередь держит память плоской: fetch ждет, пока embed разгребет батчи
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.embed_batch_size * 4)
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+            async with httpx.AsyncClient(follow_redirects=True) as client:
+                consumer = asyncio.create_task(self._embed_consumer(queue))
+                producers = asyncio.gather(*(
+                    self._process_url(url, client, semaphore, parse_pool, queue)
+                    for url in urls
+                ))
+
+                await asyncio.wait({consumer, producers}, return_when=asyncio.FIRST_COMPLETED)
+                if consumer.done():
+                    # Заливка упала раньше, чем закончились страницы
+                    producers.cancel()
+                    await asyncio.gather(producers, return_exceptions=True)
+                    consumer.result()
+
+                try:
+                    await producers
+                except BaseException:
+                    consumer.cancel()
+                    raise
+
+                await queue.put(None)
+                await consumer
+
+        if self.manifest is not None:
+            # Страницы, которых больше нет в списке, удаляем вместе с чанками
+            for url in set(self.manifest.pages) - set(urls):
+                self._remove_page(url)
+
+            await asyncio.to_thread(self.embedding_service.delete_documents, self.stale_chunk_ids)
+            self.manifest.save()
+
+        if self.lexical_index is not None:
+            self.lexical_index.remove_documents(self.stale_chunk_ids)
+            self.lexical_index.save()
+
+        elapsed = time.perf_counter() - started_at
+        report = {
+            'pages': len(urls),
+            'failed_pages': len(self.failed_urls),
+            'unchanged_pages': len(self.unchanged_urls),
+            'removed_pages': len(self.removed_urls),
+            'deleted_chunks': len(self.stale_chunk_ids),
+            'elapsed_seconds': round(elapsed, 3),
+            'stages': {name: stage.as_dict(elapsed) for name, stage in self.stats.items()}
+        }
+        logger.info(f"Статистика загрузки: {report}")
+        return report
+
+    async def _process_url(self, url: str, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                           parse_pool: ProcessPoolExecutor, queue: asyncio.Queue) -> None:
+        """Загружает, парсит и режет на чанки одну страницу"""
+        loop = asyncio.get_running_loop()
+        page = self.manifest.get_page(url) if self.manifest is not None else None
+        if page is not None and page.get('build') != self.build:
+            # Без валидаторов и хэша текста страница скачается и нарежется целиком,
+            # перезальются только чанки, которые при этом изменились
+            page = {**page, 'etag': None, 'last_modified': None, 'content_hash': None}
+
+        async with semaphore:
+            stage_started = time.perf_counter()
+            fetched = await self.parser.fetch_page_async(
+                client,
+                url,
+                etag=page['etag'] if page else None,
+                last_modified=page['last_modified'] if page else None
+            )
+            self.stats['fetch'].add(1, time.perf_counter() - stage_started)
+
+        if fetched is None:
+            # Ошибка сети — старые чанки оставляем как есть
+            self.failed_urls.append(url)
+            return
+
+        if fetched['status_code'] == 304:
+            self.unchanged_urls.append(url)
+            return
+
+        if fetched['status_code'] in (404, 410):
+            logger.info(f"Страница {url} удалена")
+            self.failed_urls.append(url)
+            if self.manifest is not None:
+                self._remove_page(url)
+            return
+
+        stage_started = time.perf_counter()
+        document = await loop.run_in_executor(parse_pool, parse_html_document, url, fetched['content'])
+        self.stats['parse'].add(1, time.perf_counter() - stage_started)
+
+        if document is None:
+            logger.info(f"Ошибка парсинга {url}")
+            self.failed_urls.append(url)
+            return
+
+        content_hash = text_hash(f"{document['title']}\n{document['content']}")
+        if page is not None and page['content_hash'] == content_hash:
+            # Разметка поменялась, а текст нет
+            self.manifest.update_validators(url, fetched['etag'], fetched['last_modified'])
+            self.unchanged_urls.append(url)
+            return
+
+        stage_started = time.perf_counter()
+        chunks = self.chunker.chunk_document(document)
+        self.stats['chunk'].add(len(chunks), time.perf_counter() - stage_started)
+        logger.info(f"{url}: создано {len(chunks)} чанков")
+
+        if self.manifest is not None:
+            chunks = self._register_page(url, page, content_hash, chunks, fetched)
+            logger.info(f"{url}: изменилось {len(chunks)} чанков")
+
+        for chunk in chunks:
+            await queue.put(chunk)
+
+    def _register_page(self, url: str, page: Optional[Dict[str, Any]], content_hash: str,
+                       chunks: List[Dict[str, Any]], fetched: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Обновляет манифест страницы и возвращает только изменившиеся чанки"""
+        old_hashes = page['chunks'] if page else {}
+        new_hashes = {chunk['chunk_id']: chunk_hash(chunk) for chunk in chunks}
+
+        # Чанки, которых больше нет (страница стала короче)
+        self.stale_chunk_ids.extend(set(old_hashes) - set(new_hashes))
+        self.manifest.set_page(url, content_hash, new_hashes, fetched['etag'], fetched['last_modified'], self.build)
+
+        return [chunk for chunk in chunks if old_hashes.get(chunk['chunk_id']) != new_hashes[chunk['chunk_id']]]
+
+    def _remove_page(self, url: str) -> None:
+        """Удаляет страницу из манифеста, ее чанки удалятся из ChromaDB в конце загрузки"""
+        self.removed_urls.append(url)
+        self.stale_chunk_ids.extend(self.manifest.remove_page(url))
+
+    async def _embed_consumer(self, queue: asyncio.Queue) -> None:
+        """Собирает чанки в батчи фиксированного размера и заливает их в ChromaDB"""
+        batch = []
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+
+            batch.append(chunk)
+            if len(batch) >= self.embed_batch_size:
+                await self._flush(batch)
+                batch = []
+
+        if batch:
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        """Эмбеддинг и upsert батча в потоке, чтобы fetch и parse шли параллельно"""
+        stage_started = time.perf_counter()
+        await asyncio.to_thread(self.embedding_service.add_documents, batch)
+        if self.lexical_index is not None:
+            self.lexical_index.add_documents(batch)
+        self.stats['embed'].add(len(batch), time.perf_counter() - stage_started)
+        logger.info(f"Залито в векторную БД: {self.stats['embed'].items} чанков")
@@ -1,3 +1,5 @@
+import asyncio
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
@@ -5,9 +7,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 
-from app.api import questions
+from app.api import health, metrics, questions
 from app.containers import Container
 from app.utils.logging import get_logger
+from app.utils.tracing import setup_tracing, shutdown_tracing
 from config import settings
 
 logger = get_logger(__name__)
@@ -18,16 +21,63 @@ def init_dependency_injector() -> Container:
     container = Container()
     container.config.from_pydantic(settings=settings, required=True)
     container.wire(
-        modules=[questions]
+        modules=[questions, health, metrics]
     )
     return container
 
 
+async def load_services(app: FastAPI, container: Container) -> None:
+    """Загружает модель, коллекцию и LLM-клиент в фоне, пока сервер уже принимает соединения"""
+    started_at = time.perf_counter()
+    try:
+        # Тяжелые конструкторы выполняются вне event loop
+        embedding_service = await asyncio.to_thread(container.embedding_service)
+        app.state.embedding_service = embedding_service
+        await asyncio.to_thread(embedding_service.warmup)
+
+        # Кросс-энкодер (если включен) тоже загружается и прогревается вне event loop
+        search_service = await asyncio.to_thread(container.search_service)
+        if search_service.cross_encoder is not None:
+            await asyncio.to_thread(search_service.cross_encoder.warmup)
+
+        # Токенизатор для бюджета контекста может читаться с диска или HF Hub
+        response_generator = await asyncio.to_thread(container.response_generator_service)
+        app.state.response_generator = response_generator
+        await response_generator.warmup()
+    except Exception as e:
+        app.state.startup_error = str(e)
+        logger.error(f"Не удалось загрузить модель и коллекцию: {e}", exc_info=True)
+        return
+
+    app.state.ready = True
+    logger.info(f"Модель и коллекция загружены за {time.perf_counter() - started_at:.1f} с, сервис готов")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Startup")
-    init_dependency_injector()
+    setup_tracing()
+    app.state.ready = False
+    app.state.startup_error = None
+    app.state.embedding_service = None
+    app.state.response_generator = None
+    container = init_dependency_injector()
+    app.state.container = container
+
+    # Сервер начинает слушать порт сразу, /health/ready и /ask отвечают 503 до конца загрузки
+    loading = asyncio.create_task(load_services(app, container))
     yield
+
+    app.state.ready = False
+    loading.cancel()
+    await asyncio.gather(loading, return_exceptions=True)
+    if app.state.response_generator is not None:
+        await app.state.response_generator.aclose()
+    if app.state.embedding_service is not None:
+        app.state.embedding_service.close()
+    container.inference_executor().shutdown()
+    container.unwire()
+    shutdown_tracing()
     logger.info("Shutdown")
 
 
@@ -69,6 +119,8 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # Подключение роутов
 app.include_router(questions.router, prefix="/api/v1", tags=["questions"])
+app.include_router(health.router, prefix="/health", tags=["health"])
+app.include_router(metrics.router, tags=["metrics"])
 
 if __name__ == "__main__":
     import uvicorn
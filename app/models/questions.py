@@ -3,6 +3,8 @@ from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 
+from config import settings
+
 
 class QuestionRequest(BaseModel):
     question: str = Field("Что вы можете сделать для ритейлеров?", min_length=10, max_length=500,
@@ -17,3 +19,28 @@ class QuestionRequest(BaseModel):
 
 class QuestionResponse(BaseModel):
     answer: str
+
+
+class BatchQuestionRequest(BaseModel):
+    # Вся пачка ищется одной задачей пула инференса и порождает столько же вызовов LLM
+    questions: List[str] = Field(..., min_length=1, max_length=settings.ASK_BATCH_MAX_QUESTIONS,
+                                 description="Вопросы клиентов для пакетной обработки")
+
+    @field_validator('questions')
+    def validate_questions(cls, v):
+        questions = [question.strip() for question in v]
+        for question in questions:
+            if not 10 <= len(question) <= 500:
+                raise ValueError('Длина вопроса должна быть от 10 до 500 символов')
+        return questions
+
+
+class BatchAnswer(BaseModel):
+    # Ошибка одного вопроса не роняет всю пачку: вместо ответа приходят detail и error_type
+    answer: Optional[str] = None
+    detail: Optional[str] = None
+    error_type: Optional[str] = None
+
+
+class BatchQuestionResponse(BaseModel):
+    answers: List[BatchAnswer]
@@ -0,0 +1,6 @@
+import hashlib
+
+
+def text_hash(text: str) -> str:
+    """sha256 текста"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
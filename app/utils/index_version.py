@@ -0,0 +1,26 @@
+import os
+import uuid
+
+from config import settings
+
+INDEX_VERSION_FILE = "index_version"
+
+
+def index_version_path() -> str:
+    """Путь к маркеру версии базы знаний рядом с коллекцией ChromaDB"""
+    return os.path.join(settings.VECTOR_DB_PATH, INDEX_VERSION_FILE)
+
+
+def read_index_version() -> int:
+    """Текущая версия базы знаний (mtime маркера), 0 если индексации ещё не было"""
+    try:
+        return os.stat(index_version_path()).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump_index_version() -> None:
+    """Отмечает переиндексацию базы знаний"""
+    os.makedirs(settings.VECTOR_DB_PATH, exist_ok=True)
+    with open(index_version_path(), "w", encoding="utf-8") as f:
+        f.write(uuid.uuid4().hex)
@@ -1,9 +1,118 @@
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import random
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Any, Dict, Optional
 
 from config import settings
 
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Кладет записи в очередь без ожидания; при переполнении запись отбрасывается и учитывается"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Подставляет аргументы в сообщение, трассировку оставляет форматтерам слушателя"""
+        # Стандартный prepare вклеивает трассировку в message и обнуляет exc_info;
+        # очередь внутри процесса, запись не сериализуется
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        payload = getattr(record, 'payload', None)
+        if payload is not None:
+            entry['payload'] = payload
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Человекочитаемый формат консоли, данные payload дописываются в конец строки"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        payload = getattr(record, 'payload', None)
+        if payload is not None:
+            text = f"{text} {json.dumps(payload, ensure_ascii=False, default=str)}"
+        return text
+
+
+def _start_listener() -> NonBlockingQueueHandler:
+    """Один фоновый поток пишет записи всех логгеров в консоль и в файл с ежедневной ротацией"""
+    global _queue_handler, _listener
+
+    os.makedirs(settings.LOG_FOLDER, exist_ok=True)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(TextFormatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+
+    # Файл переключается в полночь, старые сохраняются как app.log.ГГГГ-ММ-ДД
+    file_handler = TimedRotatingFileHandler(
+        os.path.join(settings.LOG_FOLDER, "app.log"),
+        when="midnight",
+        backupCount=settings.LOG_BACKUP_DAYS,
+        encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter() if settings.LOG_JSON else TextFormatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    # Дописываем очередь при выходе процесса
+    atexit.register(stop_logging)
+    return _queue_handler
+
+
+def stop_logging() -> None:
+    """Останавливает фоновую запись, оставшиеся в очереди записи сбрасываются на диск"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def queue_stats() -> Dict[str, int]:
+    """Записи в очереди на запись и отброшенные из-за переполнения очереди с запуска процесса"""
+    if _queue_handler is None:
+        return {'queued': 0, 'dropped': 0}
+    return {'queued': _queue_handler.queue.qsize(), 'dropped': _queue_handler.dropped}
+
 
 def setup_logger(name: str = None) -> logging.Logger:
     if name is None:
@@ -20,30 +129,12 @@ def setup_logger(name: str = None) -> logging.Logger:
     if logger.handlers:
         return logger  # Логгер уже настроен
 
-    # Создание директории логов
-    LOG_DIR = settings.LOG_FOLDER
-    os.makedirs(LOG_DIR, exist_ok=True)
-
     logger.setLevel(settings.LOG_LEVEL)
 
-    # Формат логов
-    formatter = logging.Formatter(
-        "[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-
-    # Консольный вывод
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
-    # Вывод в файл
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    log_filename = f"log_{date_str}.log"
-    log_file_path = os.path.join(LOG_DIR, log_filename)
-    file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    # Логгер только кладет запись в очередь, форматирование и диск — в фоновом потоке
+    with _setup_lock:
+        handler = _queue_handler or _start_listener()
+    logger.addHandler(handler)
 
     # Предотвращаем дублирование логов в родительских логгерах
     logger.propagate = False
@@ -54,3 +145,19 @@ def setup_logger(name: str = None) -> logging.Logger:
 def get_logger(name: str) -> logging.Logger:
     """Получает логгер с именем вызывающего модуля"""
     return setup_logger(name)
+
+
+def truncate_payload(value: Any, max_chars: int = settings.LOG_PAYLOAD_MAX_CHARS) -> str:
+    """Строковое представление данных, обрезанное до max_chars символов"""
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}… [+{len(text) - max_chars} символов]"
+
+
+def log_payload(logger: logging.Logger, message: str, sample_rate: float = settings.LOG_PAYLOAD_SAMPLE_RATE,
+                **payload: Any) -> None:
+    """Пишет большие данные (промпт, ответ провайдера) только для доли запросов и в обрезанном виде"""
+    if not logger.isEnabledFor(logging.INFO) or random.random() >= sample_rate:
+        return
+    logger.info(message, extra={'payload': {key: truncate_payload(value) for key, value in payload.items()}})
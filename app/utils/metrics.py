@@ -0,0 +1,70 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Mapping, Sequence
+
+# Границы корзин в секундах: от микробатча эмбеддинга до долгого ответа LLM
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    """Число в формате Prometheus"""
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Гистограмма задержек с одной меткой в текстовом формате Prometheus (потокобезопасно)"""
+
+    def __init__(self, name: str, documentation: str, label: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # На каждое значение метки: счетчики по корзинам (последняя — +Inf), сумма и количество
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, label_value: str, seconds: float) -> None:
+        """Учитывает одно наблюдение"""
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._counts.get(label_value)
+            if counts is None:
+                counts = self._counts[label_value] = [0] * (len(self.buckets) + 1)
+                self._sums[label_value] = 0.0
+            counts[index] += 1
+            self._sums[label_value] += seconds
+
+    def render(self) -> List[str]:
+        """Строки экспозиции: кумулятивные корзины, сумма и количество"""
+        with self._lock:
+            snapshot = {value: (list(counts), self._sums[value]) for value, counts in self._counts.items()}
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for value, (counts, total) in sorted(snapshot.items()):
+            labels = f'{self.label}="{value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+def render_metric(name: str, documentation: str, metric_type: str, label: str,
+                  values: Mapping[str, float]) -> List[str]:
+    """Строки экспозиции счетчика или gauge с одной меткой"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    lines.extend(f'{name}{{{label}="{key}"}} {_format_value(value)}' for key, value in values.items())
+    return lines
+
+
+def render_value(name: str, documentation: str, metric_type: str, value: float) -> List[str]:
+    """Строки экспозиции счетчика или gauge без меток"""
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}", f"{name} {_format_value(value)}"]
+
+
+# Время этапов обработки вопроса во всем процессе, пишется через StageTimings
+STAGE_SECONDS = Histogram("rag_stage_duration_seconds", "Время этапов обработки вопроса", "stage")
@@ -0,0 +1,54 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from app.utils.metrics import STAGE_SECONDS, Histogram
+from app.utils.tracing import get_tracer
+
+
+class StageTimings:
+    """Накопительное время по этапам обработки запроса (потокобезопасно)"""
+
+    def __init__(self, histogram: Optional[Histogram] = STAGE_SECONDS):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._seconds: Dict[str, float] = {}
+        self._max_seconds: Dict[str, float] = {}
+        # Общая гистограмма процесса для /metrics
+        self.histogram = histogram
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """Замеряет время блока и записывает его в этап stage; при включенном трейсинге — ещё и спан"""
+        tracer = get_tracer()
+        started_at = time.perf_counter()
+        try:
+            if tracer is None:
+                yield
+            else:
+                with tracer.start_as_current_span(stage):
+                    yield
+        finally:
+            self.record(stage, time.perf_counter() - started_at)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Учитывает одно выполнение этапа"""
+        with self._lock:
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+            self._max_seconds[stage] = max(self._max_seconds.get(stage, 0.0), seconds)
+        if self.histogram is not None:
+            self.histogram.observe(stage, seconds)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Количество, среднее и максимальное время по каждому этапу"""
+        with self._lock:
+            return {
+                stage: {
+                    'count': count,
+                    'avg_ms': round(1000 * self._seconds[stage] / count, 3),
+                    'max_ms': round(1000 * self._max_seconds[stage], 3)
+                }
+                for stage, count in self._counts.items()
+            }
@@ -0,0 +1,47 @@
+from typing import Any, Optional
+
+from app.utils.logging import get_logger
+from config import settings
+
+logger = get_logger(__name__)
+
+_tracer: Optional[Any] = None
+_provider: Optional[Any] = None
+
+
+def setup_tracing() -> None:
+    """Включает экспорт спанов OpenTelemetry по OTLP, если он разрешен в настройках"""
+    global _tracer, _provider
+    if not settings.OTEL_ENABLED or _tracer is not None:
+        return
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        logger.warning(f"OpenTelemetry SDK не установлен, спаны не экспортируются: {e}")
+        return
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}))
+    # Экспорт в фоновом потоке батчами, запрос не ждет коллектор
+    _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT)))
+    trace.set_tracer_provider(_provider)
+    _tracer = trace.get_tracer("rag")
+    logger.info(f"Спаны OpenTelemetry отправляются в {settings.OTEL_EXPORTER_OTLP_ENDPOINT}")
+
+
+def get_tracer() -> Optional[Any]:
+    """Трейсер OpenTelemetry или None, если трейсинг выключен"""
+    return _tracer
+
+
+def shutdown_tracing() -> None:
+    """Досылает накопленные спаны и останавливает экспорт"""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
@@ -11,6 +11,14 @@ class Settings(BaseSettings):
     # Настройки логгера
     LOG_FOLDER: str = f"{project_root}/logs"
     LOG_LEVEL: str = "INFO"
+    # Файл app.log в JSON Lines, ротация в полночь, хранится LOG_BACKUP_DAYS дней
+    LOG_JSON: bool = True
+    LOG_BACKUP_DAYS: int = 14
+    # Записи пишет фоновый поток; при переполнении очереди новые записи отбрасываются
+    LOG_QUEUE_SIZE: int = 10000
+    # Промпты и ответы LLM логируются для доли запросов и обрезаются до MAX_CHARS символов
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.05
+    LOG_PAYLOAD_MAX_CHARS: int = 2000
 
     # Настройка FastApi
     APP_NAME: str = "RAG Service"
@@ -18,25 +26,124 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
+    # Спаны OpenTelemetry по OTLP/gRPC (гистограммы этапов на /metrics доступны всегда)
+    OTEL_ENABLED: bool = False
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = "http://localhost:4317"
+    OTEL_SERVICE_NAME: str = "rag-service"
+
     # Настройки поиска
     MIN_SIMILARITY_THRESHOLD: float = 0.2
     MAX_SEARCH_RESULTS: int = 5
     VECTOR_DB_PATH: str = f"{project_root}/scripts/vector_db"
 
+    # Гибридный поиск: BM25 по ключевым словам + векторный, слияние через RRF
+    HYBRID_SEARCH_ENABLED: bool = True
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+    RRF_K: int = 60
+
+    # Ранжирование кандидатов: бонусы за длину и заголовок, штраф за повтор источника
+    RANKING_LENGTH_BONUS_MAX: float = 0.1
+    RANKING_TITLE_BONUS: float = 0.2
+    RANKING_DIVERSITY_PENALTY: float = 0.05
+
+    # Кросс-энкодер для переранжирования (onnx-бэкенд требует optimum[onnxruntime])
+    CROSS_ENCODER_ENABLED: bool = False
+    CROSS_ENCODER_MODEL: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    CROSS_ENCODER_BACKEND: Literal["torch", "onnx"] = "torch"
+    CROSS_ENCODER_MAX_CANDIDATES: int = 12
+    CROSS_ENCODER_TOP_K: int = 3
+    CROSS_ENCODER_BATCH_SIZE: int = 6
+    CROSS_ENCODER_TIMEOUT_MS: float = 150.0
+
+    # Бэкенд эмбеддингов: torch (sentence-transformers) или ONNX Runtime, выгрузка — scripts/export_onnx.py
+    EMBEDDING_BACKEND: Literal["torch", "onnx", "onnx-int8"] = "torch"
+    EMBEDDING_ONNX_PATH: str = f"{project_root}/scripts/onnx_model"
+    EMBEDDING_ONNX_THREADS: int = 0
+    EMBEDDING_PARITY_MIN_COSINE: float = 0.98
+
+    # Пул для инференса (эмбеддинги и запросы в ChromaDB)
+    INFERENCE_MAX_WORKERS: int = 2
+    INFERENCE_MAX_QUEUE: int = 32
+
+    # Микробатчинг эмбеддингов запросов
+    ENCODE_BATCH_MAX_SIZE: int = 32
+    ENCODE_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # Кэш эмбеддингов запросов
+    QUERY_CACHE_MAX_MB: int = 16
+    QUERY_CACHE_TTL_SECONDS: int = 3600
+
+    # Семантический кэш ответов LLM (0 записей — выключен)
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_DISTANCE: float = 0.05
+
+    # Сборка контекста для LLM: бюджет в токенах локального токенизатора
+    # (пусто — токенизатор модели эмбеддингов из выгрузки ONNX или кэша HF; иначе путь к tokenizer.json или id на HF Hub)
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_MIN_CHUNK_TOKENS: int = 64
+    CONTEXT_TOKENIZER: str = ""
+
+    # Одинаковые (после нормализации) одновременные вопросы к /ask обрабатываются одним поиском и вызовом LLM
+    ASK_COALESCING_ENABLED: bool = True
+
+    # Пакетный эндпоинт: сколько ответов генерируем параллельно и сколько вопросов принимаем за запрос
+    ASK_BATCH_LLM_CONCURRENCY: int = 4
+    ASK_BATCH_MAX_QUESTIONS: int = 32
+
     # Настройки чанкера
     DEFAULT_CHUNK_SIZE: int = 512
     DEFAULT_CHUNK_OVERLAP: int = 50
 
+    # Настройки загрузки базы знаний
+    INGEST_FETCH_CONCURRENCY: int = 8
+    INGEST_PARSE_WORKERS: int = 2
+    INGEST_EMBED_BATCH_SIZE: int = 64
+    # Разбор HTML: lxml (один проход по дереву) с откатом на BeautifulSoup; auto — lxml, если установлен
+    HTML_PARSER_ENGINE: Literal["auto", "lxml", "bs4"] = "auto"
+
+    # Дисковый кэш эмбеддингов чанков (переживает пересборку vector_db)
+    EMBEDDING_STORE_PATH: str = f"{project_root}/scripts/embedding_cache.sqlite3"
+    EMBEDDING_STORE_MAX_MB: int = 512
+
     # Определяем каким LLM пользуемся
     LLM_PROVIDER: Literal["gigachat", "sonar"] = "sonar"
+    # Резервные провайдеры через запятую (например, "gigachat"), используются по порядку
+    LLM_FALLBACK_PROVIDERS: str = ""
+
+    # Отказоустойчивость LLM: таймаут попытки, автомат отключения, хеджирование и выбор по задержке
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = 30.0
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 3
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
+    # Дублирующий запрос к следующему провайдеру после p95 задержки основного (пока нет замеров — DEFAULT)
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_MIN_DELAY_MS: float = 500.0
+    LLM_HEDGE_DEFAULT_DELAY_MS: float = 5000.0
+    # Провайдер с p50 больше SLOWDOWN_FACTOR x лучшего p50 за окно уходит в конец очереди
+    LLM_LATENCY_ROUTING_ENABLED: bool = True
+    LLM_ROUTING_SLOWDOWN_FACTOR: float = 2.0
+    LLM_LATENCY_WINDOW_SECONDS: float = 300.0
+    LLM_LATENCY_MIN_SAMPLES: int = 5
 
     # GigaChat настройки
     GIGACHAT_API_KEY: str = ""
     GIGACHAT_BASE_URL: str = "https://gigachat.devices.sberbank.ru/api/v1"
     GIGACHAT_MODEL: str = "GigaChat"
     GIGACHAT_SCOPE: str = "GIGACHAT_API_PERS"
+    GIGACHAT_AUTH_URL: str = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
+    # Токен считается устаревшим за REFRESH_MARGIN секунд до истечения,
+    # фоновое обновление запускается ещё на PROACTIVE_LEAD секунд раньше
+    GIGACHAT_TOKEN_REFRESH_MARGIN: float = 300
+    GIGACHAT_TOKEN_PROACTIVE_LEAD: float = 60
     TEMPERATURE: float = 0.2
 
+    # Пул HTTP-соединений к LLM-провайдерам
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    LLM_HTTP2: bool = False
+
     # Настройки для Sonar
     SONAR_BASE_URL: str = ""
     SONAR_API_KEY: str = ""
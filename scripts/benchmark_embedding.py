@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Сравнение бэкендов эмбеддингов: время загрузки, задержка запроса, пропускная способность, RSS"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from scripts.export_onnx import PARITY_TEXTS
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+
+def run_worker(backend: str, queries: int, batch_size: int, batches: int) -> dict:
+    """Замеры в отдельном процессе, чтобы импорт и RSS не смешивались между бэкендами"""
+    started_at = time.perf_counter()
+    from app.core.embedding_backends import DEFAULT_EMBEDDING_MODEL, load_embedding_model
+
+    model = load_embedding_model(DEFAULT_EMBEDDING_MODEL, backend)
+    load_seconds = time.perf_counter() - started_at
+    model.encode(["warmup"])
+
+    # Одиночные запросы, как приходят вопросы в /ask
+    latencies = []
+    for i in range(queries):
+        text = PARITY_TEXTS[i % len(PARITY_TEXTS)]
+        query_started = time.perf_counter()
+        model.encode([text])
+        latencies.append(time.perf_counter() - query_started)
+
+    # Батчи чанков, как при загрузке базы знаний
+    texts = [PARITY_TEXTS[i % len(PARITY_TEXTS)] for i in range(batch_size)]
+    batch_started = time.perf_counter()
+    for _ in range(batches):
+        model.encode(texts, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - batch_started
+
+    latencies_ms = 1000 * np.array(latencies)
+    return {
+        'backend': backend,
+        'load_seconds': round(load_seconds, 2),
+        'query_p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'query_p95_ms': round(float(np.percentile(latencies_ms, 95)), 2),
+        'batch_texts_per_second': round(batch_size * batches / batch_seconds, 1),
+        # ru_maxrss в Linux — килобайты
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк бэкендов эмбеддингов")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--queries", type=int, default=200, help="Одиночных запросов")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.queries, args.batch_size, args.batches)))
+        return
+
+    results = []
+    for backend in args.backends:
+        completed = subprocess.run(
+            [sys.executable, "-m", "scripts.benchmark_embedding", "--worker", backend,
+             "--queries", str(args.queries), "--batch-size", str(args.batch_size), "--batches", str(args.batches)],
+            capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            print(f"{backend}: ошибка\n{completed.stderr.strip()}")
+            continue
+
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
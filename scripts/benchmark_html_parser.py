@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Сравнение движков разбора HTML (BeautifulSoup и lxml) на страницах кейсов: скорость и совпадение результата"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+ENGINES = ["bs4", "lxml"]
+
+
+async def fetch_pages(urls: List[str], concurrency: int = 4) -> List[Tuple[str, bytes]]:
+    """Скачивает страницы кейсов; недоступные пропускаются"""
+    from app.core.parser import DEFAULT_HEADERS
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=30, follow_redirects=True) as client:
+        async def fetch(url: str):
+            async with semaphore:
+                try:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                    return url, response.content
+                except httpx.HTTPError as e:
+                    print(f"Пропуск {url}: {e}")
+                    return None
+
+        pages = await asyncio.gather(*(fetch(url) for url in urls))
+    return [page for page in pages if page]
+
+
+def load_pages(html_dir: str) -> List[Tuple[str, bytes]]:
+    """Сохраненные страницы *.html из папки; имя файла используется как URL"""
+    pages = []
+    for name in sorted(os.listdir(html_dir)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(html_dir, name), "rb") as f:
+                pages.append((name, f.read()))
+    return pages
+
+
+def save_pages(pages: List[Tuple[str, bytes]], html_dir: str) -> None:
+    """Сохраняет скачанные страницы, чтобы повторные прогоны не зависели от сети"""
+    os.makedirs(html_dir, exist_ok=True)
+    for url, html in pages:
+        name = url.rstrip("/").rsplit("/", 1)[-1] or "index"
+        with open(os.path.join(html_dir, f"{name}.html"), "wb") as f:
+            f.write(html)
+
+
+def compare(reference: List[Any], candidate: List[Any], pages: List[Tuple[str, bytes]]) -> List[str]:
+    """URL страниц, где движки дали разный заголовок, текст или число слов"""
+    fields = ("title", "content", "word_count")
+    differing = []
+    for (url, _), expected, actual in zip(pages, reference, candidate):
+        if (expected is None) != (actual is None):
+            differing.append(url)
+        elif expected and any(expected[field] != actual[field] for field in fields):
+            differing.append(url)
+    return differing
+
+
+def run(pages: List[Tuple[str, bytes]], repeats: int) -> Dict[str, Any]:
+    """Каждый движок разбирает все страницы repeats раз; берется лучший прогон"""
+    from app.core.parser import HTMLParser, lxml
+
+    engines = ENGINES if lxml is not None else ["bs4"]
+    results = {}
+    outputs = {}
+
+    for engine in engines:
+        parser = HTMLParser(engine=engine)
+        timings = []
+        for _ in range(repeats):
+            started_at = time.perf_counter()
+            outputs[engine] = [parser.parse_html(url, html) for url, html in pages]
+            timings.append(time.perf_counter() - started_at)
+
+        seconds = min(timings)
+        results[engine] = {
+            'seconds': round(seconds, 4),
+            'pages_per_second': round(len(pages) / seconds, 1),
+            'ms_per_page': round(1000 * seconds / len(pages), 3)
+        }
+        print(json.dumps({'engine': engine, **results[engine]}, ensure_ascii=False))
+
+    report = {
+        'pages': len(pages),
+        'bytes': sum(len(html) for _, html in pages),
+        'engines': results
+    }
+
+    if "lxml" in results:
+        report['speedup'] = round(results['bs4']['seconds'] / results['lxml']['seconds'], 2)
+        report['differing_urls'] = compare(outputs['bs4'], outputs['lxml'], pages)
+        print(f"Ускорение lxml: x{report['speedup']}, расхождений: {len(report['differing_urls'])}")
+        for url in report['differing_urls']:
+            print(f"  расходится: {url}")
+    else:
+        print("lxml не установлен, замерен только BeautifulSoup")
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк движков разбора HTML")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--html-dir", help="Папка с сохраненными страницами вместо скачивания")
+    source.add_argument("--synthetic", type=int, metavar="PAGES",
+                        help="Синтетический корпус из benchmark_ingestion вместо реальных страниц")
+    parser.add_argument("--save-dir", help="Сохранить скачанные страницы для повторных прогонов")
+    parser.add_argument("--repeats", type=int, default=5, help="Прогонов на движок")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    if args.html_dir:
+        pages = load_pages(args.html_dir)
+    elif args.synthetic:
+        from scripts.benchmark_ingestion import synthetic_corpus
+
+        pages = synthetic_corpus(args.synthetic, 800)
+    else:
+        from scripts.init_database import COMPANY_URLS
+
+        pages = asyncio.run(fetch_pages(COMPANY_URLS))
+        if args.save_dir:
+            save_pages(pages, args.save_dir)
+
+    if not pages:
+        raise SystemExit("Нет страниц для разбора")
+
+    report = run(pages, args.repeats)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
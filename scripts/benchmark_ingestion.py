@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Микробенчмарки загрузки базы знаний на синтетическом HTML: парсинг, чанкинг, эмбеддинги, upsert в Chroma"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+STAGES = ["parse", "chunk", "encode", "add_documents", "upsert"]
+
+VOCABULARY = (
+    "компания разработала чат-бот для клиентов банка ритейла логистики который отвечает на вопросы "
+    "обрабатывает заявки распознает речь анализирует изображения товаров на полках модель обучена "
+    "на данных заказчика интеграция с CRM сократила время ответа операторов внедрение заняло три месяца "
+    "нейросеть компьютерное зрение рекомендательная система голосовой ассистент контакт-центр"
+).split()
+
+
+def synthetic_page(index: int, words: int, rng: random.Random) -> bytes:
+    """Страница кейса со служебными блоками, как на сайте: меню, баннеры, скрипты, подвал"""
+    text = [rng.choice(VOCABULARY) for _ in range(words)]
+    paragraphs = "".join(f"<p>{' '.join(text[i:i + 60])}.</p>" for i in range(0, words, 60))
+    return f"""<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8">
+<title>Кейс {index} — EORA</title><style>body {{ font-family: sans-serif; }}</style>
+<script>window.dataLayer = window.dataLayer || [];</script></head>
+<body><header><nav class="menu"><a href="/">Главная</a> <a href="/cases">Кейсы</a></nav></header>
+<div class="cookie-banner">Мы используем cookie</div>
+<main><h1 class="case-title">Кейс {index}: {' '.join(text[:5])}</h1>{paragraphs}
+<ul><li>Срок: 3 месяца</li><li>Команда: 5 человек</li></ul></main>
+<aside class="sidebar">Похожие кейсы</aside><div class="popup">Оставьте заявку</div>
+<footer>© EORA</footer><script>track("case-{index}");</script></body></html>""".encode("utf-8")
+
+
+def synthetic_corpus(pages: int, words: int, seed: int = 0) -> List[Tuple[str, bytes]]:
+    """pages страниц по ~words слов"""
+    rng = random.Random(seed)
+    return [(f"https://eora.ru/cases/case-{i}", synthetic_page(i, words, rng)) for i in range(pages)]
+
+
+def read_memory_kb(key: str) -> Optional[int]:
+    """Поле VmRSS/VmHWM из /proc/self/status (Linux)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> None:
+    """Сбрасывает VmHWM до текущего RSS, чтобы пик считался по этапу (Linux)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def measure(stage: str, fn: Callable[[], Any], docs: int, chunks: int) -> Tuple[Any, Dict[str, Any]]:
+    """Время, docs/s, chunks/s и пик RSS одного этапа"""
+    reset_peak_rss()
+    rss_before = read_memory_kb("VmRSS")
+    started_at = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started_at
+    peak = read_memory_kb("VmHWM")
+
+    report = {
+        'stage': stage,
+        'seconds': round(seconds, 3),
+        'docs_per_second': round(docs / seconds, 1) if docs else None,
+        'chunks_per_second': round(chunks / seconds, 1) if chunks else None,
+        'peak_rss_mb': round(peak / 1024, 1) if peak else None,
+        'rss_growth_mb': round((peak - rss_before) / 1024, 1) if peak and rss_before else None
+    }
+    return result, report
+
+
+def batched(items: List[Any], size: int) -> List[List[Any]]:
+    """Делит список на батчи"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Этапы по порядку; эмбеддинги и Chroma пишут во временную папку"""
+    # Импорт после выставления VECTOR_DB_PATH: настройки читаются при импорте
+    from app.core.chunker import ContentChunker
+    from app.core.parser import HTMLParser
+
+    corpus = synthetic_corpus(args.pages, args.words, args.seed)
+    results = []
+
+    def record(report: Dict[str, Any]) -> None:
+        results.append(report)
+        print(json.dumps(report, ensure_ascii=False))
+
+    html_parser = HTMLParser()
+    documents, report = measure("parse", lambda: [html_parser.parse_html(url, html) for url, html in corpus],
+                                len(corpus), 0)
+    documents = [document for document in documents if document]
+    if "parse" in args.stages:
+        record(report)
+
+    chunker = ContentChunker()
+    chunks, report = measure("chunk", lambda: [chunk for document in documents
+                                               for chunk in chunker.chunk_document(document)], len(documents), 0)
+    report['chunks'] = len(chunks)
+    report['chunks_per_second'] = round(len(chunks) / report['seconds'], 1) if report['seconds'] else None
+    if "chunk" in args.stages:
+        record(report)
+
+    contents = [chunk['content'] for chunk in chunks]
+    dim = args.dim
+    if "encode" in args.stages or "add_documents" in args.stages:
+        from app.core.embedding import EmbeddingService
+
+        embedding_service = EmbeddingService()
+        embedding_service.warmup()
+
+        if "encode" in args.stages:
+            embeddings, report = measure("encode", lambda: embedding_service.model.encode(contents),
+                                         len(documents), len(chunks))
+            dim = embeddings.shape[1]
+            record(report)
+
+        if "add_documents" in args.stages:
+            for batch_size in args.batch_sizes:
+                # Каждый размер батча пишет в пустую коллекцию
+                embedding_service.collection = embedding_service.chroma_client.get_or_create_collection(
+                    name=f"bench_add_{batch_size}", metadata={"hnsw:space": "cosine"})
+                batches = batched(chunks, batch_size)
+                _, report = measure(f"add_documents[{batch_size}]",
+                                    lambda: [embedding_service.add_documents(batch) for batch in batches],
+                                    len(documents), len(chunks))
+                report['batch_size'] = batch_size
+                record(report)
+        embedding_service.close()
+
+    if "upsert" in args.stages:
+        import chromadb
+
+        client = chromadb.PersistentClient(path=os.path.join(os.environ['VECTOR_DB_PATH'], "upsert"))
+        # Готовые векторы: замеряем только Chroma без модели
+        vectors = np.random.default_rng(args.seed).standard_normal((len(chunks), dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [chunk['chunk_id'] for chunk in chunks]
+        metadatas = [{'source_url': chunk['source_url'], 'chunk_index': chunk['chunk_index']} for chunk in chunks]
+
+        for batch_size in args.batch_sizes:
+            collection = client.get_or_create_collection(name=f"bench_upsert_{batch_size}",
+                                                         metadata={"hnsw:space": "cosine"})
+
+            def upsert():
+                for start in range(0, len(chunks), batch_size):
+                    end = start + batch_size
+                    collection.upsert(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                                      documents=contents[start:end], metadatas=metadatas[start:end])
+
+            _, report = measure(f"upsert[{batch_size}]", upsert, len(documents), len(chunks))
+            report['batch_size'] = batch_size
+            record(report)
+
+    return {
+        'corpus': {'pages': args.pages, 'words_per_page': args.words, 'documents': len(documents),
+                   'chunks': len(chunks)},
+        'stages': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки этапов загрузки базы знаний")
+    parser.add_argument("--pages", type=int, default=500, help="Страниц в синтетическом корпусе")
+    parser.add_argument("--words", type=int, default=800, help="Слов на странице")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES,
+                        help="encode и add_documents требуют модель эмбеддингов")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256], help="Размеры батчей upsert")
+    parser.add_argument("--dim", type=int, default=384, help="Размерность векторов для upsert без модели")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag_ingest_")
+    os.environ['VECTOR_DB_PATH'] = workdir
+    try:
+        report = run(args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
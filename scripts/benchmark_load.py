@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Нагрузочный бенчмарк /api/v1/ask: API на небольшой тестовой базе против заглушки LLM"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from scripts.benchmark_startup import free_port, wait_for
+
+QUESTIONS = [
+    "Что вы делали для ритейлеров?",
+    "Какие решения EORA предлагала для автоматизации контакт-центров?",
+    "Какие технологии используются для компьютерного зрения?",
+    "Был ли у вас опыт с голосовыми ассистентами?",
+    "Что вы делали для Lamoda?",
+    "Как чат-бот помогает службе поддержки банка?",
+    "Делали ли вы рекомендательные системы?",
+    "Какие проекты были в медицине?",
+]
+
+# Тестовая база: страницы кейсов, из которых чанкер нарежет несколько десятков чанков
+FIXTURE_CASES = [
+    ("Чат-бот для Lamoda", "lamoda", "чат-бот отвечает покупателям о статусе заказа и возврате товара"),
+    ("Голосовой ассистент для банка", "bank-voice", "голосовой ассистент распознает речь клиента банка"),
+    ("Компьютерное зрение для ритейла", "retail-cv", "камеры и нейросети считают товары на полках магазина"),
+    ("Рекомендательная система маркетплейса", "recsys", "модель подбирает товары по истории покупок"),
+    ("Автоматизация контакт-центра", "contact-center", "бот закрывает типовые обращения без оператора"),
+    ("Анализ медицинских снимков", "medical", "нейросеть находит патологии на рентгеновских снимках"),
+    ("HR-бот для подбора персонала", "hr-bot", "бот проводит первичное собеседование с кандидатом"),
+    ("Поиск по базе знаний", "knowledge-search", "семантический поиск находит ответ в документации компании"),
+]
+
+
+def fixture_pages() -> List[Dict[str, str]]:
+    """Синтетические страницы кейсов по ~300 слов"""
+    pages = []
+    for title, slug, summary in FIXTURE_CASES:
+        sentences = [
+            f"{title}: {summary}.",
+            f"В проекте {slug} команда EORA собрала данные, обучила модель и внедрила решение в процессы заказчика.",
+            f"После запуска {summary}, а нагрузка на сотрудников заметно снизилась.",
+        ]
+        pages.append({
+            'url': f"https://eora.ru/cases/{slug}",
+            'title': title,
+            'content': " ".join(sentences[i % len(sentences)] for i in range(20))
+        })
+    return pages
+
+
+def build_fixture() -> dict:
+    """Наполняет коллекцию и BM25-индекс в VECTOR_DB_PATH (запускается в отдельном процессе)"""
+    from app.core.chunker import ContentChunker
+    from app.core.embedding import EmbeddingService
+    from app.core.lexical import BM25Index
+
+    chunker = ContentChunker()
+    chunks = [chunk for page in fixture_pages() for chunk in chunker.chunk_document(page)]
+
+    embedding_service = EmbeddingService()
+    embedding_service.add_documents(chunks)
+    embedding_service.close()
+
+    lexical_index = BM25Index.load()
+    lexical_index.add_documents(chunks)
+    lexical_index.save()
+    return {'pages': len(FIXTURE_CASES), 'chunks': len(chunks)}
+
+
+def create_stub_llm(latency_ms: float, tokens_per_second: float, answer_tokens: int):
+    """OpenAI-совместимая заглушка chat/completions: задержка до ответа и скорость выдачи токенов"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    tokens = [f"токен{i} " for i in range(answer_tokens)]
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/chat/completions")
+    async def completions(request: Request):
+        payload = await request.json()
+        await asyncio.sleep(latency_ms / 1000)
+
+        if payload.get("stream"):
+            async def events():
+                for token in tokens:
+                    await asyncio.sleep(1 / tokens_per_second)
+                    yield f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(answer_tokens / tokens_per_second)
+        return {"choices": [{"message": {"content": "".join(tokens)}}]}
+
+    return app
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """Текущий и пиковый RSS процесса из /proc (Linux)"""
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = round(int(value.split()[0]) / 1024, 1)
+    return {'rss_mb': values.get("VmRSS"), 'peak_rss_mb': values.get("VmHWM")}
+
+
+async def drive(base_url: str, concurrency: int, requests: int, cold: bool) -> dict:
+    """requests вопросов к /ask при фиксированной конкурентности; cold делает каждый вопрос уникальным"""
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal errors
+            while (i := next(counter)) < requests:
+                question = QUESTIONS[i % len(QUESTIONS)]
+                if cold:
+                    # Номер запроса обходит кэш эмбеддингов запросов и склейку одинаковых вопросов
+                    question = f"{question} (запрос {i})"
+                started_at = time.perf_counter()
+                try:
+                    response = await client.post("/api/v1/ask", json={"question": question})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started_at)
+                else:
+                    errors += 1
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+
+    latencies_ms = 1000 * np.array(latencies) if latencies else np.zeros(1)
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 1),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 1),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 1)
+    }
+
+
+def compare_reports(baseline: dict, report: dict, max_regression: float) -> List[str]:
+    """Уровни конкурентности, где p95 вырос или пропускная способность упала больше допуска"""
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    regressions = []
+    for level in report['levels']:
+        old = previous.get(level['concurrency'])
+        if old is None:
+            continue
+        if level['p95_ms'] > old['p95_ms'] * (1 + max_regression):
+            regressions.append(f"c={level['concurrency']}: p95 {old['p95_ms']} → {level['p95_ms']} мс")
+        if level['throughput_rps'] < old['throughput_rps'] * (1 - max_regression):
+            regressions.append(f"c={level['concurrency']}: "
+                               f"пропускная способность {old['throughput_rps']} → {level['throughput_rps']} rps")
+    return regressions
+
+
+def start(args: List[str], env: dict) -> subprocess.Popen:
+    """Запускает процесс Python с выводом в никуда"""
+    return subprocess.Popen([sys.executable, *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+
+
+def stop(process: Optional[subprocess.Popen]) -> None:
+    """Завершает процесс, если он был запущен"""
+    if process is not None:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Тестовая база, заглушка LLM, API и прогон уровней конкурентности"""
+    workdir = tempfile.mkdtemp(prefix="rag_load_")
+    env = os.environ.copy()
+    env.update({
+        'VECTOR_DB_PATH': os.path.join(workdir, "vector_db"),
+        'LOG_FOLDER': os.path.join(workdir, "logs"),
+        'LOG_LEVEL': "WARNING",
+    })
+    if args.cache_mode == "cold":
+        # Вопросы с номером запроса близки по смыслу, семантический кэш ответов отдал бы их без LLM
+        env['ANSWER_CACHE_MAX_ENTRIES'] = "0"
+
+    stub_process = api_process = None
+    try:
+        completed = subprocess.run([sys.executable, "-m", "scripts.benchmark_load", "--build-fixture"],
+                                   capture_output=True, text=True, env=env)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Не удалось собрать тестовую базу:\n{completed.stderr.strip()}")
+        fixture = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        stub_port = free_port()
+        stub_process = start(["-m", "scripts.benchmark_load", "--stub-llm", str(stub_port),
+                              "--llm-latency-ms", str(args.llm_latency_ms),
+                              "--llm-tokens-per-second", str(args.llm_tokens_per_second),
+                              "--llm-answer-tokens", str(args.llm_answer_tokens)], env)
+
+        env.update({
+            'LLM_PROVIDER': "sonar",
+            'LLM_FALLBACK_PROVIDERS': "",
+            'SONAR_BASE_URL': f"http://127.0.0.1:{stub_port}/chat/completions",
+            'SONAR_API_KEY': "stub",
+        })
+        api_port = free_port()
+        base_url = f"http://127.0.0.1:{api_port}"
+        api_process = start(["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(api_port)], env)
+
+        with httpx.Client(timeout=1.0) as client:
+            wait_for(client, f"http://127.0.0.1:{stub_port}/health", stub_process, args.timeout)
+            wait_for(client, f"{base_url}/health/ready", api_process, args.timeout)
+
+        asyncio.run(drive(base_url, 1, args.warmup, cold=False))
+        levels = []
+        for concurrency in args.concurrency:
+            level = asyncio.run(drive(base_url, concurrency, args.requests, args.cache_mode == "cold"))
+            level.update(memory_mb(api_process.pid))
+            levels.append(level)
+            print(json.dumps(level, ensure_ascii=False))
+
+        with httpx.Client(base_url=base_url, timeout=10.0) as client:
+            stats = client.get("/health/stats").json()
+    finally:
+        stop(api_process)
+        stop(stub_process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'fixture': fixture,
+        'llm_stub': {'latency_ms': args.llm_latency_ms, 'tokens_per_second': args.llm_tokens_per_second,
+                     'answer_tokens': args.llm_answer_tokens},
+        'cache_mode': args.cache_mode,
+        'levels': levels,
+        # Разбивка по этапам помогает понять, какой сервис дал регрессию
+        'stages': {'search': stats.get('search_stages'), 'generation': stats.get('generation_stages')}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк /api/v1/ask с заглушкой LLM")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Уровни конкурентности")
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на уровень")
+    parser.add_argument("--warmup", type=int, default=10, help="Прогревочных запросов")
+    parser.add_argument("--cache-mode", choices=["cold", "warm"], default="cold",
+                        help="cold — уникальные вопросы мимо кэшей, warm — повторяющиеся")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="Задержка заглушки до ответа")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=100.0, help="Скорость выдачи токенов")
+    parser.add_argument("--llm-answer-tokens", type=int, default=50, help="Токенов в ответе заглушки")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Лимит ожидания готовности, с")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Допустимое ухудшение p95 и rps")
+    parser.add_argument("--build-fixture", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stub-llm", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build_fixture:
+        print(json.dumps(build_fixture()))
+        return
+
+    if args.stub_llm:
+        import uvicorn
+
+        app = create_stub_llm(args.llm_latency_ms, args.llm_tokens_per_second, args.llm_answer_tokens)
+        uvicorn.run(app, host="127.0.0.1", port=args.stub_llm, log_level="warning")
+        return
+
+    report = run(args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_reports(json.load(f), report, args.max_regression)
+        for regression in regressions:
+            print(f"Регрессия: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
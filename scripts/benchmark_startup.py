@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Холодный старт API: время импорта app.main и время до готовности uvicorn"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "onnxruntime", "bs4", "requests"]
+
+IMPORT_SNIPPET = f"""
+import json, sys, time
+started_at = time.perf_counter()
+import app.main
+print(json.dumps({{
+    'seconds': time.perf_counter() - started_at,
+    'heavy_modules': [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+}}))
+"""
+
+
+def measure_import(runs: int) -> dict:
+    """Время импорта app.main в чистом процессе и какие тяжелые модули он подтянул"""
+    results = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    seconds = [result['seconds'] for result in results]
+    return {
+        'runs': runs,
+        'median_seconds': round(statistics.median(seconds), 3),
+        'min_seconds': round(min(seconds), 3),
+        'heavy_modules': results[-1]['heavy_modules']
+    }
+
+
+def free_port() -> int:
+    """Свободный локальный порт для uvicorn"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, url: str, process: subprocess.Popen, timeout: float) -> float:
+    """Опрашивает url до ответа 200, возвращает момент успеха"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn завершился с кодом {process.returncode}")
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} не ответил за {timeout} с")
+
+
+def measure_ready(timeout: float) -> dict:
+    """Время от запуска uvicorn до приема соединений и до готовности модели"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy()
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            live_at = wait_for(client, f"{base_url}/health/live", process, timeout)
+            ready_at = wait_for(client, f"{base_url}/health/ready", process, timeout)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    return {
+        'time_to_listen_seconds': round(live_at - started_at, 3),
+        'time_to_ready_seconds': round(ready_at - started_at, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта API")
+    parser.add_argument("--import-runs", type=int, default=5, help="Сколько раз замерять импорт")
+    parser.add_argument("--skip-ready", action="store_true", help="Не запускать uvicorn (нужны модель и база)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Лимит ожидания готовности, с")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    report = {'import': measure_import(args.import_runs)}
+    if not args.skip_ready:
+        report['startup'] = measure_ready(args.timeout)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
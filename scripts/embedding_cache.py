@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Статистика и обслуживание дискового кэша эмбеддингов"""
+
+import argparse
+import json
+
+from app.core.embedding_store import EmbeddingStore
+from config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Дисковый кэш эмбеддингов чанков")
+    parser.add_argument("command", choices=["stats", "evict", "clear"],
+                        help="stats — статистика, evict — вытеснить сверх лимита, clear — очистить")
+    parser.add_argument("--path", default=settings.EMBEDDING_STORE_PATH, help="Путь к файлу кэша")
+    parser.add_argument("--max-mb", type=int, default=settings.EMBEDDING_STORE_MAX_MB,
+                        help="Лимит размера для evict")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(path=args.path, max_mb=args.max_mb)
+    try:
+        if args.command == "evict":
+            store.evict()
+        elif args.command == "clear":
+            store.clear()
+
+        print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
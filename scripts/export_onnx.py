@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Выгрузка модели эмбеддингов в ONNX (fp32 и int8) и проверка паритета с torch"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List
+
+import numpy as np
+
+from app.core.embedding_backends import (
+    DEFAULT_EMBEDDING_MODEL,
+    ONNX_CONFIG_FILE,
+    ONNX_MODEL_FILES,
+    load_embedding_model,
+)
+from config import settings
+
+# Тексты для проверки паритета: вопросы и фрагменты кейсов разной длины
+PARITY_TEXTS = [
+    "Что вы делали для Lamoda?",
+    "Какие решения EORA предлагала для автоматизации контакт-центров?",
+    "Какие технологии используются для компьютерного зрения?",
+    "Что вы можете сделать для ритейлеров?",
+    "чат-бот",
+    "QIWI поиск аномалий в платежных транзакциях",
+    "Робот-аналитик отзывов для Додо Пиццы собирает отзывы клиентов, размечает их по темам и тональности "
+    "и формирует отчеты для управляющих пиццериями.",
+    "Навык для голосового ассистента помогает подобрать корм для собаки по породе, возрасту и активности.",
+    "Нейросеть для сегментации человека на видео с тремя моделями для разных мобильных устройств, "
+    "позволяющая менять фон и накладывать маски в приложении для обработки фото и видео. " * 4,
+    "How do you evaluate retrieval quality?",
+]
+
+
+def export(model_name: str, output_dir: str, quantize: bool) -> None:
+    """Выгружает трансформер в ONNX, сохраняет токенизатор и параметры пулинга"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    pooling = next(module for module in model if isinstance(module, Pooling))
+    if pooling.pooling_mode_mean_tokens:
+        pooling_mode = "mean"
+    elif pooling.pooling_mode_cls_token:
+        pooling_mode = "cls"
+    else:
+        raise ValueError(f"Пулинг {pooling.get_pooling_mode_str()} не поддерживается")
+
+    class LastHiddenState(torch.nn.Module):
+        """Обертка, отдающая только last_hidden_state"""
+
+        def __init__(self, encoder, input_names):
+            super().__init__()
+            self.encoder = encoder
+            self.input_names = input_names
+
+        def forward(self, *inputs):
+            return self.encoder(**dict(zip(self.input_names, inputs))).last_hidden_state
+
+    sample = tokenizer(["Пример текста для трассировки"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, ONNX_MODEL_FILES["onnx"])
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer, input_names),
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False
+        )
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": model.max_seq_length,
+            "pad_token_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+            "pooling": pooling_mode,
+            "normalize": any(isinstance(module, Normalize) for module in model)
+        }, f, ensure_ascii=False, indent=2)
+    print(f"fp32: {fp32_path}")
+
+    if quantize:
+        # Динамическая квантизация весов в int8, активации считаются в fp32
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output_dir, ONNX_MODEL_FILES["onnx-int8"])
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"int8: {int8_path}")
+
+
+def check_parity(model_name: str, onnx_path: str, backends: List[str], min_cosine: float) -> bool:
+    """Сравнивает эмбеддинги ONNX-бэкендов с torch по косинусу"""
+    reference = load_embedding_model(model_name, "torch").encode(PARITY_TEXTS)
+    passed = True
+
+    for backend in backends:
+        embeddings = load_embedding_model(model_name, backend, onnx_path).encode(PARITY_TEXTS)
+        cosines = np.sum(reference * embeddings, axis=1) / (
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(embeddings, axis=1)
+        )
+        ok = cosines.min() >= min_cosine
+        passed = passed and ok
+        print(f"{backend}: min cos={cosines.min():.5f}, mean cos={cosines.mean():.5f} "
+              f"[{'OK' if ok else f'FAIL < {min_cosine}'}]")
+
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX-бэкенд для модели эмбеддингов")
+    parser.add_argument("command", choices=["export", "check"],
+                        help="export — выгрузить и квантизовать, затем проверить паритет; check — только паритет")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL, help="Модель sentence-transformers")
+    parser.add_argument("--output", default=settings.EMBEDDING_ONNX_PATH, help="Каталог для ONNX-модели")
+    parser.add_argument("--no-quantize", action="store_true", help="Не создавать int8-модель")
+    parser.add_argument("--min-cosine", type=float, default=settings.EMBEDDING_PARITY_MIN_COSINE,
+                        help="Минимальный косинус к векторам torch")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.model, args.output, quantize=not args.no_quantize)
+
+    backends = [backend for backend, file_name in ONNX_MODEL_FILES.items()
+                if os.path.exists(os.path.join(args.output, file_name))]
+    if not backends:
+        print(f"В {args.output} нет ONNX-модели, сначала выполните export")
+        sys.exit(1)
+
+    if not check_parity(args.model, args.output, backends, args.min_cosine):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Настройки читаются при первом импорте config: логи тестов пишутся во временную папку, а не в logs/ репозитория
+os.environ.setdefault("LOG_FOLDER", tempfile.mkdtemp(prefix="rag_test_logs_"))
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Отвечает как chat/completions API, запоминает запросы и соединения"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.server.requests.append((self.path, body))
+        self.server.connections.add(self.client_address)
+
+        if self.path.endswith("/oauth"):
+            self._send_token()
+            return
+
+        if json.loads(body or b"{}").get("stream"):
+            self._send_stream()
+            return
+
+        payload = {"choices": [{"message": {"content": f" {self.server.answer} "}}]}
+        self._send_json(payload)
+
+    def _send_stream(self):
+        events = [
+            {"choices": [{"delta": {"content": word}}]}
+            for word in re.findall(r"\S+\s*", self.server.answer)
+        ]
+        data = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        data = data.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_token(self):
+        with self.server.lock:
+            self.server.token_requests += 1
+            number = self.server.token_requests
+        time.sleep(self.server.auth_delay)
+        self._send_json({"access_token": f"token-{number}", "expires_in": self.server.token_expires_in})
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def llm_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    server.requests = []
+    server.connections = set()
+    server.answer = "Ответ заглушки"
+    server.lock = threading.Lock()
+    server.token_requests = 0
+    server.token_expires_in = 1800
+    server.auth_delay = 0.0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    """Отдает HTML-страницы из словаря server.pages"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        page = self.server.pages.get(self.path)
+        self.server.requests.append(self.path)
+        if page is None:
+            self._send_empty(404)
+            return
+
+        # ETag — хэш содержимого, как у обычного веб-сервера
+        etag = f'"{hashlib.md5(page.encode("utf-8")).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send_empty(304)
+            return
+
+        data = page.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_empty(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSiteHandler)
+    server.pages = {}
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
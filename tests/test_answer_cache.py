@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.core.answer_cache import SemanticAnswerCache
+
+
+class FakeIndexVersion:
+    def __init__(self):
+        self.version = 1
+
+    def __call__(self):
+        return self.version
+
+
+@pytest.fixture
+def index_version():
+    return FakeIndexVersion()
+
+
+@pytest.fixture
+def cache(index_version):
+    return SemanticAnswerCache(max_entries=4, ttl_seconds=60, max_distance=0.05,
+                               index_version_fn=index_version)
+
+
+def test_hit_for_close_question_with_same_chunks(cache):
+    cache.put(np.array([1.0, 0.0, 0.0]), ["a#chunk_0", "b#chunk_1"], "ответ")
+
+    assert cache.get(np.array([0.99, 0.05, 0.0]), ["b#chunk_1", "a#chunk_0"]) == "ответ"
+    assert cache.stats()['hits'] == 1
+
+
+def test_miss_for_distant_question_or_other_chunks(cache):
+    cache.put(np.array([1.0, 0.0, 0.0]), ["a#chunk_0"], "ответ")
+
+    assert cache.get(np.array([0.0, 1.0, 0.0]), ["a#chunk_0"]) is None
+    assert cache.get(np.array([1.0, 0.0, 0.0]), ["c#chunk_0"]) is None
+    assert cache.stats()['misses'] == 2
+
+
+def test_expired_entries_are_ignored(index_version):
+    cache = SemanticAnswerCache(max_entries=4, ttl_seconds=0, max_distance=0.05,
+                                index_version_fn=index_version)
+    cache.put(np.array([1.0, 0.0]), ["a#chunk_0"], "ответ")
+
+    assert cache.get(np.array([1.0, 0.0]), ["a#chunk_0"]) is None
+
+
+def test_oldest_entry_is_evicted(cache):
+    for i in range(5):
+        vector = np.zeros(5)
+        vector[i] = 1.0
+        cache.put(vector, [f"chunk_{i}"], f"ответ {i}")
+
+    assert cache.get(np.array([1.0, 0, 0, 0, 0]), ["chunk_0"]) is None
+    assert cache.get(np.array([0, 0, 0, 0, 1.0]), ["chunk_4"]) == "ответ 4"
+
+
+def test_reindex_invalidates_cache(cache, index_version):
+    cache.put(np.array([1.0, 0.0]), ["a#chunk_0"], "ответ")
+
+    index_version.version = 2
+
+    assert cache.get(np.array([1.0, 0.0]), ["a#chunk_0"]) is None
+    assert cache.stats()['invalidations'] == 1
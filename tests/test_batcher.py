@@ -0,0 +1,64 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.core.batcher import EncodeBatcher
+from app.core.executor import InferenceExecutor
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(max_workers=1, max_queue=8)
+    yield executor
+    executor.shutdown()
+
+
+def test_concurrent_queries_share_one_encode(executor):
+    encoder = FakeEncoder()
+    batcher = EncodeBatcher(encoder, executor, max_batch_size=8, max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(*(batcher.encode("q" * i) for i in range(1, 6)))
+
+    vectors = asyncio.run(main())
+
+    assert len(encoder.calls) == 1
+    assert [vector[0] for vector in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert batcher.stats()['max_batch_size'] == 5
+
+
+def test_batch_is_flushed_at_max_size(executor):
+    encoder = FakeEncoder()
+    batcher = EncodeBatcher(encoder, executor, max_batch_size=2, max_wait_ms=1000)
+
+    async def main():
+        return await asyncio.gather(*(batcher.encode("q") for _ in range(4)))
+
+    asyncio.run(main())
+
+    assert [len(call) for call in encoder.calls] == [2, 2]
+    assert batcher.stats()['batches_total'] == 2
+
+
+def test_encode_error_is_propagated(executor):
+    def failing_encoder(texts):
+        raise RuntimeError("boom")
+
+    batcher = EncodeBatcher(failing_encoder, executor, max_batch_size=4, max_wait_ms=1)
+
+    async def main():
+        return await asyncio.gather(batcher.encode("a"), batcher.encode("b"), return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,15 @@
+from app.core.parser import HTMLParser
+from scripts.benchmark_ingestion import synthetic_corpus
+
+
+def test_synthetic_pages_parse_like_case_pages():
+    corpus = synthetic_corpus(pages=3, words=120)
+
+    documents = [HTMLParser().parse_html(url, html) for url, html in corpus]
+
+    for index, document in enumerate(documents):
+        assert document['title'].startswith(f"Кейс {index}:")
+        assert document['word_count'] >= 120
+        # Меню, баннеры, скрипты и подвал вырезаны
+        for noise in ("Главная", "cookie", "dataLayer", "Похожие", "EORA"):
+            assert noise not in document['content']
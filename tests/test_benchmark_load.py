@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+from scripts.benchmark_load import compare_reports, create_stub_llm
+
+
+def test_stub_llm_answers_json_and_sse():
+    client = TestClient(create_stub_llm(latency_ms=1, tokens_per_second=1000, answer_tokens=3))
+
+    response = client.post("/chat/completions", json={"messages": []})
+    assert response.json()["choices"][0]["message"]["content"] == "токен0 токен1 токен2 "
+
+    stream = client.post("/chat/completions", json={"messages": [], "stream": True})
+    assert stream.text.count("data: ") == 4
+    assert stream.text.endswith("data: [DONE]\n\n")
+
+
+def test_compare_reports_flags_only_regressions_beyond_tolerance():
+    baseline = {'levels': [{'concurrency': 1, 'p95_ms': 100.0, 'throughput_rps': 10.0},
+                           {'concurrency': 4, 'p95_ms': 200.0, 'throughput_rps': 30.0}]}
+    report = {'levels': [{'concurrency': 1, 'p95_ms': 115.0, 'throughput_rps': 9.0},
+                         {'concurrency': 4, 'p95_ms': 300.0, 'throughput_rps': 20.0}]}
+
+    regressions = compare_reports(baseline, report, max_regression=0.2)
+
+    assert len(regressions) == 2
+    assert all(regression.startswith("c=4") for regression in regressions)
@@ -0,0 +1,80 @@
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import WhitespaceSplit
+
+from app.core.chunker import ContentChunker
+from app.core.context_builder import ContextBuilder, TokenCounter, merge_overlapping
+from app.core.generator import ResponseGenerator
+
+
+def word_counter():
+    """Каждое слово — один токен"""
+    tokenizer = Tokenizer(WordLevel({"[UNK]": 0}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = WhitespaceSplit()
+    return TokenCounter(tokenizer)
+
+
+def make_context(chunk, url=None):
+    return {
+        'chunk_id': chunk['chunk_id'],
+        'content': chunk['content'],
+        'metadata': {'source_url': url or chunk['source_url'], 'source_title': chunk['source_title'],
+                     'chunk_index': chunk['chunk_index']}
+    }
+
+
+def make_chunks(url, title, words, chunk_size=10, overlap=3):
+    document = {'url': url, 'title': title, 'content': " ".join(f"w{i}" for i in range(words))}
+    return ContentChunker(chunk_size=chunk_size, overlap=overlap).chunk_document(document)
+
+
+def test_merge_overlapping_removes_chunker_overlap():
+    assert merge_overlapping("a b c d", "c d e f") == "a b c d e f"
+    assert merge_overlapping("a b", "c d") == "a b c d"
+
+
+def test_adjacent_chunks_merged_and_sources_listed_once():
+    chunks = make_chunks("https://eora.ru/a", "Кейс A", 24)
+    other = make_chunks("https://eora.ru/b", "Кейс B", 5)
+    # Порядок релевантности: второй чанк A, чужой источник, затем первый чанк A
+    contexts = [make_context(chunks[1]), make_context(other[0]), make_context(chunks[0])]
+
+    context = ContextBuilder(word_counter(), token_budget=1000, min_chunk_tokens=1).build(contexts)
+
+    assert context.text == ("[1] Кейс A\n" + " ".join(f"w{i}" for i in range(17)) +
+                            "\n\n[2] Кейс B\nw0 w1 w2 w3 w4")
+    assert context.links == "[1] https://eora.ru/a\n[2] https://eora.ru/b"
+    assert context.chunk_ids == [chunks[1]['chunk_id'], other[0]['chunk_id'], chunks[0]['chunk_id']]
+    assert context.tokens == 28
+
+
+def test_non_adjacent_chunks_are_marked_as_gap():
+    chunks = make_chunks("https://eora.ru/a", "A", 40)
+
+    context = ContextBuilder(word_counter(), token_budget=1000).build(
+        [make_context(chunks[0]), make_context(chunks[2])])
+
+    assert "w9\n…\nw14" in context.text
+
+
+def test_budget_truncates_last_chunk_and_drops_the_rest():
+    chunks = [make_chunks(f"https://eora.ru/{i}", f"T{i}", 10, chunk_size=10)[0] for i in range(3)]
+
+    # Заголовок стоит 1 + 4 токена: первый чанк 15, от второго остается 5 слов, третий не влезает
+    context = ContextBuilder(word_counter(), token_budget=25, min_chunk_tokens=3).build(
+        [make_context(chunk) for chunk in chunks])
+
+    assert context.chunk_ids == [chunks[0]['chunk_id'], chunks[1]['chunk_id']]
+    assert context.text.endswith("[2] T1\nw0 w1 w2 w3 w4")
+
+
+def test_prompt_has_no_padding_whitespace():
+    generator = ResponseGenerator(context_builder=ContextBuilder(word_counter()))
+    chunk = make_chunks("https://eora.ru/a", "Кейс A", 5)[0]
+
+    messages = generator._build_messages("Вопрос?", generator.context_builder.build([make_context(chunk)]))
+
+    prompt = messages[1]["content"]
+    assert prompt.startswith("Контекст:\n[1] Кейс A\nw0")
+    assert "Ссылки:\n[1] https://eora.ru/a" in prompt
+    assert not any(line.startswith("    ") for line in prompt.splitlines())
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from app.core.cross_encoder import CrossEncoderReranker
+from app.core.executor import InferenceExecutor
+
+
+class FakeCrossEncoder:
+    """Скор — число совпавших слов запроса, каждый батч занимает delay секунд"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return [len(set(query.split()) & set(content.split())) for query, content in pairs]
+
+
+def make_results(contents):
+    return [{'chunk_id': str(i), 'content': content} for i, content in enumerate(contents)]
+
+
+def make_reranker(model, **kwargs):
+    params = dict(executor=InferenceExecutor(max_workers=1, max_queue=4), max_candidates=4,
+                  top_k=2, batch_size=2, timeout_ms=1000, model=model)
+    params.update(kwargs)
+    return CrossEncoderReranker(**params)
+
+
+def test_rerank_scores_budget_in_batches():
+    model = FakeCrossEncoder()
+    reranker = make_reranker(model)
+    results = make_results(["корм", "бот для собак", "робот", "корм для собак", "собак корм бот"])
+
+    selected = reranker.apply("корм для собак", results, k=5)
+
+    # Скорятся только 4 кандидата из бюджета, батчами по 2, в промпт идет top_k
+    assert model.batches == [2, 2]
+    assert [result['chunk_id'] for result in selected] == ["3", "1"]
+    assert selected[0]['rerank_score'] == 3.0
+    assert reranker.stats() == {'reranked': 1, 'fallbacks': 0}
+
+
+def test_timeout_falls_back_to_first_stage_order():
+    model = FakeCrossEncoder(delay=0.05)
+    reranker = make_reranker(model, timeout_ms=30, batch_size=1)
+    results = make_results(["a", "b", "c b a", "d"])
+
+    selected = asyncio.run(reranker.apply_async("a b c", results, k=3))
+
+    assert [result['chunk_id'] for result in selected] == ["0", "1", "2"]
+    assert reranker.stats() == {'reranked': 0, 'fallbacks': 1}
+
+    # Начатый батч досчитывается, следующие уже не запускаются
+    time.sleep(0.1)
+    assert len(model.batches) < 4
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import numpy as np
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from app.core.embedding_backends import OnnxEmbeddingModel, embedding_model_key
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "корм": 2, "для": 3, "собак": 4, "бот": 5}
+
+
+class FakeSession:
+    """Скрытое состояние токена — [id токена, 1], паддинг дает [0, 1]"""
+
+    def __init__(self):
+        self.batch_shapes = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, output_names, inputs):
+        input_ids = inputs["input_ids"]
+        self.batch_shapes.append(input_ids.shape)
+        return [np.stack([input_ids, np.ones_like(input_ids)], axis=-1).astype(np.float32)]
+
+
+def make_model(normalize=False):
+    tokenizer = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    config = {'model_name': "test", 'max_seq_length': 8, 'pad_token_id': 0, 'pad_token': "[PAD]",
+              'pooling': "mean", 'normalize': normalize}
+    return OnnxEmbeddingModel(FakeSession(), tokenizer, config)
+
+
+def test_mean_pooling_ignores_padding_and_keeps_order():
+    model = make_model()
+
+    embeddings = model.encode(["бот", "корм для собак", "собак"], batch_size=2)
+
+    # Без маски паддинг занизил бы среднее у коротких текстов
+    np.testing.assert_allclose(embeddings, [[5, 1], [3, 1], [4, 1]])
+    # Длинный текст попадает в первый батч вместе с соседом по длине
+    assert model.session.batch_shapes == [(2, 3), (1, 1)]
+
+
+def test_normalize_and_truncation():
+    model = make_model(normalize=True)
+
+    embeddings = model.encode([" ".join(["корм"] * 20)])
+
+    assert model.session.batch_shapes == [(1, 8)]
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), [1.0], rtol=1e-6)
+
+
+def test_model_key_includes_non_default_backend():
+    assert embedding_model_key("model", "torch") == "model"
+    assert embedding_model_key("model", "onnx-int8") == "model@onnx-int8"
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from app.core.embedding_store import EmbeddingStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EmbeddingStore(path=str(tmp_path / "embeddings.sqlite3"), max_mb=1)
+    yield store
+    store.close()
+
+
+def test_roundtrip_by_model_and_text(store):
+    vectors = np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32)
+    store.put_many("model-a", ["первый чанк", "второй чанк"], vectors)
+
+    found = store.get_many("model-a", ["второй чанк", "новый чанк", "первый чанк"])
+
+    assert set(found) == {0, 2}
+    assert found[0].tolist() == [3.0, 4.0]
+    assert found[2].tolist() == [1.0, 2.0]
+    assert store.get_many("model-b", ["первый чанк"]) == {}
+
+
+def test_least_recently_used_are_evicted_by_size(store):
+    # Вектор 256 КБ, в лимит 1 МБ помещается 4
+    vector = np.zeros((1, 64 * 1024), dtype=np.float32)
+    for i in range(4):
+        store.put_many("model", [f"чанк {i}"], vector)
+
+    store.get_many("model", ["чанк 0"])
+    store.put_many("model", ["чанк 4"], vector)
+
+    found = store.get_many("model", [f"чанк {i}" for i in range(5)])
+    assert set(found) == {0, 2, 3, 4}
+    assert store.stats()['entries'] == 4
+
+
+def test_stats_by_model(store):
+    store.put_many("model-a", ["a"], np.ones((1, 4), dtype=np.float32))
+    store.put_many("model-b", ["b", "c"], np.ones((2, 4), dtype=np.float32))
+
+    stats = store.stats()
+
+    assert stats['entries'] == 3
+    assert stats['models']['model-b']['entries'] == 2
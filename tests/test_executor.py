@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.executor import InferenceExecutor
+from app.exceptions.exceptions import ServiceOverloadedException
+
+
+def test_run_returns_result_from_pool():
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+
+    async def main():
+        return await executor.run(lambda x: (x * 2, threading.current_thread().name), 21)
+
+    result, thread_name = asyncio.run(main())
+    executor.shutdown()
+
+    assert result == 42
+    assert thread_name.startswith("inference")
+    assert executor.pending == 0
+
+
+def test_run_rejects_when_saturated():
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        busy = [asyncio.create_task(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(ServiceOverloadedException) as exc_info:
+            await executor.run(lambda: None)
+
+        release.set()
+        await asyncio.gather(*busy)
+        return exc_info.value
+
+    error = asyncio.run(main())
+    executor.shutdown()
+
+    assert error.status_code == 503
+    assert executor.pending == 0
+
+
+def test_cancelled_waiter_keeps_slot_until_thread_finishes():
+    executor = InferenceExecutor(max_workers=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait()
+
+    async def main():
+        waiter = asyncio.create_task(executor.run(work))
+        await asyncio.to_thread(started.wait)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # Клиент ушел, но поток еще занят — слот не освобождается
+        pending_after_cancel = executor.pending
+        try:
+            with pytest.raises(ServiceOverloadedException):
+                await asyncio.wait_for(executor.run(lambda: None), timeout=1)
+        finally:
+            release.set()
+
+        while executor.pending:
+            await asyncio.sleep(0.01)
+        return pending_after_cancel, await executor.run(lambda: "ok")
+
+    pending_after_cancel, result = asyncio.run(main())
+    executor.shutdown()
+
+    assert pending_after_cancel == 1
+    assert result == "ok"
+    assert executor.pending == 0
@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.failover import CircuitBreaker, FailoverLlmClient
+from app.core.interface import LlmInterface
+from app.exceptions.exceptions import LLMUnavailableException
+
+
+class FakeProvider(LlmInterface):
+    """Локальный провайдер: отвечает своим именем через delay секунд или падает"""
+
+    def __init__(self, name, delay=0.0, fail=False, fail_mid_stream=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.fail_mid_stream = fail_mid_stream
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_response(self, messages, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} недоступен")
+        return self.name
+
+    async def stream_response(self, messages, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} недоступен")
+        for part in (self.name, "!"):
+            yield part
+        if self.fail_mid_stream:
+            raise RuntimeError(f"{self.name} оборвал ответ")
+
+
+def make_client(*providers, **kwargs):
+    options = dict(hedging_enabled=False, latency_routing=False, failure_threshold=2, reset_seconds=60)
+    options.update(kwargs)
+    return FailoverLlmClient({provider.name: provider for provider in providers}, **options)
+
+
+def test_failover_and_circuit_breaker():
+    primary, secondary = FakeProvider("sonar", fail=True), FakeProvider("gigachat")
+    client = make_client(primary, secondary)
+
+    async def run():
+        return [await client.generate_response([]) for _ in range(4)]
+
+    assert asyncio.run(run()) == ["gigachat"] * 4
+    # После двух ошибок подряд автомат открыт и основной провайдер больше не вызывается
+    assert primary.calls == 2
+    assert client.stats()['providers']['sonar']['state'] == CircuitBreaker.OPEN
+
+
+def test_half_open_probe_closes_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    # В half-open проходит только одна проба
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_all_providers_down_raises():
+    client = make_client(FakeProvider("sonar", fail=True), FakeProvider("gigachat", fail=True))
+
+    with pytest.raises(LLMUnavailableException):
+        asyncio.run(client.generate_response([]))
+
+
+def test_hedged_request_takes_first_answer_and_cancels_slow_one():
+    slow, fast = FakeProvider("sonar", delay=2.0), FakeProvider("gigachat", delay=0.01)
+    client = make_client(slow, fast, hedging_enabled=True, hedge_min_delay_ms=50, hedge_default_delay_ms=50)
+
+    async def run():
+        started_at = time.perf_counter()
+        answer = await client.generate_response([])
+        await asyncio.sleep(0)
+        return answer, time.perf_counter() - started_at
+
+    answer, seconds = asyncio.run(run())
+
+    assert answer == "gigachat"
+    assert seconds < 1.0
+    assert slow.cancelled == 1
+    assert client.stats()['hedge_wins'] == 1
+
+
+def test_latency_routing_demotes_slow_provider():
+    slow, fast = FakeProvider("sonar"), FakeProvider("gigachat")
+    client = make_client(slow, fast, latency_routing=True, slowdown_factor=2.0)
+    for _ in range(5):
+        client.providers[0].latency.record(3.0)
+        client.providers[1].latency.record(0.5)
+
+    assert asyncio.run(client.generate_response([])) == "gigachat"
+    assert slow.calls == 0
+
+
+def test_stream_fails_over_before_first_delta():
+    client = make_client(FakeProvider("sonar", fail=True), FakeProvider("gigachat"))
+
+    async def run():
+        return [delta async for delta in client.stream_response([])]
+
+    assert asyncio.run(run()) == ["gigachat", "!"]
+
+
+def test_stream_failure_after_first_delta_opens_breaker():
+    sonar = FakeProvider("sonar", fail_mid_stream=True)
+    client = make_client(sonar, FakeProvider("gigachat"))
+
+    async def run():
+        deltas = []
+        with pytest.raises(RuntimeError):
+            async for delta in client.stream_response([]):
+                deltas.append(delta)
+        return deltas
+
+    # После первой дельты переключения нет, но обрыв засчитывается провайдеру
+    assert asyncio.run(run()) == ["sonar", "!"]
+    asyncio.run(run())
+
+    assert client.stats()['providers']['sonar']['failures'] == 2
+    assert client.stats()['providers']['sonar']['state'] == CircuitBreaker.OPEN
+
+    async def next_stream():
+        return [delta async for delta in client.stream_response([])]
+
+    assert asyncio.run(next_stream()) == ["gigachat", "!"]
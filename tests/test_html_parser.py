@@ -1,3 +1,4 @@
+import re
 from unittest.mock import patch, MagicMock
 
 import pytest
@@ -17,6 +18,27 @@ def test_clean_text(parser):
     assert cleaned_text == "Это тестовый текст, для проверки на удаление экстрасимволов..."
 
 
+def legacy_clean_text(text):
+    """Прежняя очистка регулярками: _clean_text должен давать тот же результат, от него считается content_hash"""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s\-.,!?;:()\[\]"\'«»]', '', text)
+    text = re.sub(r'\[.*?\]', '', text, flags=re.DOTALL)
+    for phrase in ["Перейти в портфолио Обязательное поле", "Пожалуйста, введите корректное имя"]:
+        text = re.sub(phrase, '', text, flags=re.IGNORECASE | re.DOTALL)
+    return text.strip()
+
+
+@pytest.mark.parametrize("raw_text", [
+    "  \n\t Кейс\xa0QIWI  ",
+    " @ [1, 2]  текст\n",
+    "ПЕРЕЙТИ В ПОРТФОЛИО\n Обязательное  поле хвост",
+    "[ Пожалуйста, введите корректное имя ] Пожалуйста,\tвведите корректное имя",
+    "",
+])
+def test_clean_text_matches_legacy_regex_cleaning(parser, raw_text):
+    assert parser._clean_text(raw_text) == legacy_clean_text(raw_text)
+
+
 def test_extract_title_from_h1(parser):
     html = "<html><body><h1>Заголовок</h1></body></html>"
     soup = BeautifulSoup(html, "html.parser")
@@ -63,3 +85,44 @@ def test_parse_page_success(mock_get, parser):
     assert "Контент страницы" in result["content"]
     assert result["url"] == "http://example.com"
     assert result["word_count"] > 0
+
+
+PAGES = [
+    # Служебные блоки внутри main и текст после них
+    "<html><head><title>Кейс</title></head><body><header><h1>Шапка сайта</h1></header>"
+    "<main><h1 class='case-title'>Чат-бот для банка</h1><div class='ads'>Реклама</div>"
+    + "<p>Бот отвечает клиентам круглосуточно.</p>" * 5 + " хвост</main><footer>Подвал</footer></body></html>",
+    # Короткий main: контент берется из body без навигации
+    "<html><body><div class='navigation'>Меню</div><main>Коротко</main><p>Текст страницы</p></body></html>",
+    # Контент по id и классу среди нескольких классов
+    "<html><body><div id='content' class='wide content'>" + "слово " * 30 + "</div></body></html>",
+    # Кодировка из meta
+    "<html><head><meta charset='windows-1251'></head><body><h1>Кейс</h1><p>Описание проекта</p></body></html>",
+    # Текст template, rt и rp BeautifulSoup не включает в get_text()
+    "<html><body><template><h1>Шаблон</h1></template><main>" + "Распознавание молекул. " * 8
+    + "<template>скрытый шаблон</template><ruby>漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby><!-- c -->хвост"
+    + "</main></body></html>",
+    # Без тега body html.parser не откатывается на body, и документа нет
+    "<html><head><title>Кейс</title></head><p>Текст без body</p></html>",
+]
+
+
+@pytest.mark.parametrize("html", PAGES)
+def test_lxml_engine_matches_bs4(html):
+    pytest.importorskip("lxml")
+    encoding = "windows-1251" if "windows-1251" in html else "utf-8"
+    data = html.encode(encoding)
+
+    expected = HTMLParser(engine="bs4").parse_html("http://example.com", data)
+    assert HTMLParser(engine="lxml").parse_html("http://example.com", data) == expected
+
+
+def test_lxml_engine_falls_back_to_bs4():
+    pytest.importorskip("lxml")
+    parser = HTMLParser(engine="lxml")
+    # Объявленная кодировка не совпадает с байтами: lxml не декодирует, страницу разбирает BeautifulSoup
+    html = "<html><head><meta charset='utf-8'></head><body><h1>Кейс</h1></body></html>".encode("utf-16")
+
+    with patch.object(parser, "_parse_with_bs4", return_value={"title": "bs4"}) as fallback:
+        assert parser.parse_html("http://example.com", html) == {"title": "bs4"}
+    fallback.assert_called_once()
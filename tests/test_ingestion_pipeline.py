@@ -0,0 +1,135 @@
+import asyncio
+
+from app.core.chunker import ContentChunker
+from app.ingestion.manifest import IndexManifest
+from app.ingestion.pipeline import IngestionPipeline
+
+
+class FakeEmbeddingService:
+    def __init__(self):
+        self.batches = []
+
+    def add_documents(self, chunks):
+        self.batches.append(list(chunks))
+
+
+def make_page(title, words):
+    content = " ".join(f"слово{i}" for i in range(words))
+    return f"<html><head><title>{title}</title></head><body><main>{content}</main></body></html>"
+
+
+def test_pipeline_upserts_chunks_in_fixed_batches(site_stub):
+    for i in range(6):
+        site_stub.pages[f"/case-{i}"] = make_page(f"Кейс {i}", 25)
+    urls = [f"{site_stub.url}/case-{i}" for i in range(6)] + [f"{site_stub.url}/missing"]
+
+    embedding_service = FakeEmbeddingService()
+    pipeline = IngestionPipeline(
+        embedding_service,
+        chunker=ContentChunker(chunk_size=10, overlap=2),
+        fetch_concurrency=3,
+        parse_workers=2,
+        embed_batch_size=5
+    )
+
+    report = asyncio.run(pipeline.run(urls))
+
+    chunks = [chunk for batch in embedding_service.batches for chunk in batch]
+    # 25 слов при шаге 8 дают 3 чанка на страницу
+    assert len(chunks) == 18
+    assert all(len(batch) == 5 for batch in embedding_service.batches[:-1])
+    assert {chunk['source_title'] for chunk in chunks} == {f"Кейс {i}" for i in range(6)}
+    assert pipeline.failed_urls == [f"{site_stub.url}/missing"]
+    assert report['stages']['fetch']['items'] == 7
+    assert report['stages']['parse']['items'] == 6
+    assert report['stages']['embed']['items'] == 18
+
+
+class FakeVectorStore(FakeEmbeddingService):
+    def __init__(self, chunk_sources=None):
+        super().__init__()
+        self.deleted = []
+        self.chunk_sources = chunk_sources or {}
+
+    def delete_documents(self, chunk_ids):
+        self.deleted.extend(chunk_ids)
+
+    def get_chunk_sources(self):
+        return dict(self.chunk_sources)
+
+
+def run_refresh(site_stub, urls, manifest_path, chunk_size=10, chunk_sources=None):
+    vector_store = FakeVectorStore(chunk_sources)
+    pipeline = IngestionPipeline(
+        vector_store,
+        chunker=ContentChunker(chunk_size=chunk_size, overlap=2),
+        parse_workers=1,
+        embed_batch_size=4,
+        manifest=IndexManifest.load(manifest_path)
+    )
+    report = asyncio.run(pipeline.run(urls))
+    upserted = [chunk['chunk_id'] for batch in vector_store.batches for chunk in batch]
+    return report, upserted, vector_store.deleted
+
+
+def test_refresh_reembeds_only_changed_chunks(site_stub, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    for name in ("a", "b", "c"):
+        site_stub.pages[f"/{name}"] = make_page(f"Кейс {name}", 25)
+    urls = [f"{site_stub.url}/{name}" for name in ("a", "b", "c")]
+
+    report, upserted, deleted = run_refresh(site_stub, urls, manifest_path)
+    assert len(upserted) == 9
+    assert deleted == []
+
+    # Повторный запуск без изменений: все страницы отвечают 304
+    report, upserted, deleted = run_refresh(site_stub, urls, manifest_path)
+    assert report['unchanged_pages'] == 3
+    assert upserted == []
+
+    # На странице "a" изменился хвост, "c" удалена с сайта, "b" убрана из списка
+    site_stub.pages["/a"] = make_page("Кейс a", 26)
+    del site_stub.pages["/c"]
+    report, upserted, deleted = run_refresh(site_stub, [urls[0], urls[2]], manifest_path)
+
+    assert upserted == [f"{urls[0]}#chunk_2"]
+    assert sorted(deleted) == sorted(
+        [f"{urls[1]}#chunk_{i}" for i in range(3)]
+        + [f"{urls[2]}#chunk_{i}" for i in range(3)]
+    )
+    assert set(IndexManifest.load(manifest_path).pages) == {urls[0]}
+
+
+def test_changed_chunker_settings_rechunk_unchanged_pages(site_stub, tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    site_stub.pages["/a"] = make_page("Кейс a", 25)
+    url = f"{site_stub.url}/a"
+    run_refresh(site_stub, [url], manifest_path)
+
+    # Страница не менялась (сервер ответил бы 304), но чанки теперь по 14 слов: 25 слов дают 2 чанка вместо 3
+    report, upserted, deleted = run_refresh(site_stub, [url], manifest_path, chunk_size=14)
+
+    assert report['unchanged_pages'] == 0
+    assert upserted == [f"{url}#chunk_0", f"{url}#chunk_1"]
+    assert deleted == [f"{url}#chunk_2"]
+    assert IndexManifest.load(manifest_path).get_page(url)['build']['chunk_size'] == 14
+
+    # С теми же параметрами страница снова пропускается
+    report, upserted, deleted = run_refresh(site_stub, [url], manifest_path, chunk_size=14)
+    assert report['unchanged_pages'] == 1
+    assert upserted == []
+
+
+def test_first_manifest_run_purges_chunks_of_existing_collection(site_stub, tmp_path):
+    site_stub.pages["/a"] = make_page("Кейс a", 25)
+    url = f"{site_stub.url}/a"
+    # Коллекция собрана без манифеста: у "a" было 5 чанков, страница "old" из списка уже убрана
+    existing = {f"{url}#chunk_{i}": url for i in range(5)}
+    existing["https://old.example/case#chunk_0"] = "https://old.example/case"
+
+    report, upserted, deleted = run_refresh(site_stub, [url], str(tmp_path / "manifest.json"),
+                                            chunk_sources=existing)
+
+    assert upserted == [f"{url}#chunk_{i}" for i in range(3)]
+    assert sorted(deleted) == sorted([f"{url}#chunk_3", f"{url}#chunk_4", "https://old.example/case#chunk_0"])
+    assert report['removed_pages'] == 1
@@ -0,0 +1,56 @@
+from app.core.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def make_chunk(chunk_id, title, content):
+    return {'chunk_id': chunk_id, 'source_title': title, 'content': content}
+
+
+CHUNKS = [
+    make_chunk("lamoda_0", "Lamoda: поиск по похожей одежде", "Система сегментации одежды на фотографиях"),
+    make_chunk("dodo_0", "Додо Пицца: робот-аналитик", "Анализ отзывов клиентов пиццерии"),
+    make_chunk("qiwi_0", "QIWI", "Поиск аномалий в платежных транзакциях"),
+    make_chunk("purina_0", "Purina: подбор корма", "Бот подбирает корм для собаки"),
+]
+
+
+def test_tokenize_normalizes_russian_word_forms():
+    assert tokenize("Отзывов") == tokenize("отзывы")
+    assert tokenize("Ёлка") == tokenize("елка")
+    # Стоп-слова и однобуквенные токены выбрасываются
+    assert tokenize("Что вы делали для QIWI?") == ["qiwi"]
+
+
+def test_bm25_finds_exact_names():
+    index = BM25Index("unused")
+    index.add_documents(CHUNKS)
+
+    assert index.search("Что вы делали для Lamoda?", 3)[0][0] == "lamoda_0"
+    assert index.search("кейс QIWI", 3)[0][0] == "qiwi_0"
+    assert [chunk_id for chunk_id, _ in index.search("корм для собак", 3)] == ["purina_0"]
+    assert index.search("совершенно незнакомое", 3) == []
+
+
+def test_bm25_persists_and_removes_chunks(tmp_path):
+    path = str(tmp_path / "bm25_index.json")
+    index = BM25Index(path)
+    index.add_documents(CHUNKS)
+    index.remove_documents(["qiwi_0"])
+    index.save()
+
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 3
+    assert loaded.search("QIWI", 3) == []
+    assert loaded.search("Purina", 3) == index.search("Purina", 3)
+    assert not loaded.is_stale()
+
+    index.add_documents([make_chunk("qiwi_0", "QIWI", "Антифрод")])
+    index.save()
+    assert loaded.is_stale()
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    scores = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+
+    assert max(scores, key=scores.get) == "c"
+    assert scores["a"] == 1 / 61
+    assert set(scores) == {"a", "b", "c", "d"}
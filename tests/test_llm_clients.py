@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from app.core.gigachat import GigaChatClient
+from app.core.sonar import SonarClient
+from config import settings
+
+
+@pytest.fixture
+def gigachat_settings(llm_stub, monkeypatch):
+    monkeypatch.setattr(settings, "GIGACHAT_AUTH_URL", f"{llm_stub.url}/api/v2/oauth")
+    monkeypatch.setattr(settings, "GIGACHAT_BASE_URL", llm_stub.url)
+    monkeypatch.setattr(settings, "GIGACHAT_API_KEY", "test-key")
+    return llm_stub
+
+
+def test_sonar_reuses_pooled_connection(llm_stub, monkeypatch):
+    monkeypatch.setattr(settings, "SONAR_BASE_URL", f"{llm_stub.url}/chat/completions")
+    monkeypatch.setattr(settings, "SONAR_API_KEY", "test-key")
+    client = SonarClient()
+
+    async def main():
+        answers = [
+            await client.generate_response(messages=[{"role": "user", "content": "вопрос"}])
+            for _ in range(3)
+        ]
+        await client.aclose()
+        return answers
+
+    answers = asyncio.run(main())
+
+    assert answers == ["Ответ заглушки"] * 3
+    assert len(llm_stub.requests) == 3
+    assert len(llm_stub.connections) == 1
+    assert client.http_client.is_closed
+
+
+def test_sonar_streams_deltas(llm_stub, monkeypatch):
+    monkeypatch.setattr(settings, "SONAR_BASE_URL", f"{llm_stub.url}/chat/completions")
+    monkeypatch.setattr(settings, "SONAR_API_KEY", "test-key")
+    client = SonarClient()
+
+    async def main():
+        deltas = [delta async for delta in client.stream_response(messages=[{"role": "user", "content": "вопрос"}])]
+        await client.aclose()
+        return deltas
+
+    assert asyncio.run(main()) == ["Ответ ", "заглушки"]
+
+
+def test_gigachat_streams_deltas(gigachat_settings):
+    client = GigaChatClient()
+
+    async def main():
+        deltas = [delta async for delta in client.stream_response(messages=[{"role": "user", "content": "вопрос"}])]
+        await client.aclose()
+        return deltas
+
+    assert asyncio.run(main()) == ["Ответ ", "заглушки"]
+    assert gigachat_settings.token_requests == 1
+
+
+def test_gigachat_concurrent_token_refresh_is_single_flight(gigachat_settings):
+    gigachat_settings.auth_delay = 0.1
+    client = GigaChatClient()
+
+    async def main():
+        tokens = await asyncio.gather(*(client._get_access_token() for _ in range(20)))
+        await client.aclose()
+        return tokens
+
+    tokens = asyncio.run(main())
+
+    assert set(tokens) == {"token-1"}
+    assert gigachat_settings.token_requests == 1
+
+
+def test_gigachat_refreshes_token_in_background(gigachat_settings, monkeypatch):
+    monkeypatch.setattr(settings, "GIGACHAT_TOKEN_REFRESH_MARGIN", 0)
+    monkeypatch.setattr(settings, "GIGACHAT_TOKEN_PROACTIVE_LEAD", 1.5)
+    gigachat_settings.token_expires_in = 2.0
+    client = GigaChatClient()
+
+    async def main():
+        await client.warmup()
+        await asyncio.sleep(0.75)
+        token = await client._get_access_token()
+        await client.aclose()
+        return token
+
+    token = asyncio.run(main())
+
+    # Второй токен получен таймером, запрос его не ждал
+    assert token == "token-2"
+    assert gigachat_settings.token_requests == 2
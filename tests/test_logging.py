@@ -0,0 +1,69 @@
+import json
+import logging
+import queue
+
+from app.utils.logging import JsonFormatter, NonBlockingQueueHandler, log_payload, truncate_payload
+
+
+def make_record(message, **extra):
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, message, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_writes_one_line_with_payload():
+    line = JsonFormatter().format(make_record("Ответ\nLLM", payload={'answer': "текст"}))
+
+    entry = json.loads(line)
+    assert "\n" not in line
+    assert entry['level'] == "INFO"
+    assert entry['logger'] == "app.test"
+    assert entry['message'] == "Ответ\nLLM"
+    assert entry['payload'] == {'answer': "текст"}
+
+
+def test_truncate_payload():
+    assert truncate_payload("коротко", max_chars=10) == "коротко"
+    assert truncate_payload("x" * 15, max_chars=10) == "x" * 10 + "… [+5 символов]"
+    assert truncate_payload([{'role': "user"}], max_chars=100) == "[{'role': 'user'}]"
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+
+    handler.handle(make_record("первая"))
+    handler.handle(make_record("вторая"))
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+def test_payload_sampling():
+    records = []
+    logger = logging.getLogger("app.test.payload")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers = [logging.Handler()]
+    logger.handlers[0].emit = records.append
+
+    log_payload(logger, "не пишем", sample_rate=0.0, answer="x")
+    log_payload(logger, "пишем", sample_rate=1.0, answer="x" * 5000)
+
+    assert [record.getMessage() for record in records] == ["пишем"]
+    assert len(records[0].payload['answer']) < 2100
+
+
+def test_exception_reaches_json_formatter_as_separate_field():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    logger = logging.getLogger("app.test.exception")
+    logger.propagate = False
+    logger.handlers = [handler]
+
+    try:
+        raise ValueError("сломалось")
+    except ValueError:
+        logger.exception("Ошибка %s", "генерации")
+
+    entry = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+    assert entry['message'] == "Ошибка генерации"
+    assert "ValueError: сломалось" in entry['exc_info']
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from dependency_injector import providers
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.api import metrics as metrics_api
+from app.core.single_flight import SingleFlight
+from app.utils import tracing
+from app.utils.metrics import Histogram
+from app.utils.timing import StageTimings
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("rag_test_seconds", "Тест", "stage", buckets=(0.01, 0.1))
+    for seconds in (0.005, 0.05, 0.05, 3.0):
+        histogram.observe("embed", seconds)
+
+    assert histogram.render() == [
+        "# HELP rag_test_seconds Тест",
+        "# TYPE rag_test_seconds histogram",
+        'rag_test_seconds_bucket{stage="embed",le="0.01"} 1',
+        'rag_test_seconds_bucket{stage="embed",le="0.1"} 3',
+        'rag_test_seconds_bucket{stage="embed",le="+Inf"} 4',
+        'rag_test_seconds_sum{stage="embed"} 3.105',
+        'rag_test_seconds_count{stage="embed"} 4',
+    ]
+
+
+def test_stage_measure_overhead_is_microseconds():
+    histogram = Histogram("rag_test_seconds", "Тест", "stage")
+    timings = StageTimings(histogram)
+    runs = 20000
+
+    started_at = time.perf_counter()
+    for _ in range(runs):
+        with timings.measure('noop'):
+            pass
+    per_call = (time.perf_counter() - started_at) / runs
+
+    assert timings.stats()['noop']['count'] == runs
+    assert per_call < 50e-6
+
+
+def test_measure_creates_otel_span(monkeypatch):
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "_tracer", provider.get_tracer("test"))
+
+    timings = StageTimings(histogram=None)
+    with timings.measure('ask'):
+        with timings.measure('embed'):
+            pass
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert spans['embed'].parent.span_id == spans['ask'].context.span_id
+
+
+def test_metrics_endpoint_exports_stages_and_cache_counters(monkeypatch):
+    async def loaded(app, container):
+        app.state.ready = True
+
+    monkeypatch.setattr(main, "load_services", loaded)
+    cache_stats = {'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+    StageTimings().record('llm_total', 1.5)
+
+    with TestClient(main.app) as client:
+        container = client.app.state.container
+        client.app.state.embedding_service = SimpleNamespace(
+            query_cache=SimpleNamespace(stats=lambda: cache_stats), close=lambda: None)
+        container.answer_cache.override(providers.Object(SimpleNamespace(stats=lambda: cache_stats)))
+        container.question_coalescer.override(providers.Object(SingleFlight()))
+
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'rag_stage_duration_seconds_count{stage="llm_total"}' in response.text
+    assert 'rag_cache_hit_ratio{cache="query_embedding"} 0.75' in response.text
+    assert 'rag_ready{service="rag"} 1' in response.text
+
+
+def test_metrics_available_while_model_loads(monkeypatch):
+    loaded = threading.Event()
+
+    async def slow_load(app, container):
+        await asyncio.to_thread(loaded.wait, 10)
+
+    monkeypatch.setattr(main, "load_services", slow_load)
+
+    with TestClient(main.app) as client:
+        assert client.get("/health/ready").status_code == 503
+        response = client.get("/metrics")
+        loaded.set()
+
+    assert response.status_code == 200
+    assert 'rag_ready{service="rag"} 0' in response.text
+    # Модель ещё не создана, поэтому метрик ее кэша нет
+    assert 'cache="query_embedding"' not in response.text
+
+
+def test_log_queue_counters_exported(monkeypatch):
+    async def loaded(app, container):
+        app.state.ready = True
+
+    monkeypatch.setattr(main, "load_services", loaded)
+    monkeypatch.setattr(metrics_api, "queue_stats", lambda: {'queued': 2, 'dropped': 7})
+
+    with TestClient(main.app) as client:
+        response = client.get("/metrics")
+
+    assert "rag_log_records_dropped_total 7" in response.text
+    assert "rag_log_queue_size 2" in response.text
@@ -0,0 +1,30 @@
+import numpy as np
+
+from app.core.query_cache import QueryEmbeddingCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  Что вы   можете\tсделать  для РИТЕЙЛЕРОВ? ") == "что вы можете сделать для ритейлеров?"
+
+
+def test_hit_on_normalized_question():
+    cache = QueryEmbeddingCache("model", max_mb=1, ttl_seconds=60)
+    cache.put("Что вы можете сделать для ритейлеров?", np.ones(4, dtype=np.float64))
+
+    embedding = cache.get("  что вы можете  сделать для ритейлеров? ")
+
+    assert embedding is not None
+    assert embedding.dtype == np.float32
+    assert cache.get("Другой вопрос") is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_is_bounded_by_memory():
+    # 1 МБ вмещает 2 вектора по 384 КБ
+    cache = QueryEmbeddingCache("model", max_mb=1, ttl_seconds=60)
+    for i in range(3):
+        cache.put(f"вопрос {i}", np.zeros(96 * 1024, dtype=np.float32))
+
+    assert cache.stats()['entries'] == 2
+    assert cache.get("вопрос 0") is None
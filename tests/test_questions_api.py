@@ -0,0 +1,174 @@
+import json
+
+import numpy as np
+import pytest
+from dependency_injector import providers
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.constants.generator import NO_ANSWER_STR
+from app.core.context_builder import ContextBuilder, TokenCounter
+from app.core.failover import FailoverLlmClient
+from app.core.generator import ResponseGenerator
+from app.core.interface import LlmInterface
+from app.core.single_flight import SingleFlight
+from app.utils.timing import StageTimings
+from config import settings
+
+CONTEXT = {
+    'chunk_id': "https://eora.ru/cases/lamoda#chunk_0",
+    'content': "Сегментация одежды на фотографиях и поиск похожих товаров",
+    'metadata': {'source_url': "https://eora.ru/cases/lamoda", 'source_title': "Lamoda", 'chunk_index': 0}
+}
+
+
+class ScriptedProvider(LlmInterface):
+    """Отдает заданные дельты; с fail=True падает после них (или сразу, если дельт нет)"""
+
+    def __init__(self, deltas=("Поиск ", "по ", "фото"), fail=False):
+        self.deltas = deltas
+        self.fail = fail
+
+    async def generate_response(self, messages, **kwargs):
+        if self.fail:
+            raise RuntimeError("провайдер недоступен")
+        return "".join(self.deltas)
+
+    async def stream_response(self, messages, **kwargs):
+        for delta in self.deltas:
+            yield delta
+        if self.fail:
+            raise RuntimeError("соединение оборвалось")
+
+
+class QuestionFailingProvider(ScriptedProvider):
+    """Падает только на вопросах, содержащих marker"""
+
+    def __init__(self, marker):
+        super().__init__()
+        self.marker = marker
+
+    async def generate_response(self, messages, **kwargs):
+        if self.marker in str(messages):
+            raise RuntimeError("провайдер недоступен")
+        return await super().generate_response(messages, **kwargs)
+
+
+class FakeEmbeddingService:
+    async def embed_query_async(self, question):
+        return np.array([1.0, 0.0])
+
+
+class FakeSearchService:
+    def __init__(self):
+        self.stage_timings = StageTimings(histogram=None)
+
+    async def search_and_rank_async(self, query, k=5, query_embedding=None):
+        return [CONTEXT]
+
+    async def search_and_rank_batch_async(self, queries, k=5):
+        # Для второго вопроса ничего не нашлось
+        return [[CONTEXT] if i != 1 else [] for i in range(len(queries))]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Клиент API с готовыми сервисами: поиск всегда находит один чанк, LLM — ScriptedProvider"""
+
+    async def loaded(app, container):
+        app.state.ready = True
+
+    monkeypatch.setattr(main, "load_services", loaded)
+    generator = ResponseGenerator(context_builder=ContextBuilder(TokenCounter()))
+
+    def use_providers(*llm_providers):
+        generator.llm_client = FailoverLlmClient(
+            {f"provider-{i}": provider for i, provider in enumerate(llm_providers)},
+            hedging_enabled=False, latency_routing=False
+        )
+
+    with TestClient(main.app) as client:
+        container = client.app.state.container
+        container.embedding_service.override(providers.Object(FakeEmbeddingService()))
+        container.search_service.override(providers.Object(FakeSearchService()))
+        container.response_generator_service.override(providers.Object(generator))
+        container.question_coalescer.override(providers.Object(SingleFlight()))
+        client.use_providers = use_providers
+        yield client
+
+
+def read_events(response):
+    """(event, data) из тела SSE"""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return events
+
+
+def test_stream_ends_with_done(api):
+    api.use_providers(ScriptedProvider())
+
+    response = api.post("/api/v1/ask/stream", json={"question": "Что вы делали для Lamoda?"})
+
+    assert response.status_code == 200
+    assert read_events(response) == [
+        ("message", {"delta": "Поиск "}), ("message", {"delta": "по "}), ("message", {"delta": "фото"}),
+        ("done", {})
+    ]
+    # Этап embed замеряется и в потоковом эндпоинте
+    assert api.app.state.container.search_service().stage_timings.stats()['embed']['count'] == 1
+
+
+def test_stream_failure_after_deltas_sends_error_event(api):
+    api.use_providers(ScriptedProvider(fail=True))
+
+    response = api.post("/api/v1/ask/stream", json={"question": "Что вы делали для Lamoda?"})
+
+    events = read_events(response)
+    # Текст ошибки не подклеивается к ответу, done не отправляется
+    assert [delta for event, delta in events[:-1]] == [{"delta": "Поиск "}, {"delta": "по "}, {"delta": "фото"}]
+    assert events[-1][0] == "error"
+    assert events[-1][1]["error_type"] == "PROCESSING_ERROR"
+
+
+def test_all_providers_down_returns_503(api):
+    api.use_providers(ScriptedProvider(fail=True), ScriptedProvider(deltas=(), fail=True))
+
+    response = api.post("/api/v1/ask", json={"question": "Что вы делали для Lamoda?"})
+    assert response.status_code == 503
+    assert response.json()["detail"].startswith("Ни один LLM-провайдер не ответил")
+
+    # До первой дельты статус ещё не отправлен, поток тоже отвечает 503
+    api.use_providers(ScriptedProvider(deltas=(), fail=True))
+    response = api.post("/api/v1/ask/stream", json={"question": "Что вы делали для Lamoda?"})
+    assert response.status_code == 503
+
+
+def test_batch_answers_in_question_order_and_limits_size(api):
+    api.use_providers(ScriptedProvider())
+    questions = ["Что вы делали для Lamoda?", "Какая погода на Марсе?", "Был ли поиск по фото?"]
+
+    response = api.post("/api/v1/ask/batch", json={"questions": questions})
+
+    assert response.status_code == 200
+    assert [item["answer"] for item in response.json()["answers"]] == ["Поиск по фото", NO_ANSWER_STR, "Поиск по фото"]
+
+    too_many = ["Что вы делали для Lamoda?"] * (settings.ASK_BATCH_MAX_QUESTIONS + 1)
+    assert api.post("/api/v1/ask/batch", json={"questions": too_many}).status_code == 422
+
+
+def test_batch_failed_question_does_not_fail_others(api):
+    api.use_providers(QuestionFailingProvider(marker="Сочи"))
+    questions = [
+        "Что вы делали для Lamoda?", "Какая погода на Марсе?", "Что вы делали в Сочи?", "Был ли поиск по фото?"
+    ]
+
+    response = api.post("/api/v1/ask/batch", json={"questions": questions})
+
+    assert response.status_code == 200
+    answers = response.json()["answers"]
+    assert [item["answer"] for item in answers] == ["Поиск по фото", NO_ANSWER_STR, None, "Поиск по фото"]
+    # Единственный провайдер не ответил — у вопроса та же ошибка, что отдал бы /ask
+    assert answers[2]["error_type"] == "LLM_UNAVAILABLE"
+    assert answers[2]["detail"].startswith("Ни один LLM-провайдер не ответил")
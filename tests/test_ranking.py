@@ -0,0 +1,68 @@
+from app.core.ranking import Reranker, length_feature, similarity_feature, title_tokens
+from app.utils.timing import StageTimings
+
+
+def make_result(chunk_id, similarity, title, url, word_count=100, precomputed=True):
+    metadata = {'source_title': title, 'source_url': url, 'word_count': word_count}
+    if precomputed:
+        metadata['title_tokens'] = title_tokens(title)
+    return {'chunk_id': chunk_id, 'similarity_score': similarity, 'content': "", 'metadata': metadata}
+
+
+def test_rank_combines_similarity_length_and_title():
+    results = [
+        make_result("a", 0.50, "Робот для склада", "u1", word_count=50),
+        make_result("b", 0.45, "Чат-бот для Purina", "u2", word_count=50),
+        make_result("c", 0.40, "Нейросеть для ферм", "u3", word_count=400),
+    ]
+
+    ranked = Reranker(diversity_penalty=0.0).rank(results, "бот Purina")
+
+    assert [result['chunk_id'] for result in ranked] == ["b", "a", "c"]
+    # 0.45 + 50/1000 + 0.2 * 2/2: оба слова запроса есть в заголовке
+    assert abs(ranked[0]['final_score'] - 0.7) < 1e-9
+
+
+def test_title_tokens_fallback_for_old_metadata():
+    precomputed = Reranker(diversity_penalty=0.0).rank(
+        [make_result("a", 0.3, "Кейс QIWI", "u1")], "QIWI")
+    legacy = Reranker(diversity_penalty=0.0).rank(
+        [make_result("a", 0.3, "Кейс QIWI", "u1", precomputed=False)], "QIWI")
+
+    assert precomputed[0]['final_score'] == legacy[0]['final_score']
+
+
+def test_diversity_penalty_demotes_repeated_source():
+    results = [
+        make_result("a0", 0.60, "Страница A", "a"),
+        make_result("a1", 0.59, "Страница A", "a"),
+        make_result("a2", 0.58, "Страница A", "a"),
+        make_result("b0", 0.56, "Страница B", "b"),
+    ]
+
+    ranked = Reranker(diversity_penalty=0.05).rank(results, "вопрос")
+
+    assert [result['chunk_id'] for result in ranked] == ["a0", "b0", "a1", "a2"]
+
+
+def test_features_are_pluggable():
+    results = [make_result("short", 0.5, "", "u1", word_count=10),
+               make_result("long", 0.5, "", "u2", word_count=90)]
+
+    ranked = Reranker({'similarity': similarity_feature, 'length': length_feature}, 0.0).rank(results, "")
+    assert ranked[0]['chunk_id'] == "long"
+
+    ranked = Reranker({'similarity': similarity_feature}, 0.0).rank(results, "")
+    assert ranked[0]['chunk_id'] == "short"
+
+
+def test_stage_timings_accumulate():
+    timings = StageTimings()
+    timings.record('rank', 0.002)
+    timings.record('rank', 0.004)
+    with timings.measure('embed'):
+        pass
+
+    stats = timings.stats()
+    assert stats['rank'] == {'count': 2, 'avg_ms': 3.0, 'max_ms': 4.0}
+    assert stats['embed']['count'] == 1
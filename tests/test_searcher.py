@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from app.core.executor import InferenceExecutor
+from app.core.lexical import BM25Index
+from app.core.searcher import SearchService
+
+
+def make_document(chunk_id, content, embedding):
+    metadata = {'source_title': "", 'source_url': chunk_id, 'word_count': 0}
+    return {'chunk_id': chunk_id, 'content': content, 'metadata': metadata, 'embedding': np.asarray(embedding)}
+
+
+DOCUMENTS = {
+    "a": make_document("a", "Чат-бот для банка", [0.9, 0.436]),
+    "b": make_document("b", "Поиск аномалий в платежах QIWI", [0.8, 0.6]),
+    "c": make_document("c", "QIWI: аномалии QIWI", [0.7, 0.714]),
+}
+
+
+class FakeEmbeddingService:
+    """Векторная выдача — только a и b, чанк c находит лишь BM25"""
+
+    async def embed_query_async(self, query):
+        return np.array([1.0, 0.0])
+
+    async def search_similar_async(self, query, k, query_embedding):
+        return [self._result(DOCUMENTS[chunk_id], query_embedding) for chunk_id in ("a", "b")]
+
+    async def get_documents_async(self, chunk_ids):
+        return self.get_documents(chunk_ids)
+
+    def embed_queries(self, queries):
+        return np.array([[1.0, 0.0] for _ in queries])
+
+    def search_by_embeddings(self, query_embeddings, k):
+        return [[self._result(DOCUMENTS[chunk_id], query_embedding) for chunk_id in ("a", "b")]
+                for query_embedding in query_embeddings]
+
+    def get_documents(self, chunk_ids):
+        self.fetched = list(chunk_ids)
+        return {chunk_id: DOCUMENTS[chunk_id] for chunk_id in chunk_ids}
+
+    @staticmethod
+    def _result(document, query_embedding):
+        similarity = float(np.dot(query_embedding, document['embedding']))
+        return {key: document[key] for key in ('chunk_id', 'content', 'metadata')} | {'similarity_score': similarity}
+
+
+def make_index():
+    index = BM25Index("unused")
+    index.add_documents([{'chunk_id': chunk_id, 'content': document['content']}
+                         for chunk_id, document in DOCUMENTS.items()])
+    return index
+
+
+def make_service(index):
+    service = SearchService(FakeEmbeddingService(), lexical_index=index,
+                            executor=InferenceExecutor(max_workers=1, max_queue=4))
+    service.min_similarity_threshold = 0.0
+    service.rrf_k = 60
+    return service
+
+
+def test_hybrid_search_fuses_vector_and_bm25_off_loop():
+    index = make_index()
+    search_threads = []
+    index_search = index.search
+
+    def search(query, k):
+        search_threads.append(threading.current_thread().name)
+        return index_search(query, k)
+
+    index.search = search
+    service = make_service(index)
+
+    results = asyncio.run(service.search_and_rank_async("кейс QIWI", k=3))
+
+    # c: 3-й по вектору и 1-й по BM25, b: 2-й в обоих списках, a есть только в векторной выдаче
+    assert [result['chunk_id'] for result in results] == ["c", "b", "a"]
+    # Similarity чанка из BM25 считается по его эмбеддингу
+    assert abs(results[0]['similarity_score'] - 0.7) < 1e-3
+    assert abs(results[0]['rrf_score'] - (1 / 63 + 1 / 61)) < 1e-9
+    # BM25 считается в пуле инференса, а не в event loop
+    assert search_threads and all(name.startswith("inference") for name in search_threads)
+
+
+def test_batch_search_ranks_each_query_and_fetches_bm25_chunks_once():
+    service = make_service(make_index())
+
+    results = service.search_and_rank_batch(["кейс QIWI", "чат-бот для банка", "кейс QIWI"], k=3)
+
+    assert [result['chunk_id'] for result in results[0]] == ["c", "b", "a"]
+    # BM25 находит только "a", которая уже есть в векторной выдаче
+    assert [result['chunk_id'] for result in results[1]] == ["a", "b"]
+    assert results[2] == results[0]
+    # Чанк c, найденный только BM25, достается одним запросом на всю пачку
+    assert service.embedding_service.fetched == ["c"]
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    coalescer = SingleFlight(enabled=True)
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ответ"
+
+    async def run():
+        return await asyncio.gather(*(coalescer.do("вопрос", answer) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["ответ"] * 5
+    assert len(calls) == 1
+    assert coalescer.stats() == {'executed': 1, 'coalesced': 4, 'saved_ratio': 0.8, 'in_flight': 0}
+
+
+def test_error_reaches_all_waiters_and_key_is_released():
+    coalescer = SingleFlight(enabled=True)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("LLM недоступна")
+
+    async def run():
+        results = await asyncio.gather(coalescer.do("q", fail), coalescer.do("q", fail), return_exceptions=True)
+        # Следующий вызов после завершения выполняется заново
+        return results, await coalescer.do("q", lambda: asyncio.sleep(0, result="ok"))
+
+    results, retry = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retry == "ok"
+    assert coalescer.executed == 2
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    coalescer = SingleFlight(enabled=True)
+
+    async def answer():
+        await asyncio.sleep(0.05)
+        return "ответ"
+
+    async def run():
+        first = asyncio.create_task(coalescer.do("q", answer))
+        second = asyncio.create_task(coalescer.do("q", answer))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "ответ"
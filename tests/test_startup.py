@@ -0,0 +1,44 @@
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "onnxruntime", "bs4", "requests",
+                 "app.core.parser", "app.ingestion.pipeline"]
+
+
+def test_api_import_does_not_load_heavy_modules():
+    code = f"import sys, json, app.main; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert json.loads(completed.stdout) == []
+
+
+def test_api_answers_503_until_services_loaded(monkeypatch):
+    loaded = threading.Event()
+
+    async def slow_load(app, container):
+        await asyncio.to_thread(loaded.wait, 10)
+        app.state.ready = True
+
+    monkeypatch.setattr(main, "load_services", slow_load)
+
+    with TestClient(main.app) as client:
+        # Порт уже слушается, но модель ещё грузится
+        assert client.get("/health/live").status_code == 200
+        assert client.get("/health/ready").status_code == 503
+        response = client.post("/api/v1/ask", json={"question": "Что вы делали для Lamoda?"})
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Сервис ещё загружается"
+
+        loaded.set()
+        deadline = time.monotonic() + 5
+        while client.get("/health/ready").status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)